@@ -0,0 +1,368 @@
+"""
+Долгоживущий режим агента: приём вебхуков GitHub по HTTP, очередь и пул рабочих потоков.
+Цель: событие обрабатывается за секунды, а не минуты — без сборки контейнера и холодного старта
+Python на каждое событие; клиенты GitHub и LLM, их кэши и пулы соединений живут между событиями.
+События те же, что разбирает main из GITHUB_EVENT_PATH: issues, pull_request, pull_request_review.
+Запуск: python src/main.py --serve [--port 8080]. Для нескольких потоков нужен GIT_WORKTREES=1.
+Серии событий по одному Issue/PR (правки текста, push за push'ем) схлопываются: задача ждёт
+AGENT_DEBOUNCE_SECONDS тишины, выполняется только последняя, а уже идущий прогон по той же
+задаче отменяется — его результат всё равно устарел бы.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import json
+import os
+import queue
+import signal
+import sys
+import threading
+from collections.abc import Callable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+import requests
+from github import GithubException
+
+from rate_limiter import RateLimitExceeded
+
+AGENT_SERVICE_PORT = int(os.environ.get("AGENT_SERVICE_PORT", "8080"))
+AGENT_SERVICE_HOST = os.environ.get("AGENT_SERVICE_HOST", "127.0.0.1")
+AGENT_WORKERS = int(os.environ.get("AGENT_WORKERS", "2"))
+# Секрет вебхука GitHub: без него подпись X-Hub-Signature-256 не проверяется
+AGENT_WEBHOOK_SECRET = os.environ.get("AGENT_WEBHOOK_SECRET", "")
+MAX_PAYLOAD_BYTES = 5 * 1024 * 1024
+# Окно схлопывания событий одной задачи, секунд (0 — без ожидания)
+AGENT_DEBOUNCE_SECONDS = float(os.environ.get("AGENT_DEBOUNCE_SECONDS", "10"))
+# Сколько раз повторять задачу, остановленную лимитом GitHub API (после его сброса)
+AGENT_RATE_LIMIT_RETRIES = int(os.environ.get("AGENT_RATE_LIMIT_RETRIES", "3"))
+
+# Действия событий, на которые реагирует агент (как в .github/workflows/agent_trigger.yml)
+ISSUE_ACTIONS = ("opened", "edited")
+PR_ACTIONS = ("opened", "synchronize")
+
+
+def job_from_event(event_name: str, payload: dict) -> dict | None:
+    """
+    Задача по событию GitHub: {"kind": "issue" | "review" | "fix", "number", "head_sha"?} или None,
+    если событие не для агента. issue — Code Agent по Issue, review — Reviewer по PR,
+    fix — Code Agent Fix после REQUEST_CHANGES; head_sha — head PR на момент события.
+    """
+    action = payload.get("action")
+    if event_name == "issues" and payload.get("issue") and action in ISSUE_ACTIONS:
+        if payload["issue"].get("pull_request"):
+            return None  # события PR приходят и как issues
+        return {"kind": "issue", "number": payload["issue"]["number"]}
+    if event_name == "pull_request" and payload.get("pull_request") and action in PR_ACTIONS:
+        return _pr_job("review", payload["pull_request"])
+    review_state = (payload.get("review") or {}).get("state", "").lower()
+    if (
+        event_name == "pull_request_review"
+        and payload.get("pull_request")
+        and action == "submitted"
+        and review_state == "changes_requested"
+    ):
+        return _pr_job("fix", payload["pull_request"])
+    return None
+
+
+def _pr_job(kind: str, pr: dict) -> dict:
+    job = {"kind": kind, "number": pr["number"]}
+    head_sha = (pr.get("head") or {}).get("sha")
+    if head_sha:
+        job["head_sha"] = head_sha
+    return job
+
+
+def job_key(job: dict) -> tuple[str, int]:
+    """Задачи с одним ключом схлопываются: более поздняя заменяет и отменяет предыдущую."""
+    return job["kind"], job["number"]
+
+
+def is_stale(gh: Any, job: dict) -> bool:
+    """Head PR ушёл дальше head_sha события — по новому коммиту придёт (или уже пришло) своё событие."""
+    if not job.get("head_sha"):
+        return False
+    try:
+        return gh.get_pr_details(job["number"])["head_sha"] != job["head_sha"]
+    except (GithubException, requests.RequestException):
+        return False  # не удалось проверить — задача выполняется
+
+
+def verify_signature(secret: str, body: bytes, signature: str | None) -> bool:
+    """Проверить заголовок X-Hub-Signature-256 (sha256=<hex HMAC тела>)."""
+    if not secret:
+        return True
+    if not signature or not signature.startswith("sha256="):
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature[len("sha256=") :])
+
+
+class AgentService:
+    """
+    Очередь задач и пул потоков, выполняющих их общими клиентами GitHub и LLM.
+    Задача попадает в очередь после debounce секунд без новых событий с тем же job_key; новое событие
+    отменяет идущий прогон (флаг job["cancelled"]), а следующий по ключу ждёт его завершения.
+    :param runner: (задача) -> код возврата; по умолчанию — run_code_agent / run_reviewer_agent / run_code_agent_fix.
+    """
+
+    def __init__(
+        self,
+        workers: int = AGENT_WORKERS,
+        runner: Callable[[dict], int] | None = None,
+        debounce: float = AGENT_DEBOUNCE_SECONDS,
+    ):
+        self.workers = max(1, workers)
+        self.debounce = debounce
+        self.jobs: queue.Queue[dict | None] = queue.Queue()
+        self.runner = runner or self._run_agent
+        self.processed = 0
+        self.coalesced = 0  # события, поглощённые более поздними
+        self.cancelled = 0  # прогоны, отменённые более поздними событиями
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._clients: tuple[Any, Any] | None = None
+        self._pending: dict[tuple[str, int], dict] = {}
+        self._timers: dict[tuple[str, int], threading.Timer] = {}
+        self._running: dict[tuple[str, int], threading.Event] = {}
+        self._deferred: dict[tuple[str, int], dict] = {}
+
+    def _warm_clients(self) -> tuple[Any, Any]:
+        """GithubClient и LLMClient, общие для всех задач (создаются при первой задаче)."""
+        with self._lock:
+            if self._clients is None:
+                from github_client import GithubClient
+                from llm_client import LLMClient
+
+                self._clients = (GithubClient(), LLMClient())
+            return self._clients
+
+    def _run_agent(self, job: dict) -> int:
+        gh, llm = self._warm_clients()
+        # Объекты PR/Issue в кэше клиента (и связанные с ними) могли устареть с прошлого события
+        gh.invalidate(job["number"])
+        if job["kind"] == "issue":
+            # Клон живёт столько же, сколько процесс: контекст и новая ветка должны строиться от свежей base
+            from code_agent import REPO_ROOT
+            from git_runner import fetch_branches, get_default_branch
+
+            fetch_branches(REPO_ROOT, [get_default_branch(REPO_ROOT)])
+        if is_stale(gh, job):
+            print(
+                f"[Service] Задача {job['kind']} #{job['number']}: head PR уже не {job['head_sha'][:7]}, пропуск"
+            )
+            return 0
+        cancelled = job.get("cancelled")
+        if job["kind"] == "issue":
+            from code_agent import run_code_agent
+
+            return run_code_agent(job["number"], gh=gh, llm=llm, cancelled=cancelled)
+        if job["kind"] == "fix":
+            from code_agent import run_code_agent_fix
+
+            return run_code_agent_fix(job["number"], gh=gh, llm=llm, cancelled=cancelled)
+        from reviewer_agent import run_reviewer_agent
+
+        return run_reviewer_agent(job["number"], gh=gh, llm=llm, cancelled=cancelled)
+
+    def submit(self, job: dict) -> None:
+        """Поставить задачу с учётом схлопывания: более раннее событие с тем же ключом отбрасывается."""
+        key = job_key(job)
+        with self._lock:
+            if key in self._pending or key in self._deferred:
+                self.coalesced += 1
+                self._deferred.pop(key, None)
+            timer = self._timers.pop(key, None)
+            if timer is not None:
+                timer.cancel()
+            running = self._running.get(key)
+            if running is not None and not running.is_set():
+                running.set()
+                self.cancelled += 1
+                print(
+                    f"[Service] Задача {job['kind']} #{job['number']}: идущий прогон отменён новым событием"
+                )
+            if self.debounce <= 0:
+                self.jobs.put(job)
+                return
+            self._pending[key] = job
+            timer = threading.Timer(self.debounce, self._release, args=(key,))
+            timer.daemon = True
+            self._timers[key] = timer
+            timer.start()
+
+    def _release(self, key: tuple[str, int]) -> None:
+        """Окно тишины истекло — последняя задача ключа уходит в очередь."""
+        with self._lock:
+            self._timers.pop(key, None)
+            job = self._pending.pop(key, None)
+        if job is not None:
+            self.jobs.put(job)
+
+    def _retry_later(self, job: dict, error: RateLimitExceeded) -> None:
+        """Задача остановлена лимитом GitHub API — повторить после сброса (не больше AGENT_RATE_LIMIT_RETRIES раз)."""
+        attempt = job.get("attempt", 0) + 1
+        if attempt > AGENT_RATE_LIMIT_RETRIES:
+            print(
+                f"[Service] Задача {job['kind']} #{job['number']}: лимит GitHub API, попытки исчерпаны: {error}",
+                file=sys.stderr,
+            )
+            return
+        delay = error.retry_after + 1
+        print(
+            f"[Service] Задача {job['kind']} #{job['number']}: лимит GitHub API, повтор через {delay:.0f} с ({error})"
+        )
+        timer = threading.Timer(delay, self.submit, args=(dict(job, attempt=attempt),))
+        timer.daemon = True
+        timer.start()
+
+    def _worker(self) -> None:
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                self.jobs.task_done()
+                return
+            key = job_key(job)
+            with self._lock:
+                if key in self._running:
+                    # Прогон по этому ключу ещё завершается после отмены — задача пойдёт следом
+                    self._deferred[key] = job
+                    self.jobs.task_done()
+                    continue
+                cancelled = self._running[key] = threading.Event()
+            print(f"[Service] Задача {job['kind']} #{job['number']}: старт")
+            try:
+                code = self.runner(dict(job, cancelled=cancelled))
+            except RateLimitExceeded as e:
+                code = 1
+                self._retry_later(job, e)
+            # Ошибка задачи не должна останавливать рабочий поток
+            except Exception as e:  # noqa: BLE001
+                print(
+                    f"[Service] Задача {job['kind']} #{job['number']}: ошибка {e}", file=sys.stderr
+                )
+                code = 1
+            print(f"[Service] Задача {job['kind']} #{job['number']}: код {code}")
+            with self._lock:
+                self.processed += 1
+                del self._running[key]
+                deferred = self._deferred.pop(key, None)
+            if deferred is not None:
+                self.jobs.put(deferred)
+            self.jobs.task_done()
+
+    def start(self) -> None:
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"agent-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        """Отправить в очередь задачи, ждущие окна тишины, дождаться всех задач и остановить потоки."""
+        with self._lock:
+            keys = list(self._timers)
+            for timer in self._timers.values():
+                timer.cancel()
+        for key in keys:
+            self._release(key)
+        self.jobs.join()
+        for _ in self._threads:
+            self.jobs.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+
+def _handler(service: AgentService, secret: str) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status: int, body: dict) -> None:
+            data = json.dumps(body, ensure_ascii=False).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self) -> None:
+            if self.path != "/health":
+                self._reply(404, {"error": "not found"})
+                return
+            self._reply(
+                200,
+                {
+                    "queued": service.jobs.qsize(),
+                    "workers": service.workers,
+                    "processed": service.processed,
+                    "coalesced": service.coalesced,
+                    "cancelled": service.cancelled,
+                },
+            )
+
+        def do_POST(self) -> None:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > MAX_PAYLOAD_BYTES:
+                self._reply(413, {"error": "payload too large"})
+                return
+            body = self.rfile.read(length)
+            if not verify_signature(secret, body, self.headers.get("X-Hub-Signature-256")):
+                self._reply(401, {"error": "bad signature"})
+                return
+            try:
+                payload = json.loads(body or b"{}")
+            except ValueError:
+                self._reply(400, {"error": "invalid json"})
+                return
+            job = job_from_event(self.headers.get("X-GitHub-Event", ""), payload)
+            if job is None:
+                self._reply(200, {"ignored": True})
+                return
+            service.submit(job)
+            self._reply(202, {"queued": job})
+
+        def log_message(self, format: str, *args: Any) -> None:
+            print(f"[Service] {self.address_string()} {format % args}")
+
+    return Handler
+
+
+def make_server(
+    service: AgentService, host: str, port: int, secret: str = AGENT_WEBHOOK_SECRET
+) -> ThreadingHTTPServer:
+    """HTTP-сервер приёма вебхуков для service (port=0 — свободный порт)."""
+    return ThreadingHTTPServer((host, port), _handler(service, secret))
+
+
+def _terminate(signum: int, frame: Any) -> None:
+    raise KeyboardInterrupt
+
+
+def serve(
+    port: int = AGENT_SERVICE_PORT, host: str = AGENT_SERVICE_HOST, workers: int = AGENT_WORKERS
+) -> int:
+    """Принимать вебхуки и выполнять задачи до прерывания (Ctrl+C / SIGTERM)."""
+    from code_agent import USE_WORKTREES
+
+    if workers > 1 and not USE_WORKTREES:
+        print(
+            "[Service] Без GIT_WORKTREES=1 ветки переключаются в одном клоне — задачи идут в один поток.",
+            file=sys.stderr,
+        )
+        workers = 1
+    service = AgentService(workers)
+    service.start()
+    server = make_server(service, host, port)
+    signal.signal(signal.SIGTERM, _terminate)
+    print(
+        f"[Service] Вебхуки: http://{host}:{server.server_address[1]}/ , потоков: {service.workers}"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+    return 0
@@ -0,0 +1,220 @@
+"""
+Тёплый процесс проверок на время прогона агента: black и pytest без холодного старта интерпретатора.
+Цель: в коротких циклах проверок основное время уходит на запуск python и импорт black/pytest/зависимостей
+тестов. Процесс один раз импортирует их и на каждый запрос делает fork: дочерний процесс запускает
+black.main / pytest.main, видя свежие версии модулей проекта (они в родителе не импортируются).
+Клиент — CheckDaemon, протокол — строки JSON через Unix-сокет. mypy работает через свой демон dmypy,
+ruff — нативный бинарник и быстро стартует сам.
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import json
+import os
+import signal
+import socket
+import socketserver
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from collections.abc import Callable
+from pathlib import Path
+
+# Дополнительные (сторонние) модули, которые стоит импортировать заранее, через запятую
+CHECK_DAEMON_PRELOAD = os.environ.get("CHECK_DAEMON_PRELOAD", "")
+DAEMON_START_TIMEOUT = 30.0
+
+
+def _capture(fn: Callable[[], bool], path: str | None = None) -> tuple[bool, str]:
+    """
+    Выполнить fn, перехватив вывод на уровне дескрипторов 1 и 2 (включая вывод подпроцессов).
+    С path вывод пишется в этот файл (и остаётся там, если процесс будет прерван), а возвращается "".
+    """
+    with open(path, "w+b") if path else tempfile.TemporaryFile() as out:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        saved = os.dup(1), os.dup(2)
+        os.dup2(out.fileno(), 1)
+        os.dup2(out.fileno(), 2)
+        try:
+            ok = fn()
+        except SystemExit as e:
+            ok = e.code in (0, None)
+        # Падение проверки не должно останавливать демон
+        except Exception:  # noqa: BLE001
+            traceback.print_exc()
+            ok = False
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved[0], 1)
+            os.dup2(saved[1], 2)
+            os.close(saved[0])
+            os.close(saved[1])
+        if path:
+            return ok, ""
+        out.seek(0)
+        return ok, out.read().decode("utf-8", errors="replace")
+
+
+def _run_black(args: list[str]) -> bool:
+    import black
+
+    return black.main(args, standalone_mode=False) == 0
+
+
+def _run_pytest(args: list[str]) -> bool:
+    import pytest
+
+    return pytest.main(args) == 0
+
+
+_TOOLS: dict[str, Callable[[list[str]], bool]] = {"black": _run_black, "pytest": _run_pytest}
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """
+    Запрос {"tool", "args", "output"?} → строка {"pid"} (чтобы клиент мог прервать), затем {"ok", "output"}.
+    С "output" (путь к файлу) вывод пишется в файл, а в ответе output пустой.
+    """
+
+    def handle(self) -> None:
+        request = json.loads(self.rfile.readline())
+        self.wfile.write(json.dumps({"pid": os.getpid()}).encode() + b"\n")
+        self.wfile.flush()
+        tool = _TOOLS.get(request.get("tool"))
+        if tool is None:
+            ok, output = False, f"Неизвестный инструмент: {request.get('tool')}"
+        else:
+            ok, output = _capture(
+                lambda: tool(list(request.get("args") or [])), request.get("output")
+            )
+        self.wfile.write(json.dumps({"ok": ok, "output": output}).encode() + b"\n")
+
+
+class _Server(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    # Каждый запрос — в отдельном fork: модули проекта импортируются заново, состояние не копится
+    pass
+
+
+def serve(root: str | Path, socket_path: str) -> None:
+    """Импортировать инструменты и обслуживать запросы до завершения процесса."""
+    os.chdir(root)
+    for name in (
+        "black",
+        "pytest",
+        *filter(None, (m.strip() for m in CHECK_DAEMON_PRELOAD.split(","))),
+    ):
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+    with _Server(socket_path, _Handler) as server:
+        server.serve_forever()
+
+
+class CheckDaemon:
+    """Клиент тёплого процесса проверок для репозитория root: start(), run(), stop()."""
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+        self.socket_path = os.path.join(
+            tempfile.gettempdir(), f"check-daemon-{os.getpid()}-{id(self)}.sock"
+        )
+        self._proc: subprocess.Popen | None = None
+
+    @staticmethod
+    def supported() -> bool:
+        return hasattr(socket, "AF_UNIX") and hasattr(os, "fork")
+
+    def start(self) -> bool:
+        """Запустить процесс и дождаться сокета; False — если платформа не поддерживается или он не поднялся."""
+        if not self.supported():
+            return False
+        self._proc = subprocess.Popen(
+            [
+                sys.executable,
+                str(Path(__file__).resolve()),
+                "--root",
+                str(self.root),
+                "--socket",
+                self.socket_path,
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + DAEMON_START_TIMEOUT
+        while time.monotonic() < deadline:
+            if self._proc.poll() is not None:
+                return False
+            if os.path.exists(self.socket_path):
+                return True
+            time.sleep(0.05)
+        self.stop()
+        return False
+
+    def _request(self, request: dict, timeout: float) -> dict | None:
+        """Отправить запрос и дождаться ответа; None — по таймауту (дочерний процесс убит)."""
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(self.socket_path)
+            sock.sendall(json.dumps(request).encode() + b"\n")
+            stream = sock.makefile("rb")
+            pid = json.loads(stream.readline())["pid"]
+            try:
+                line = stream.readline()
+            except TimeoutError:
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except OSError:
+                    pass
+                return None
+        if not line:
+            raise ConnectionError("процесс проверок закрыл соединение")
+        return json.loads(line)
+
+    def run(self, tool: str, args: list[str], timeout: float) -> tuple[bool, str]:
+        """
+        Выполнить black или pytest с аргументами командной строки.
+        По таймауту дочерний процесс убивается и возвращается (False, "Timeout ...").
+        :raises OSError: процесс недоступен (вызывающий откатывается на subprocess).
+        """
+        result = self._request({"tool": tool, "args": args}, timeout)
+        if result is None:
+            return False, f"Timeout {timeout:.0f}s"
+        return bool(result["ok"]), result["output"]
+
+    def run_to_file(
+        self, tool: str, args: list[str], output_path: str, timeout: float
+    ) -> bool | None:
+        """
+        Как run, но вывод пишется в output_path по ходу выполнения — при прерывании по таймауту
+        в файле остаётся частичный вывод. :return: успех или None, если процесс прерван по таймауту.
+        """
+        result = self._request({"tool": tool, "args": args, "output": output_path}, timeout)
+        return None if result is None else bool(result["ok"])
+
+    def stop(self) -> None:
+        if self._proc is not None and self._proc.poll() is None:
+            self._proc.terminate()
+            try:
+                self._proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+        self._proc = None
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Тёплый процесс проверок (black, pytest)")
+    parser.add_argument("--root", required=True)
+    parser.add_argument("--socket", required=True)
+    ns = parser.parse_args()
+    serve(ns.root, ns.socket)
@@ -5,96 +5,339 @@ from __future__ import annotations
 
 import os
 import sys
+import threading
 from pathlib import Path
 
 from github_client import GithubClient
 from issue_parser import get_issue_context, get_issue_context_for_pr, format_context_for_llm
-from prompts import SYSTEM_PROMPT, FIX_PROMPT, build_user_prompt
+from prompts import SYSTEM_PROMPT, FIX_PROMPT, build_user_prompt, edits_hint
 from llm_client import LLMClient
-from code_applier import parse_llm_files_response, apply_changes
-from quality_runner import run_quality_checks
-from git_runner import ensure_branch, checkout_remote_branch, commit_and_push, get_default_branch
+from code_applier import (
+    parse_llm_files_response,
+    apply_changes_report,
+    apply_changes_stream,
+    format_edit_failures,
+)
+from quality_runner import CHECK_DIRS, format_issues, run_quality_report
+from git_runner import (
+    acquire_worktree,
+    changed_paths,
+    commit_and_push,
+    ensure_branch,
+    fetch_branches,
+    get_default_branch,
+    release_worktree,
+    remote_ref,
+)
 from state_manager import get_iteration, set_iteration
-
+from rate_limiter import RUN_MIN_BUDGET
+from code_outline import OUTLINE_HEADER
+from http_pool import connection_stats
 
 MAX_ITERATIONS = int(os.environ.get("CODE_AGENT_MAX_ITERATIONS", "5"))
+# Сколько вариантов ответа запрашивать у LLM параллельно (берётся вариант с меньшим числом
+# неприменимых блоков edits)
+CANDIDATES = int(os.environ.get("CODE_AGENT_CANDIDATES", "1"))
+# Потоковый ответ LLM: файлы записываются по мере генерации (только при CODE_AGENT_CANDIDATES=1)
+LLM_STREAM = os.environ.get("LLM_STREAM", "") == "1"
+# Файлы от стольких строк (и обрезанные в контексте) LLM правит блоками edits, а не переписывает целиком
+EDIT_MIN_LINES = int(os.environ.get("CODE_AGENT_EDIT_MIN_LINES", "300"))
+# Промежуточные проверки только по записанным файлам и затронутым тестам (полный прогон — финальный)
+SCOPED_CHECKS = os.environ.get("QUALITY_SCOPED", "1") == "1"
+# Каждая ветка — в своём рабочем дереве (git worktree), а не переключением клона: несколько Issue/PR
+# обрабатываются на одном клоне одновременно
+USE_WORKTREES = os.environ.get("GIT_WORKTREES", "0") == "1"
+# В рабочем дереве выгружаются только src/, tests/ и каталоги файлов контекста (sparse-checkout)
+SPARSE_CHECKOUT = os.environ.get("GIT_SPARSE_CHECKOUT", "0") == "1"
 REPO_ROOT = Path(__file__).resolve().parent.parent
 
 
-def run_code_agent(issue_number: int) -> int:
+def _has_files(text: str) -> bool:
+    """Ответ LLM годится в кэш: в нём разобрался хотя бы один файл (не оборван и не пуст)."""
+    return bool(parse_llm_files_response(text))
+
+
+def _generate_files(llm: LLMClient, system_prompt: str, user_prompt: str, root: Path) -> list[dict]:
+    """
+    Запросить у LLM изменения и разобрать список файлов.
+    При CODE_AGENT_CANDIDATES > 1 варианты запрашиваются параллельно (generate_many) и примеряются
+    к рабочему дереву root без записи: берётся вариант с наименьшим числом неприменимых блоков edits
+    (при равенстве — первый по порядку); исключение — только если упали все запросы.
+    """
+    if CANDIDATES <= 1:
+        return parse_llm_files_response(
+            llm.generate_response(system_prompt, user_prompt, as_json=False, validate=_has_files)
+        )
+    responses = llm.generate_many(
+        [(system_prompt, user_prompt)] * CANDIDATES, return_exceptions=True, validate=_has_files
+    )
+    candidates = [
+        files
+        for files in (parse_llm_files_response(r) for r in responses if isinstance(r, str))
+        if files
+    ]
+    if candidates:
+        failures = [len(apply_changes_report(c, root, dry_run=True)["failed"]) for c in candidates]
+        best = failures.index(min(failures))
+        print(
+            f"[Code Agent] Вариантов с файлами: {len(candidates)}, выбран {best + 1} "
+            f"(неприменимых блоков edits: {failures[best]})"
+        )
+        return candidates[best]
+    errors = [r for r in responses if isinstance(r, Exception)]
+    if len(errors) == len(responses):
+        raise errors[0]
+    return []
+
+
+def _large_files(ctx: dict) -> list[str]:
+    """
+    Файлы контекста, которые нужно править блоками edits: не меньше EDIT_MIN_LINES строк, обрезанные
+    или показанные структурой (полное содержимое такого файла модель не видела и переписать его не может).
+    """
+    return [
+        path
+        for path, content in ctx["files"].items()
+        if content.count("\n") >= EDIT_MIN_LINES
+        or content.endswith("... (обрезано)\n")
+        or content.startswith(OUTLINE_HEADER)
+    ]
+
+
+def _generate_and_apply(
+    llm: LLMClient, system_prompt: str, user_prompt: str, root: Path
+) -> tuple[list[dict], dict]:
+    """
+    Получить от LLM файлы и записать их в рабочее дерево root.
+    При LLM_STREAM=1 каждый файл пишется, как только закрылся его объект в потоке ответа.
+    :return: (файлы из ответа, отчёт apply_changes_report: written и failed).
+    """
+    if LLM_STREAM and CANDIDATES <= 1:
+        return apply_changes_stream(
+            llm.stream_response(system_prompt, user_prompt, validate=_has_files),
+            root,
+            on_file=lambda path: print(f"[Code Agent] Записан {path}"),
+        )
+    files = _generate_files(llm, system_prompt, user_prompt, root)
+    return files, apply_changes_report(files, root)
+
+
+def _edit_failures_feedback(prefix: str, failed: list[dict]) -> str:
+    """Напечатать неприменённые блоки edits и вернуть текст о них для следующего запроса к LLM."""
+    print(f"{prefix} Не применено блоков edits: {len(failed)}", file=sys.stderr)
+    return (
+        "\n\n--- Не применённые правки (search не найден в файле; остальные правки уже внесены) ---\n"
+        + format_edit_failures(failed)
+    )
+
+
+def _run_checks(prefix: str, root: Path, touched: list[str], final: bool = False) -> dict:
+    """
+    Проверки после записи файлов: сначала быстрые по touched (SCOPED_CHECKS), и только если они прошли
+    (или это последняя попытка, final) — полный прогон как финальный шлюз перед коммитом.
+    :return: отчёт run_quality_report.
+    """
+    if SCOPED_CHECKS and not final:
+        report = run_quality_report(root, paths=touched)
+        if not report["ok"]:
+            return report
+        print(f"{prefix} Проверки по изменённым файлам прошли, полный прогон.")
+    return run_quality_report(root)
+
+
+def _checkout(
+    branch: str, from_ref: str | None = None, paths: list[str] | None = None, reset: bool = False
+) -> Path | None:
+    """
+    Рабочее дерево ветки: отдельный git worktree (USE_WORKTREES) или сам клон REPO_ROOT, переключённый на ветку.
+    :param from_ref: от чего создать ветку, если её нет.
+    :param reset: поставить ветку на from_ref, даже если она есть (ветка PR — на свежий origin/<ветка>).
+    :param paths: файлы, которые агент будет читать и править — при SPARSE_CHECKOUT в рабочем дереве
+        выгружаются только их каталоги и CHECK_DIRS.
+    :return: корень рабочего дерева или None, если ветку не удалось получить.
+    """
+    if USE_WORKTREES:
+        sparse = [*CHECK_DIRS, *(paths or [])] if SPARSE_CHECKOUT else None
+        return acquire_worktree(REPO_ROOT, branch, from_ref=from_ref, sparse=sparse, reset=reset)
+    ok = ensure_branch(REPO_ROOT, branch, from_branch=from_ref or "main", reset=reset)
+    return REPO_ROOT if ok else None
+
+
+def _release(root: Path) -> None:
+    if root != REPO_ROOT:
+        release_worktree(REPO_ROOT, root)
+
+
+def _checks_feedback(prefix: str, report: dict) -> str:
+    """Напечатать число замечаний проверок и вернуть их текст для следующего запроса к LLM."""
+    print(
+        f"{prefix} Проверки не прошли (замечаний: {len(report['issues'])}), отправляю их в LLM для исправления."
+    )
+    return "\n\n--- Результат проверок (нужно исправить код) ---\n" + format_issues(report)
+
+
+def _budget_exhausted(prefix: str, gh: GithubClient) -> bool:
+    """Остатка лимита GitHub API не хватит на шаги после LLM (PR, метки) — прогон лучше не начинать."""
+    remaining = gh.rate_limit_budget()["remaining"]
+    if 0 <= remaining < RUN_MIN_BUDGET:
+        print(
+            f"{prefix} Осталось {remaining} запросов к GitHub API (нужно не меньше {RUN_MIN_BUDGET}), "
+            "прогон отложен до сброса лимита.",
+            file=sys.stderr,
+        )
+        return True
+    return False
+
+
+def _superseded(prefix: str, cancelled: threading.Event | None) -> bool:
+    """Пришло более новое событие по той же задаче (режим сервиса) — прогон прекращается без коммита."""
+    if cancelled is not None and cancelled.is_set():
+        print(f"{prefix} Прогон отменён: по задаче пришло новое событие.")
+        return True
+    return False
+
+
+def _print_cache_stats(prefix: str, gh: GithubClient, llm: LLMClient) -> None:
+    """Сколько запросов к GitHub API и LLM сэкономили кэши и сколько соединений переиспользовано."""
+    stats = gh.cache_stats()
+    print(
+        f"{prefix} GitHub кэш PR/Issue: загружено {stats['misses']}, сэкономлено запросов {stats['hits']}"
+    )
+    llm_stats = llm.cache_stats()
+    print(f"{prefix} Кэш LLM: попаданий {llm_stats['hits']}, промахов {llm_stats['misses']}")
+    conn = connection_stats()
+    print(
+        f"{prefix} HTTP: запросов {conn['requests']}, соединений {conn['connections']}, повторно использовано {conn['reused']}"
+    )
+
+
+def run_code_agent(
+    issue_number: int,
+    gh: GithubClient | None = None,
+    llm: LLMClient | None = None,
+    cancelled: threading.Event | None = None,
+) -> int:
     """
     Полный цикл: парсинг Issue → генерация кода → применение → проверки (с retry) → ветка → коммит → push → PR.
+    :param gh, llm: готовые клиенты (режим сервиса); без них создаются новые.
+    :param cancelled: установлен — прогон устарел, остановиться до следующего вызова LLM или push.
     :return: 0 при успехе, 1 при ошибке.
     """
-    try:
-        gh = GithubClient()
-    except ValueError as e:
-        print(f"[Code Agent] Ошибка инициализации GitHub: {e}", file=sys.stderr)
-        return 1
+    if gh is None:
+        try:
+            gh = GithubClient()
+        except ValueError as e:
+            print(f"[Code Agent] Ошибка инициализации GitHub: {e}", file=sys.stderr)
+            return 1
 
-    try:
-        llm = LLMClient()
-    except ValueError as e:
-        print(f"[Code Agent] Ошибка инициализации LLM: {e}", file=sys.stderr)
-        return 1
+    if llm is None:
+        try:
+            llm = LLMClient()
+        except ValueError as e:
+            print(f"[Code Agent] Ошибка инициализации LLM: {e}", file=sys.stderr)
+            return 1
 
     print(f"[Code Agent] Issue #{issue_number}")
-    ctx = get_issue_context(gh, issue_number)
-    issue = ctx["issue"]
+    # До сбора контекста и checkout: прогон без бюджета не должен тратить на них запросы и диск
+    if _budget_exhausted("[Code Agent]", gh):
+        return 1
+    ctx = get_issue_context(gh, issue_number, repo_root=REPO_ROOT)
+    print(f"[Code Agent] Контекст: {len(ctx['files'])} файлов (источник: {ctx['source']})")
     branch_name = f"fix/issue-{issue_number}"
     base_branch = get_default_branch(REPO_ROOT)
 
-    # Создать и переключиться на ветку (если ещё не на ней)
-    if not ensure_branch(REPO_ROOT, branch_name, from_branch=base_branch):
+    # Создать ветку и переключиться на неё (в своём рабочем дереве при GIT_WORKTREES=1)
+    # Новая ветка — от origin/<base>, если он есть: локальная base в долгоживущем клоне отстаёт
+    root = _checkout(
+        branch_name, from_ref=remote_ref(REPO_ROOT, base_branch), paths=list(ctx["files"])
+    )
+    if root is None:
         print("[Code Agent] Не удалось создать/переключить ветку.", file=sys.stderr)
         return 1
-    print(f"[Code Agent] Ветка: {branch_name}")
+    print(
+        f"[Code Agent] Ветка: {branch_name}"
+        + (f" (рабочее дерево {root})" if root != REPO_ROOT else "")
+    )
+    try:
+        return _run_issue(gh, llm, ctx, issue_number, branch_name, base_branch, root, cancelled)
+    finally:
+        _release(root)
+
+
+def _run_issue(
+    gh: GithubClient,
+    llm: LLMClient,
+    ctx: dict,
+    issue_number: int,
+    branch_name: str,
+    base_branch: str,
+    root: Path,
+    cancelled: threading.Event | None = None,
+) -> int:
+    """Цикл генерации и проверок в рабочем дереве root, коммит, push и PR."""
+    issue = ctx["issue"]
+    # Повторно перед LLM: сбор контекста тоже расходует лимит
+    if _budget_exhausted("[Code Agent]", gh):
+        return 1
 
     reviewer_feedback = ctx.get("reviewer_feedback")
     context_text = format_context_for_llm(ctx)
-    user_prompt = build_user_prompt(context_text, reviewer_feedback)
+    base_prompt = build_user_prompt(context_text, reviewer_feedback, edit_paths=_large_files(ctx))
 
+    touched: list[str] = []  # все файлы, записанные за прогон (ещё не закоммичены)
+    # Замечания последней итерации заменяют предыдущие — промпт не растёт от итерации к итерации
+    feedback = ""
     for iteration in range(MAX_ITERATIONS):
+        if _superseded("[Code Agent]", cancelled):
+            return 0
         print(f"[Code Agent] Итерация {iteration + 1}/{MAX_ITERATIONS}")
+        user_prompt = base_prompt + feedback
         try:
-            response = llm.generate_response(SYSTEM_PROMPT, user_prompt, as_json=False)
+            files, report = _generate_and_apply(llm, SYSTEM_PROMPT, user_prompt, root)
         except Exception as e:
             print(f"[Code Agent] Ошибка LLM: {e}", file=sys.stderr)
             return 1
 
-        files = parse_llm_files_response(response)
         if not files:
             print("[Code Agent] LLM не вернул список файлов (ожидается JSON с полем files).", file=sys.stderr)
             if iteration < MAX_ITERATIONS - 1:
-                user_prompt = user_prompt + "\n\nОтвет должен быть только JSON: {\"files\": [{\"path\": \"...\", \"content\": \"...\"}]}. Повтори."
+                feedback = '\n\nОтвет должен быть только JSON: {"files": [{"path": "...", "content": "..."}]}. Повтори.'
                 continue
             return 1
 
-        written = apply_changes(files, REPO_ROOT)
+        written = report["written"]
         print(f"[Code Agent] Записано файлов: {len(written)}")
 
-        ok, log = run_quality_checks(REPO_ROOT)
-        if ok:
+        touched = sorted(set(touched) | set(written))
+        checks = _run_checks("[Code Agent]", root, touched, final=iteration == MAX_ITERATIONS - 1)
+        if checks["ok"] and not report["failed"]:
             break
-        print("[Code Agent] Проверки не прошли, отправляю лог в LLM для исправления.")
-        user_prompt = user_prompt + "\n\n--- Результат проверок (нужно исправить код) ---\n" + log
+        feedback = ""
+        if not checks["ok"]:
+            feedback += _checks_feedback("[Code Agent]", checks)
+        if report["failed"]:
+            feedback += _edit_failures_feedback("[Code Agent]", report["failed"])
         if iteration == MAX_ITERATIONS - 1:
             print("[Code Agent] Достигнут лимит итераций, коммит с текущим состоянием.", file=sys.stderr)
 
-    if not written:
+    if not touched:
         print("[Code Agent] Нет изменений для коммита.", file=sys.stderr)
         return 1
 
+    if _superseded("[Code Agent]", cancelled):
+        return 0
+
     # Коммит и push
     commit_message = f"fix: {issue['title']}\n\nCloses #{issue_number}"
-    ok, out = commit_and_push(REPO_ROOT, branch_name, commit_message, paths=written)
+    # Все файлы прогона: правки ранних итераций иначе остались бы незакоммиченными в рабочем дереве
+    ok, out = commit_and_push(root, branch_name, commit_message, paths=touched)
     if not ok:
         print(f"[Code Agent] Ошибка коммита/push: {out}", file=sys.stderr)
         return 1
     print("[Code Agent] Коммит и push выполнены.")
 
     # PR
-    pr_body = f"Closes #{issue_number}\n\n## Изменения\n- {chr(10).join('- ' + p for p in written)}\n\n## Локальные проверки\nruff, black, mypy, pytest выполнены."
+    pr_body = f"Closes #{issue_number}\n\n## Изменения\n- {chr(10).join('- ' + p for p in touched)}\n\n## Локальные проверки\nruff, black, mypy, pytest выполнены."
     try:
         pr = gh.create_pull_request(
             title=f"fix: {issue['title']} (Closes #{issue_number})",
@@ -116,25 +359,39 @@ def run_code_agent(issue_number: int) -> int:
             except Exception:
                 pass
         print(f"[Code Agent] PR: {e}")
+    _print_cache_stats("[Code Agent]", gh, llm)
     return 0
 
 
-def run_code_agent_fix(pr_number: int) -> int:
+def run_code_agent_fix(
+    pr_number: int,
+    gh: GithubClient | None = None,
+    llm: LLMClient | None = None,
+    cancelled: threading.Event | None = None,
+) -> int:
     """
     Режим правок по замечаниям Reviewer: checkout head-ветки PR → контекст с Reviewer → правки → коммит → push.
     Лимит итераций и детектор стагнации прерывают цикл.
+    :param gh, llm: готовые клиенты (режим сервиса); без них создаются новые.
+    :param cancelled: установлен — прогон устарел, остановиться до следующего вызова LLM или push.
     :return: 0 при успехе или при остановке по лимиту/стагнации, 1 при ошибке.
     """
-    try:
-        gh = GithubClient()
-    except ValueError as e:
-        print(f"[Code Agent Fix] Ошибка GitHub: {e}", file=sys.stderr)
-        return 1
+    if gh is None:
+        try:
+            gh = GithubClient()
+        except ValueError as e:
+            print(f"[Code Agent Fix] Ошибка GitHub: {e}", file=sys.stderr)
+            return 1
 
-    try:
-        llm = LLMClient()
-    except ValueError as e:
-        print(f"[Code Agent Fix] Ошибка LLM: {e}", file=sys.stderr)
+    if llm is None:
+        try:
+            llm = LLMClient()
+        except ValueError as e:
+            print(f"[Code Agent Fix] Ошибка LLM: {e}", file=sys.stderr)
+            return 1
+
+    # До сбора контекста и checkout: прогон без бюджета не должен тратить на них запросы и диск
+    if _budget_exhausted("[Code Agent Fix]", gh):
         return 1
 
     current_iteration = get_iteration(gh, pr_number)
@@ -154,32 +411,67 @@ def run_code_agent_fix(pr_number: int) -> int:
         pass
 
     pr_details = gh.get_pr_details(pr_number)
-    head_ref = pr_details["head_ref"]
-    if not checkout_remote_branch(REPO_ROOT, head_ref):
+    head_ref, base_ref = pr_details["head_ref"], pr_details["base_ref"]
+    # Ветки подтягиваются до сбора контекста (он читается из origin/<ветка>); в shallow-клоне — неглубоко
+    fetch_branches(REPO_ROOT, [head_ref, base_ref])
+    ctx = get_issue_context_for_pr(gh, pr_number, repo_root=REPO_ROOT)
+    print(f"[Code Agent Fix] Контекст: {len(ctx['files'])} файлов (источник: {ctx['source']})")
+    paths = list(ctx["files"])
+    if USE_WORKTREES and SPARSE_CHECKOUT:
+        # Изменённые в PR файлы нужны, даже если не вошли в контекст (история углубляется до merge base)
+        paths += changed_paths(REPO_ROOT, f"origin/{base_ref}", f"origin/{head_ref}") or []
+    # Ветка ставится на только что подтянутый head PR: локальная копия с прошлого прогона могла устареть
+    root = _checkout(head_ref, from_ref=f"origin/{head_ref}", paths=paths, reset=True)
+    if root is None:
         print(f"[Code Agent Fix] Не удалось переключиться на ветку {head_ref}", file=sys.stderr)
         return 1
-    print(f"[Code Agent Fix] Ветка: {head_ref}")
+    print(
+        f"[Code Agent Fix] Ветка: {head_ref}"
+        + (f" (рабочее дерево {root})" if root != REPO_ROOT else "")
+    )
+    try:
+        return _run_fix(gh, llm, ctx, pr_number, head_ref, current_iteration, root, cancelled)
+    finally:
+        _release(root)
 
-    ctx = get_issue_context_for_pr(gh, pr_number)
+
+def _run_fix(
+    gh: GithubClient,
+    llm: LLMClient,
+    ctx: dict,
+    pr_number: int,
+    head_ref: str,
+    current_iteration: int,
+    root: Path,
+    cancelled: threading.Event | None = None,
+) -> int:
+    """Правки по замечаниям Reviewer в рабочем дереве root, проверки, коммит и push."""
+    # Повторно перед LLM: сбор контекста тоже расходует лимит
+    if _budget_exhausted("[Code Agent Fix]", gh):
+        return 1
+    if _superseded("[Code Agent Fix]", cancelled):
+        return 0
     context_text = format_context_for_llm(ctx)
     user_prompt = (
         "Ниже контекст: Issue, код из ветки PR, замечания Reviewer. "
         "Внеси только правки по замечаниям. Верни JSON {\"files\": [{\"path\": \"...\", \"content\": \"...\"}]}.\n\n"
         + context_text
     )
+    edit_paths = _large_files(ctx)
+    if edit_paths:
+        user_prompt = edits_hint(edit_paths) + "\n\n" + user_prompt
 
     try:
-        response = llm.generate_response(FIX_PROMPT, user_prompt, as_json=False)
+        files, report = _generate_and_apply(llm, FIX_PROMPT, user_prompt, root)
     except Exception as e:
         print(f"[Code Agent Fix] Ошибка LLM: {e}", file=sys.stderr)
         return 1
 
-    files = parse_llm_files_response(response)
     if not files:
         gh.add_pr_comment(pr_number, "🤖 **Code Agent:** Детектор стагнации — LLM не вернул изменения. Цикл прерван.")
         return 0
 
-    written = apply_changes(files, REPO_ROOT)
+    written = report["written"]
     if not written:
         gh.add_pr_comment(pr_number, "🤖 **Code Agent:** Детектор стагнации — код не изменился после правок. Цикл прерван.")
         try:
@@ -189,20 +481,27 @@ def run_code_agent_fix(pr_number: int) -> int:
         return 0
 
     print(f"[Code Agent Fix] Записано файлов: {len(written)}")
-    ok, log = run_quality_checks(REPO_ROOT)
-    if not ok:
-        user_prompt = user_prompt + "\n\n--- Результат проверок (исправь код) ---\n" + log
+    checks = _run_checks("[Code Agent Fix]", root, written)
+    if not checks["ok"] or report["failed"]:
+        if not checks["ok"]:
+            user_prompt += _checks_feedback("[Code Agent Fix]", checks)
+        if report["failed"]:
+            user_prompt += _edit_failures_feedback("[Code Agent Fix]", report["failed"])
+        if _superseded("[Code Agent Fix]", cancelled):
+            return 0
         try:
-            response2 = llm.generate_response(FIX_PROMPT, user_prompt, as_json=False)
-            files2 = parse_llm_files_response(response2)
+            files2, report2 = _generate_and_apply(llm, FIX_PROMPT, user_prompt, root)
             if files2:
-                written = apply_changes(files2, REPO_ROOT)
-                ok, _ = run_quality_checks(REPO_ROOT)
+                # Второй раунд дополняет первый: пушится правка целиком
+                written = sorted(set(written) | set(report2["written"]))
+                _run_checks("[Code Agent Fix]", root, written, final=True)
         except Exception:
             pass
 
+    if _superseded("[Code Agent Fix]", cancelled):
+        return 0
     commit_message = f"fix: правки по замечаниям ревью (итерация {current_iteration + 1})"
-    ok_push, out = commit_and_push(REPO_ROOT, head_ref, commit_message, paths=written)
+    ok_push, out = commit_and_push(root, head_ref, commit_message, paths=written)
     if not ok_push:
         print(f"[Code Agent Fix] Ошибка push: {out}", file=sys.stderr)
         return 1
@@ -212,4 +511,5 @@ def run_code_agent_fix(pr_number: int) -> int:
     except Exception:
         pass
     print("[Code Agent Fix] Правки запушены.")
+    _print_cache_stats("[Code Agent Fix]", gh, llm)
     return 0
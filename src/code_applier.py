@@ -1,17 +1,21 @@
 """
 Применение изменений кода от LLM к файловой системе.
-Читает JSON с полями path и content, создаёт/перезаписывает файлы.
+Читает JSON с полями path и content (файл целиком) или path и edits (блоки поиска/замены),
+создаёт/перезаписывает файлы.
 """
+
 from __future__ import annotations
 
 import os
+import re
 import json
+import difflib
 from pathlib import Path
-
+from collections.abc import Callable, Iterable
 
 def parse_llm_files_response(text: str) -> list[dict]:
     """
-    Извлечь из ответа LLM список {path, content}.
+    Извлечь из ответа LLM список {path, content} / {path, edits}.
     Допускает обёртку в ```json ... ``` и мелкие артефакты.
     """
     text = text.strip()
@@ -31,28 +35,307 @@ def parse_llm_files_response(text: str) -> list[dict]:
         return []
     out = []
     for item in files:
-        if isinstance(item, dict) and "path" in item and "content" in item:
-            path = item.get("path")
-            content = item.get("content")
-            if path and isinstance(path, str):
-                out.append({"path": path.strip(), "content": content if isinstance(content, str) else ""})
+        normalized = _normalize_file_item(item)
+        if normalized:
+            out.append(normalized)
     return out
 
 
-def apply_changes(files: list[dict], repo_root: str | Path) -> list[str]:
+def _normalize_file_item(item: object) -> dict | None:
+    """Элемент массива files → {path, content} или {path, edits} или None, если он некорректен."""
+    if not isinstance(item, dict):
+        return None
+    path = item.get("path")
+    if not path or not isinstance(path, str):
+        return None
+    if "content" in item:
+        content = item.get("content")
+        return {"path": path.strip(), "content": content if isinstance(content, str) else ""}
+    edits = item.get("edits")
+    if isinstance(edits, list):
+        return {"path": path.strip(), "edits": [_normalize_edit(e) for e in edits]}
+    return None
+
+
+def _normalize_edit(edit: object) -> dict:
+    """Блок правки → {search, replace}; некорректный блок превращается в пустой (и будет отклонён)."""
+    if not isinstance(edit, dict):
+        return {"search": "", "replace": ""}
+    search = edit.get("search")
+    replace = edit.get("replace")
+    return {
+        "search": search if isinstance(search, str) else "",
+        "replace": replace if isinstance(replace, str) else "",
+    }
+
+
+_FILES_ARRAY_RE = re.compile(r'"files"\s*:\s*\[')
+
+
+class FilesStreamParser:
+    """
+    Инкрементальный разбор ответа {"files": [{"path": ..., "content": ...}, ...]}, приходящего по частям.
+    Каждый объект файла отдаётся из feed(), как только закрылась его фигурная скобка
+    (вложенные объекты edits входят в объект файла).
+    """
+
+    def __init__(self) -> None:
+        self.text = ""
+        self._pos = 0  # до какого символа text уже просмотрен
+        self._in_array = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._obj_start = 0
+
+    def feed(self, chunk: str) -> list[dict]:
+        """Добавить фрагмент ответа; вернуть файлы, объекты которых завершились в этом фрагменте."""
+        self.text += chunk
+        out: list[dict] = []
+        if self._done:
+            return out
+        if not self._in_array:
+            m = _FILES_ARRAY_RE.search(self.text)
+            if not m:
+                return out
+            self._in_array = True
+            self._pos = m.end()
+        text = self.text
+        i = self._pos
+        while i < len(text):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                if self._depth == 0:
+                    self._obj_start = i
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        item = _normalize_file_item(json.loads(text[self._obj_start : i + 1]))
+                    except json.JSONDecodeError:
+                        item = None
+                    if item:
+                        out.append(item)
+            elif ch == "]" and self._depth == 0:
+                self._done = True
+                break
+            i += 1
+        self._pos = i
+        return out
+
+
+def apply_changes_stream(
+    chunks: Iterable[str],
+    repo_root: str | Path,
+    on_file: Callable[[str], None] | None = None,
+) -> tuple[list[dict], dict]:
+    """
+    Применять файлы из потокового ответа LLM по мере их готовности (см. FilesStreamParser).
+    Если по ходу потока не разобран ни один файл, весь текст разбирается parse_llm_files_response.
+    :param on_file: вызывается с путём каждого записанного файла сразу после записи.
+    :return: (разобранные файлы, отчёт как у apply_changes_report).
+    """
+    parser = FilesStreamParser()
+    files: list[dict] = []
+    report: dict = {"written": [], "failed": []}
+
+    def apply(items: list[dict]) -> None:
+        part = apply_changes_report(items, repo_root)
+        report["failed"].extend(part["failed"])
+        for path in part["written"]:
+            report["written"].append(path)
+            if on_file:
+                on_file(path)
+
+    for chunk in chunks:
+        items = parser.feed(chunk)
+        files.extend(items)
+        apply(items)
+    if not files:
+        files = parse_llm_files_response(parser.text)
+        apply(files)
+    return files, report
+
+
+# Минимальная похожесть (difflib) фрагмента файла на блок search при нечётком поиске
+EDIT_FUZZY_THRESHOLD = float(os.environ.get("CODE_EDIT_FUZZY_THRESHOLD", "0.9"))
+
+
+def _indent(line: str) -> str:
+    return line[: len(line) - len(line.lstrip())]
+
+
+def _reindent(lines: list[str], old: str, new: str) -> list[str]:
+    """Сменить общий префикс отступа old → new у непустых строк (модель сдвинула блок целиком)."""
+    out = []
+    for line in lines:
+        if line.strip() and line.startswith(old):
+            line = new + line[len(old) :]
+        out.append(line)
+    return out
+
+
+def _find_by_lines(lines: list[str], search: list[str]) -> list[tuple[int, str, str]]:
+    """
+    Совпадения search с окнами lines без учёта хвостовых пробелов и с одинаковым сдвигом отступа.
+    :return: [(индекс начала, отступ в search, отступ в файле)].
+    """
+    n = len(search)
+    k = next((j for j, s in enumerate(search) if s.strip()), 0)
+    old = _indent(search[k])
+    found = []
+    for i in range(len(lines) - n + 1):
+        new = _indent(lines[i + k])
+        shifted = _reindent(search, old, new)
+        if all(w.rstrip() == s.rstrip() for w, s in zip(lines[i : i + n], shifted)):
+            found.append((i, old, new))
+    return found
+
+
+def _find_fuzzy(lines: list[str], search: list[str]) -> tuple[int, float] | None:
+    """Лучшее по похожести окно из len(search) строк; None, если ниже порога или лучших окон несколько."""
+    n = len(search)
+    target = "\n".join(s.strip() for s in search)
+    best: tuple[int, float] | None = None
+    tie = False
+    for i in range(len(lines) - n + 1):
+        window = "\n".join(w.strip() for w in lines[i : i + n])
+        matcher = difflib.SequenceMatcher(None, window, target, autojunk=False)
+        if (
+            matcher.real_quick_ratio() < EDIT_FUZZY_THRESHOLD
+            or matcher.quick_ratio() < EDIT_FUZZY_THRESHOLD
+        ):
+            continue
+        ratio = matcher.ratio()
+        if ratio < EDIT_FUZZY_THRESHOLD:
+            continue
+        if best is None or ratio > best[1]:
+            best, tie = (i, ratio), False
+        elif ratio == best[1]:
+            tie = True
+    return None if tie else best
+
+
+def apply_edits(text: str, edits: list[dict]) -> tuple[str, list[dict]]:
+    """
+    Применить блоки {search, replace} к тексту по очереди.
+    Поиск: точное вхождение → построчно без учёта хвостовых пробелов и сдвига отступа
+    (replace сдвигается так же) → нечётко (difflib, порог EDIT_FUZZY_THRESHOLD).
+    Блок, который не найден или найден неоднозначно, пропускается — остальные применяются.
+    :return: (новый текст, [{index, reason}] для непримененных блоков).
+    """
+    failed: list[dict] = []
+    for index, edit in enumerate(edits):
+        search, replace = edit.get("search", ""), edit.get("replace", "")
+        if not search.strip():
+            failed.append({"index": index, "reason": "пустой блок search"})
+            continue
+        count = text.count(search)
+        if count == 1:
+            text = text.replace(search, replace, 1)
+            continue
+        if count > 1:
+            failed.append(
+                {
+                    "index": index,
+                    "reason": f"search неоднозначен (совпадений: {count}) — добавь контекст",
+                }
+            )
+            continue
+        lines = text.splitlines(keepends=True)
+        search_lines = search.strip("\n").splitlines()
+        replace_lines = replace.strip("\n").splitlines()
+        bare = [line.rstrip("\r\n") for line in lines]
+        found = _find_by_lines(bare, search_lines)
+        if len(found) > 1:
+            failed.append(
+                {
+                    "index": index,
+                    "reason": f"search неоднозначен (совпадений: {len(found)}) — добавь контекст",
+                }
+            )
+            continue
+        if found:
+            start, old, new = found[0]
+        else:
+            fuzzy = _find_fuzzy(bare, search_lines)
+            if fuzzy is None:
+                failed.append({"index": index, "reason": "search не найден в файле"})
+                continue
+            start = fuzzy[0]
+            k = next((j for j, line in enumerate(search_lines) if line.strip()), 0)
+            old, new = _indent(search_lines[k]), _indent(bare[start + k])
+        replace_lines = _reindent(replace_lines, old, new)
+        end = start + len(search_lines)
+        tail = "\n" if end < len(lines) or (lines and lines[-1].endswith("\n")) else ""
+        block = "\n".join(replace_lines) + tail if replace_lines else ""
+        text = "".join(lines[:start]) + block + "".join(lines[end:])
+    return text, failed
+
+
+def apply_changes_report(files: list[dict], repo_root: str | Path, dry_run: bool = False) -> dict:
     """
     Записать файлы в репозиторий. Создаёт директории при необходимости.
-    :return: список записанных путей (относительно repo_root).
+    Для {path, edits} блоки применяются к текущему содержимому файла (apply_edits); файл записывается,
+    если применился хотя бы один блок. Несуществующий файл создаётся из блоков с пустым search.
+    :param dry_run: ничего не записывать — только отчёт (оценка варианта ответа LLM).
+    :return: {"written": записанные пути (относительно repo_root),
+              "failed": [{path, index, reason}] — неприменённые блоки правок}.
     """
     root = Path(repo_root)
     written: list[str] = []
+    failed: list[dict] = []
     for item in files:
         path = item.get("path", "").strip()
-        content = item.get("content", "")
         if not path or ".." in path or path.startswith("/"):
             continue
         full = root / path
-        full.parent.mkdir(parents=True, exist_ok=True)
-        full.write_text(content, encoding="utf-8")
+        if "edits" in item:
+            edits = item["edits"]
+            if not full.is_file():
+                if edits and all(not e.get("search", "").strip() for e in edits):
+                    content = "".join(e.get("replace", "") for e in edits)
+                else:
+                    failed.append({"path": path, "index": None, "reason": "файл не найден"})
+                    continue
+            else:
+                original = full.read_text(encoding="utf-8")
+                content, hunk_failures = apply_edits(original, edits)
+                failed.extend({"path": path, **f} for f in hunk_failures)
+                if content == original:
+                    continue
+        else:
+            content = item.get("content", "")
+        if not dry_run:
+            full.parent.mkdir(parents=True, exist_ok=True)
+            full.write_text(content, encoding="utf-8")
         written.append(path)
-    return written
+    return {"written": written, "failed": failed}
+
+
+def apply_changes(files: list[dict], repo_root: str | Path) -> list[str]:
+    """
+    Записать файлы в репозиторий (см. apply_changes_report).
+    :return: список записанных путей (относительно repo_root).
+    """
+    return apply_changes_report(files, repo_root)["written"]
+
+
+def format_edit_failures(failed: list[dict]) -> str:
+    """Текст для LLM о неприменённых блоках правок (чтобы прислать их заново)."""
+    lines = []
+    for f in failed:
+        where = f"{f['path']}" + (f", блок {f['index'] + 1}" if f.get("index") is not None else "")
+        lines.append(f"- {where}: {f['reason']}")
+    return "\n".join(lines)
@@ -0,0 +1,88 @@
+"""
+Структура (outline) Python-файла для контекста LLM: импорты, константы, сигнатуры классов и функций
+с декораторами и docstring, тела функций заменены на «...».
+Цель: большой файл, не относящийся к задаче напрямую, занимает в промпте в разы меньше токенов,
+но модель видит его API и может на него опираться.
+"""
+
+from __future__ import annotations
+
+import ast
+
+OUTLINE_HEADER = "# (структура файла: тела функций опущены)\n"
+# Присваивание длиннее стольких строк сворачивается до первой строки
+MAX_ASSIGN_LINES = 3
+
+
+def _start(node: ast.stmt) -> int:
+    """Первая строка узла с учётом декораторов (1-based)."""
+    decorators = getattr(node, "decorator_list", None) or []
+    return min([node.lineno, *(d.lineno for d in decorators)])
+
+
+def _docstring_node(node: ast.AST) -> ast.Expr | None:
+    body = getattr(node, "body", None) or []
+    if (
+        body
+        and isinstance(body[0], ast.Expr)
+        and isinstance(body[0].value, ast.Constant)
+        and isinstance(body[0].value.value, str)
+    ):
+        return body[0]
+    return None
+
+
+def _indent_of(line: str) -> str:
+    return line[: len(line) - len(line.lstrip())]
+
+
+def _outline_body(lines: list[str], body: list[ast.stmt], out: list[str]) -> None:
+    for node in body:
+        start, end = _start(node), node.end_lineno or node.lineno
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            doc = _docstring_node(node)
+            rest = node.body[1:] if doc else node.body
+            if node.body[0].lineno == node.lineno:
+                header_end = end  # однострочное «def f(): return x» — целиком
+            elif doc:
+                header_end = doc.end_lineno or doc.lineno
+            else:
+                header_end = node.body[0].lineno - 1  # сигнатура может занимать несколько строк
+            out.extend(lines[start - 1 : header_end])
+            if header_end >= end:
+                continue
+            body_indent = (
+                _indent_of(lines[rest[0].lineno - 1])
+                if rest
+                else _indent_of(lines[start - 1]) + "    "
+            )
+            if isinstance(node, ast.ClassDef):
+                _outline_body(lines, rest, out)
+            else:
+                out.append(f"{body_indent}...\n")
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            out.extend(lines[start - 1 : end])
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            if end - start + 1 <= MAX_ASSIGN_LINES:
+                out.extend(lines[start - 1 : end])
+            else:
+                out.append(lines[start - 1].rstrip("\n") + "  # ...\n")
+        elif (
+            isinstance(node, ast.Expr) and node is body[0] and isinstance(node.value, ast.Constant)
+        ):
+            out.extend(lines[start - 1 : end])  # docstring модуля
+        # Прочие инструкции верхнего уровня (if __name__, вызовы) опускаются
+
+
+def outline_python(source: str) -> str | None:
+    """Outline Python-кода (начинается с OUTLINE_HEADER) или None, если код не разбирается."""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+    lines = source.splitlines(keepends=True)
+    if lines and not lines[-1].endswith("\n"):
+        lines[-1] += "\n"
+    out: list[str] = []
+    _outline_body(lines, tree.body, out)
+    return OUTLINE_HEADER + "".join(out)
@@ -0,0 +1,248 @@
+"""
+Ранжирование файлов репозитория по релевантности Issue и упаковка в бюджет токенов.
+Цель: в промпт попадают файлы, нужные для задачи (а не первые по алфавиту), и ровно столько,
+сколько вмещает контекст модели — меньше токенов, быстрее ответ и меньше итераций.
+Оценка: упоминание пути/модуля в тексте, определения упомянутых идентификаторов,
+BM25 по содержимому и близость по графу импортов к лучшим файлам.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import re
+from collections import Counter
+from typing import TYPE_CHECKING
+
+from code_outline import outline_python
+from repo_index import module_name as _module_name
+
+if TYPE_CHECKING:
+    from repo_index import RepoIndex
+
+# Бюджет токенов на файлы контекста по провайдеру (CONTEXT_TOKEN_BUDGET задаёт его для любого)
+CONTEXT_TOKEN_BUDGETS = {
+    "openai": 24000,
+    "yandex": 8000,
+}
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "0"))
+# Примерно символов на токен (код и смешанный русско-английский текст)
+CHARS_PER_TOKEN = 3.0
+# Параметры BM25
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Доля оценки файла, которую получают его соседи по импортам
+IMPORT_PROXIMITY = 0.5
+
+# Веса сигналов
+PATH_MENTION_SCORE = 10.0
+NAME_MENTION_SCORE = 5.0
+SYMBOL_DEFINITION_SCORE = 4.0
+BM25_MAX_SCORE = 5.0
+# Релевантный файл, не влезающий целиком, обрезается под остаток бюджета, если остаток не меньше этого
+MIN_TRUNCATED_TOKENS = 500
+TRUNCATED_MARKER = "\n... (обрезано)\n"
+# Python-файл больше стольких токенов, не относящийся к задаче напрямую, попадает в промпт в виде outline
+OUTLINE_MIN_TOKENS = int(os.environ.get("CONTEXT_OUTLINE_MIN_TOKENS", "1500"))
+# Файл считается относящимся к задаче, если его оценка не ниже этой доли от лучшей
+RELEVANT_FRACTION = 0.5
+
+_IDENT_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]{2,}")
+_PATH_RE = re.compile(r"[\w./-]+\.\w+")
+_DEFINITION_RE = re.compile(r"^\s*(?:async\s+def|def|class)\s+([A-Za-z_]\w*)", re.MULTILINE)
+_IMPORT_RE = re.compile(r"^\s*(?:from\s+([\w.]+)\s+import|import\s+([\w., ]+))", re.MULTILINE)
+_CAMEL_SPLIT_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+
+def token_budget(provider: str | None = None) -> int:
+    """Бюджет токенов на файлы контекста для провайдера (по умолчанию — LLM_PROVIDER)."""
+    if CONTEXT_TOKEN_BUDGET > 0:
+        return CONTEXT_TOKEN_BUDGET
+    provider = (provider or os.environ.get("LLM_PROVIDER", "yandex")).lower()
+    return CONTEXT_TOKEN_BUDGETS.get(provider, min(CONTEXT_TOKEN_BUDGETS.values()))
+
+
+def estimate_tokens(text: str) -> int:
+    """Грубая оценка числа токенов без токенизатора провайдера."""
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+
+def _terms(text: str) -> list[str]:
+    """Термы для BM25: идентификаторы, разбитые по snake_case и CamelCase, в нижнем регистре."""
+    out: list[str] = []
+    for ident in _IDENT_RE.findall(text):
+        for part in ident.split("_"):
+            out.extend(w.lower() for w in _CAMEL_SPLIT_RE.findall(part) if len(w) >= 3)
+    return out
+
+
+def _mention_scores(text: str, paths: list[str]) -> dict[str, float]:
+    """Оценка за упоминание в тексте пути файла, его имени или имени модуля."""
+    lowered = text.lower()
+    mentioned = {m.strip("./").lower() for m in _PATH_RE.findall(text)}
+    words = set(_IDENT_RE.findall(text))
+    scores: dict[str, float] = {}
+    for path in paths:
+        low = path.lower()
+        name = low.rsplit("/", 1)[-1]
+        stem = name.rsplit(".", 1)[0]
+        module = _module_name(path)
+        if low in mentioned or any(
+            m.endswith("/" + low) or low.endswith("/" + m) for m in mentioned if "/" in m
+        ):
+            scores[path] = PATH_MENTION_SCORE
+        elif name in mentioned or (path.endswith(".py") and "." in module and module in lowered):
+            scores[path] = NAME_MENTION_SCORE
+        elif path.endswith(".py") and len(stem) >= 4 and stem != "__init__" and stem in words:
+            scores[path] = NAME_MENTION_SCORE / 2
+    return scores
+
+
+def path_scores(text: str, paths: list[str], index: RepoIndex | None = None) -> dict[str, float]:
+    """
+    Быстрая оценка до загрузки содержимого (какие файлы загружать первыми): по путям и,
+    если есть индекс репозитория, по определениям упомянутых в тексте идентификаторов.
+    """
+    scores = _mention_scores(text, paths)
+    if index is not None:
+        for ident in set(_IDENT_RE.findall(text)):
+            for found in index.definitions(ident):
+                scores[found["path"]] = scores.get(found["path"], 0.0) + SYMBOL_DEFINITION_SCORE
+    return scores
+
+
+def _bm25(query: list[str], docs: dict[str, list[str]]) -> dict[str, float]:
+    if not docs:
+        return {}
+    n = len(docs)
+    avg_len = sum(len(d) for d in docs.values()) / n or 1.0
+    df: Counter[str] = Counter()
+    for terms in docs.values():
+        df.update(set(terms))
+    query_terms = set(query)
+    scores: dict[str, float] = {}
+    for path, terms in docs.items():
+        tf = Counter(terms)
+        score = 0.0
+        for term in query_terms:
+            if not tf[term]:
+                continue
+            idf = math.log(1 + (n - df[term] + 0.5) / (df[term] + 0.5))
+            norm = tf[term] + BM25_K1 * (1 - BM25_B + BM25_B * len(terms) / avg_len)
+            score += idf * tf[term] * (BM25_K1 + 1) / norm
+        if score:
+            scores[path] = score
+    return scores
+
+
+def _import_graph(contents: dict[str, str]) -> dict[str, set[str]]:
+    """Неориентированный граф импортов между Python-файлами из contents."""
+    by_module: dict[str, str] = {}
+    for path in contents:
+        if path.endswith(".py"):
+            module = _module_name(path)
+            by_module.setdefault(module, path)
+            # Модули из tests/ и подпакетов часто импортируются по короткому имени
+            by_module.setdefault(module.rsplit(".", 1)[-1], path)
+    graph: dict[str, set[str]] = {path: set() for path in contents}
+    for path, content in contents.items():
+        if not path.endswith(".py"):
+            continue
+        for from_module, import_list in _IMPORT_RE.findall(content):
+            names = (
+                [from_module]
+                if from_module
+                else [m.strip().split(" ")[0] for m in import_list.split(",")]
+            )
+            for name in names:
+                target = by_module.get(name) or by_module.get(name.rsplit(".", 1)[-1])
+                if target and target != path:
+                    graph[path].add(target)
+                    graph[target].add(path)
+    return graph
+
+
+def rank_files(
+    text: str,
+    contents: dict[str, str],
+    pinned: list[str] | None = None,
+) -> list[tuple[str, float]]:
+    """
+    Оценить файлы по релевантности тексту задачи.
+    :param pinned: файлы, которые заведомо нужны (например, изменённые в PR) — идут первыми.
+    :return: [(путь, оценка)] по убыванию оценки; при равенстве — в исходном порядке contents.
+    """
+    paths = list(contents)
+    scores = dict.fromkeys(paths, 0.0)
+    for path, score in _mention_scores(text, paths).items():
+        scores[path] += score
+
+    identifiers = set(_IDENT_RE.findall(text))
+    for path, content in contents.items():
+        defined = set(_DEFINITION_RE.findall(content)) & identifiers
+        scores[path] += SYMBOL_DEFINITION_SCORE * len(defined)
+
+    bm25 = _bm25(_terms(text), {path: _terms(content) for path, content in contents.items()})
+    if bm25:
+        top = max(bm25.values())
+        for path, score in bm25.items():
+            scores[path] += BM25_MAX_SCORE * score / top
+
+    pinned_set = set(pinned or ())
+    graph = _import_graph(contents)
+    base = dict(scores)
+    for path in paths:
+        if path in pinned_set:
+            base[path] = max(base[path], PATH_MENTION_SCORE)
+    for path, neighbours in graph.items():
+        if neighbours:
+            scores[path] += IMPORT_PROXIMITY * max(base[n] for n in neighbours)
+
+    order = {path: i for i, path in enumerate(paths)}
+    return sorted(
+        ((path, scores[path]) for path in paths),
+        key=lambda item: (item[0] not in pinned_set, -item[1], order[item[0]]),
+    )
+
+
+def _truncate(content: str, tokens: int) -> str:
+    """Обрезать текст под бюджет токенов по границе строки и пометить обрезку."""
+    limit = max(int((tokens - 1) * CHARS_PER_TOKEN) - len(TRUNCATED_MARKER), 0)
+    cut = content.rfind("\n", 0, limit) + 1 or limit
+    return content[:cut].rstrip("\n") + TRUNCATED_MARKER
+
+
+def select_context(
+    text: str,
+    contents: dict[str, str],
+    budget: int,
+    pinned: list[str] | None = None,
+) -> dict[str, str]:
+    """
+    Жадно упаковать файлы в бюджет токенов в порядке rank_files.
+    Относящиеся к задаче файлы (pinned или оценка не ниже RELEVANT_FRACTION от лучшей) идут целиком,
+    а если не помещаются — обрезаются под остаток бюджета (при остатке от MIN_TRUNCATED_TOKENS).
+    Остальные Python-файлы больше OUTLINE_MIN_TOKENS заменяются структурой (code_outline);
+    не поместившиеся файлы пропускаются — место достаётся следующим.
+    :return: path -> content в порядке убывания релевантности.
+    """
+    ranked = rank_files(text, contents, pinned)
+    top = max((score for _, score in ranked), default=0.0)
+    pinned_set = set(pinned or ())
+    selected: dict[str, str] = {}
+    used = 0
+    for path, score in ranked:
+        content = contents[path]
+        relevant = path in pinned_set or (score > 0 and score >= RELEVANT_FRACTION * top)
+        if not relevant and path.endswith(".py") and estimate_tokens(content) > OUTLINE_MIN_TOKENS:
+            content = outline_python(content) or content
+        cost = estimate_tokens(content)
+        if used + cost > budget:
+            left = budget - used
+            if not relevant or left < MIN_TRUNCATED_TOKENS:
+                continue
+            content = _truncate(content, left)
+            cost = estimate_tokens(content)
+        selected[path] = content
+        used += cost
+    return selected
@@ -0,0 +1,114 @@
+"""
+Ограниченный по размеру дисковый кэш (каталог с JSON-файлами).
+Цель: переиспользовать ответы GitHub/LLM между запусками; каталог можно сохранять через actions/cache.
+Вытеснение — по давности последнего обращения (mtime файла), срок жизни записи — опционально (ttl).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+
+def cache_key(*parts: Any) -> str:
+    """Стабильный ключ (sha256) из произвольных JSON-сериализуемых частей."""
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """
+    Кэш key -> dict в каталоге directory.
+    :param max_bytes: предельный суммарный размер; при превышении удаляются давно не читанные записи.
+    :param ttl: срок жизни записи в секундах (None — бессрочно).
+    """
+
+    def __init__(self, directory: str | Path, max_bytes: int, ttl: float | None = None):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._size = sum(p.stat().st_size for p in self._entries())
+
+    def _entries(self) -> list[Path]:
+        return [p for p in self.directory.glob("*/*.json") if p.is_file()]
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> dict | None:
+        """Значение по ключу или None (нет записи, запись устарела или повреждена)."""
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+            if self.ttl is not None and time.time() - entry["created"] > self.ttl:
+                self._remove(path)
+                raise KeyError(key)
+            os.utime(path)  # отметка обращения для LRU-вытеснения
+        except (OSError, ValueError, KeyError, TypeError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return entry["value"]
+
+    def set(self, key: str, value: dict) -> None:
+        """Сохранить значение; при превышении max_bytes вытеснить старые записи."""
+        path = self._path(key)
+        data = json.dumps({"created": time.time(), "value": value}, ensure_ascii=False)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            old_size = path.stat().st_size if path.exists() else 0
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_text(data, encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError:
+            return
+        with self._lock:
+            self._size += path.stat().st_size - old_size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _remove(self, path: Path) -> None:
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except OSError:
+            return
+        with self._lock:
+            self._size -= size
+
+    def _evict(self) -> None:
+        """Удалять записи с самым старым mtime, пока размер не опустится до 90% лимита. Вызывать под _lock."""
+        entries = []
+        for p in self._entries():
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        entries.sort()
+        self._size = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        for _, size, p in entries:
+            if self._size <= target:
+                break
+            try:
+                p.unlink()
+            except OSError:
+                continue
+            self._size -= size
+
+    def stats(self) -> dict:
+        """hits, misses и текущий размер каталога в байтах."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "bytes": self._size}
@@ -5,20 +5,61 @@ Git: создание ветки, коммит, push. Для использов
 from __future__ import annotations
 
 import os
+import re
+import shutil
 import subprocess
 import sys
+import threading
+import time
 from pathlib import Path
+from collections.abc import Iterator
 
+GIT_TIMEOUT = 60
+GIT_PUSH_TIMEOUT = int(os.environ.get("GIT_PUSH_TIMEOUT", "300"))
+# Суммарная длина путей в одном вызове git add (с запасом под ограничение командной строки Windows)
+ADD_CHUNK_CHARS = 30000
+# dulwich — индекс и коммит в процессе, без запуска git на каждый шаг (push всё равно через git)
+GIT_BACKEND = os.environ.get("GIT_BACKEND", "cli")
 
-def run_git(args: list[str], cwd: Path) -> tuple[bool, str]:
-    """Выполнить git команду."""
+# Глубина fetch веток, если клон shallow (как после actions/checkout); полный клон shallow не делается.
+# 0 — без ограничения
+GIT_FETCH_DEPTH = int(os.environ.get("GIT_FETCH_DEPTH", "50"))
+# Фильтр partial clone для fetch: blob:none — содержимое файлов догружается только для нужных путей
+GIT_FETCH_FILTER = os.environ.get("GIT_FETCH_FILTER", "")
+# Коммитов истории, до которых углубляется shallow-клон в поиске merge base (дальше — --unshallow)
+GIT_DEEPEN_MAX = int(os.environ.get("GIT_DEEPEN_MAX", "1000"))
+
+# Каталог рабочих деревьев (git worktree) веток агента; по умолчанию — <клон>-worktrees рядом с клоном
+GIT_WORKTREES_DIR = os.environ.get("GIT_WORKTREES_DIR", "")
+# Рабочее дерево, не использовавшееся столько часов, удаляется при следующем acquire_worktree
+WORKTREE_MAX_AGE_HOURS = float(os.environ.get("GIT_WORKTREE_MAX_AGE_HOURS", "24"))
+
+# Репозитории, для которых в этом процессе уже настроены user.* и origin
+_prepared: set[Path] = set()
+
+# Рабочее дерево -> блокировка: одна ветка обрабатывается одним потоком за раз
+_worktree_locks: dict[Path, threading.Lock] = {}
+_worktree_locks_guard = threading.Lock()
+_fetch_lock = threading.Lock()
+_LOCK_REASON_RE = re.compile(r"agent pid (\d+)")
+
+
+def run_git(
+    args: list[str],
+    cwd: Path,
+    input: str | None = None,
+    timeout: float = GIT_TIMEOUT,
+) -> tuple[bool, str]:
+    """Выполнить git команду (input — в stdin). Сообщения git — на английском (разбор «nothing to commit»)."""
     try:
         r = subprocess.run(
             ["git"] + args,
             cwd=cwd,
+            env={**os.environ, "LC_ALL": "C"},
+            input=input,
             capture_output=True,
             text=True,
-            timeout=60,
+            timeout=timeout,
         )
         out = (r.stdout or "").strip() + "\n" + (r.stderr or "").strip()
         return r.returncode == 0, out
@@ -26,8 +67,16 @@ def run_git(args: list[str], cwd: Path) -> tuple[bool, str]:
         return False, str(e)
 
 
-def ensure_branch(repo_root: Path, branch_name: str, from_branch: str = "main") -> bool:
-    """Создать ветку (если не существует) и переключиться на неё."""
+def ensure_branch(
+    repo_root: Path, branch_name: str, from_branch: str = "main", reset: bool = False
+) -> bool:
+    """
+    Создать ветку (если не существует) и переключиться на неё.
+    :param reset: ветка существует — всё равно поставить её на from_branch (локальные правки отбрасываются).
+    """
+    if reset:
+        ok, _ = run_git(["checkout", "-q", "-f", "-B", branch_name, from_branch], repo_root)
+        return ok
     ok, _ = run_git(["rev-parse", "--verify", branch_name], repo_root)
     if ok:
         run_git(["checkout", branch_name], repo_root)
@@ -36,9 +85,87 @@ def ensure_branch(repo_root: Path, branch_name: str, from_branch: str = "main")
     return ok
 
 
+def _is_shallow(repo_root: Path) -> bool:
+    ok, out = run_git(["rev-parse", "--is-shallow-repository"], repo_root)
+    return ok and out.strip() == "true"
+
+
+def _refspecs(branches: list[str]) -> list[str]:
+    return [f"+refs/heads/{b}:refs/remotes/origin/{b}" for b in branches]
+
+
+def _fetch_options() -> list[str]:
+    return [f"--filter={GIT_FETCH_FILTER}"] if GIT_FETCH_FILTER else []
+
+
+def remote_ref(repo_root: Path, branch: str) -> str:
+    """origin/<branch>, если он есть в клоне (свежее локальной ветки), иначе сама ветка."""
+    ok, _ = run_git(
+        ["rev-parse", "--verify", "--quiet", f"refs/remotes/origin/{branch}"], repo_root
+    )
+    return f"origin/{branch}" if ok else branch
+
+
+def fetch_branches(repo_root: Path, branches: list[str]) -> bool:
+    """
+    Подтянуть ветки из origin в origin/<ветка> одним fetch: в shallow-клоне — не глубже GIT_FETCH_DEPTH
+    коммитов, с фильтром GIT_FETCH_FILTER (partial clone) — без содержимого файлов.
+    """
+    options = _fetch_options()
+    if GIT_FETCH_DEPTH > 0 and _is_shallow(repo_root):
+        options.append(f"--depth={GIT_FETCH_DEPTH}")
+    # Параллельные задачи сервиса обновляют одни и те же refs/remotes — fetch по одному
+    with _fetch_lock:
+        ok, out = run_git(
+            ["fetch", *options, "origin", *_refspecs(branches)], repo_root, timeout=GIT_PUSH_TIMEOUT
+        )
+    if not ok:
+        print(f"[Git] fetch {' '.join(branches)}: {out.strip()}", file=sys.stderr)
+    return ok
+
+
+def ensure_merge_base(repo_root: Path, a: str, b: str) -> str | None:
+    """
+    Merge base двух коммитов; в shallow-клоне история веток origin/* углубляется по требованию
+    (шаг удваивается, до GIT_DEEPEN_MAX коммитов, затем --unshallow).
+    :return: sha merge base или None, если общей истории нет.
+    """
+    branches = [ref.removeprefix("origin/") for ref in (a, b) if ref.startswith("origin/")]
+    step, deepened = max(GIT_FETCH_DEPTH, 50), 0
+    while True:
+        ok, out = run_git(["merge-base", a, b], repo_root)
+        if ok and out.strip():
+            return out.split()[0]
+        if not _is_shallow(repo_root):
+            return None
+        if deepened >= GIT_DEEPEN_MAX:
+            run_git(
+                ["fetch", "--unshallow", *_fetch_options(), "origin", *_refspecs(branches)],
+                repo_root,
+                timeout=GIT_PUSH_TIMEOUT,
+            )
+            ok, out = run_git(["merge-base", a, b], repo_root)
+            return out.split()[0] if ok and out.strip() else None
+        run_git(
+            ["fetch", f"--deepen={step}", *_fetch_options(), "origin", *_refspecs(branches)],
+            repo_root,
+            timeout=GIT_PUSH_TIMEOUT,
+        )
+        deepened += step
+        step *= 2
+
+
+def changed_paths(repo_root: Path, base: str, head: str) -> list[str] | None:
+    """Файлы, изменённые в head относительно merge base с base (git diff base...head); None — нет общей истории."""
+    if ensure_merge_base(repo_root, base, head) is None:
+        return None
+    ok, out = run_git(["diff", "--name-only", "-z", f"{base}...{head}"], repo_root)
+    return [p for p in out.strip().split("\0") if p] if ok else None
+
+
 def checkout_remote_branch(repo_root: Path, branch_name: str) -> bool:
     """Подтянуть и переключиться на удалённую ветку (для режима правок по PR)."""
-    run_git(["fetch", "origin", branch_name], repo_root)
+    fetch_branches(repo_root, [branch_name])
     ok, _ = run_git(["checkout", branch_name], repo_root)
     return ok
 
@@ -49,10 +176,99 @@ def set_remote_push_url(repo_root: Path, token: str, repo_slug: str) -> None:
     run_git(["remote", "set-url", "origin", url], repo_root)
 
 
+def _git_identity() -> tuple[str, str]:
+    return (
+        os.environ.get("GIT_USER_NAME", "github-actions[bot]"),
+        os.environ.get("GIT_USER_EMAIL", "github-actions[bot]@users.noreply.github.com"),
+    )
+
+
 def _ensure_git_user(repo_root: Path) -> None:
     """Установить user.name и user.email для коммита (в т.ч. в GitHub Actions)."""
-    run_git(["config", "user.name", os.environ.get("GIT_USER_NAME", "github-actions[bot]")], repo_root)
-    run_git(["config", "user.email", os.environ.get("GIT_USER_EMAIL", "github-actions[bot]@users.noreply.github.com")], repo_root)
+    name, email = _git_identity()
+    run_git(["config", "user.name", name], repo_root)
+    run_git(["config", "user.email", email], repo_root)
+
+
+def _prepare_repo(repo_root: Path) -> None:
+    """user.* и origin с токеном — один раз за процесс на репозиторий (настройки не меняются между коммитами)."""
+    root = Path(repo_root).resolve()
+    if root in _prepared:
+        return
+    _ensure_git_user(repo_root)
+    token = os.environ.get("GITHUB_TOKEN")
+    repo_slug = os.environ.get("GITHUB_REPOSITORY")
+    if token and repo_slug:
+        set_remote_push_url(repo_root, token, repo_slug)
+    _prepared.add(root)
+
+
+def _chunks(paths: list[str], limit: int = ADD_CHUNK_CHARS) -> Iterator[list[str]]:
+    """Разбить пути на группы с суммарной длиной не больше limit (путь длиннее limit — отдельной группой)."""
+    chunk: list[str] = []
+    size = 0
+    for path in paths:
+        if chunk and size + len(path) + 1 > limit:
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(path)
+        size += len(path) + 1
+    if chunk:
+        yield chunk
+
+
+def _nothing_to_commit(out: str) -> bool:
+    return any(
+        m in out
+        for m in ("nothing to commit", "nothing added to commit", "no changes added to commit")
+    )
+
+
+def _commit_cli(repo_root: Path, message: str, paths: list[str] | None) -> tuple[bool | None, str]:
+    """
+    git add одним вызовом на группу путей и git commit только по этим путям (--pathspec-from-file).
+    :return: (True, вывод), (False, ошибка) или (None, ...), если коммитить нечего.
+    """
+    if paths:
+        for chunk in _chunks(paths):
+            # --sparse: новый файл может лечь вне sparse-checkout рабочего дерева
+            ok, out = run_git(["add", "-A", "--sparse", "--", *chunk], repo_root)
+            if not ok:
+                return False, out
+        ok, out = run_git(
+            ["commit", "-m", message, "--pathspec-from-file=-", "--pathspec-file-nul"],
+            repo_root,
+            input="\0".join(paths),
+        )
+    else:
+        ok, out = run_git(["add", "-A"], repo_root)
+        if not ok:
+            return False, out
+        ok, out = run_git(["commit", "-m", message], repo_root)
+    if not ok and _nothing_to_commit(out):
+        return None, out
+    return ok, out
+
+
+def _commit_dulwich(repo_root: Path, message: str, paths: list[str]) -> tuple[bool | None, str]:
+    """Коммит через dulwich: пути индексируются и коммит пишется в процессе, без git add/commit."""
+    from dulwich.repo import Repo
+
+    name, email = _git_identity()
+    identity = f"{name} <{email}>".encode()
+    repo = Repo(str(repo_root))
+    try:
+        # dulwich >= 0.23: stage/commit у рабочего дерева; раньше — у Repo (stage/do_commit)
+        worktree = repo.get_worktree() if hasattr(repo, "get_worktree") else None
+        (worktree or repo).stage(paths)
+        tree = repo.open_index().commit(repo.object_store)
+        if repo[repo.head()].tree == tree:
+            return None, "(нет изменений)"
+        commit = worktree.commit if worktree is not None else repo.do_commit
+        sha = commit(message.encode(), committer=identity, author=identity)
+    finally:
+        repo.close()
+    return True, sha.decode()
 
 
 def commit_and_push(
@@ -63,28 +279,209 @@ def commit_and_push(
 ) -> tuple[bool, str]:
     """
     Добавить файлы, коммит, push.
-    :param paths: список путей для add; если None — add -A.
+    :param paths: пути для коммита (в коммит идут только они); если None — add -A.
     """
-    _ensure_git_user(repo_root)
-    token = os.environ.get("GITHUB_TOKEN")
-    repo_slug = os.environ.get("GITHUB_REPOSITORY")
-    if token and repo_slug:
-        set_remote_push_url(repo_root, token, repo_slug)
-    if paths:
-        for p in paths:
-            run_git(["add", p], repo_root)
-    else:
-        run_git(["add", "-A"], repo_root)
-    ok, out = run_git(["status", "--short"], repo_root)
-    if not out.strip():
+    _prepare_repo(repo_root)
+    committed: tuple[bool | None, str] | None = None
+    if GIT_BACKEND == "dulwich" and paths:
+        try:
+            committed = _commit_dulwich(repo_root, message, paths)
+        except ImportError:
+            print("[Git] dulwich не установлен, коммит через git.", file=sys.stderr)
+        except Exception as e:
+            print(f"[Git] Коммит через dulwich не удался ({e}), коммит через git.", file=sys.stderr)
+    if committed is None:
+        committed = _commit_cli(repo_root, message, paths)
+    ok, out = committed
+    if ok is None:
         return True, "(нет изменений)"
-    ok, out1 = run_git(["commit", "-m", message], repo_root)
     if not ok:
-        return False, out1
-    ok, out2 = run_git(["push", "-u", "origin", branch_name], repo_root)
+        return False, out
+    ok, out2 = run_git(["push", "-u", "origin", branch_name], repo_root, timeout=GIT_PUSH_TIMEOUT)
     return ok, out2
 
 
+def worktrees_dir(repo_root: Path) -> Path:
+    """Каталог рабочих деревьев агента для клона repo_root."""
+    if GIT_WORKTREES_DIR:
+        return Path(GIT_WORKTREES_DIR).resolve()
+    root = Path(repo_root).resolve()
+    return root.parent / f"{root.name}-worktrees"
+
+
+def worktree_path(repo_root: Path, branch: str) -> Path:
+    """Путь рабочего дерева ветки: fix/issue-5 → <worktrees_dir>/fix-issue-5."""
+    return worktrees_dir(repo_root) / re.sub(r"[^\w.-]+", "-", branch).strip("-")
+
+
+def list_worktrees(repo_root: Path) -> list[dict]:
+    """Зарегистрированные рабочие деревья клона: [{path, branch, locked}] (locked — причина или None)."""
+    ok, out = run_git(["worktree", "list", "--porcelain"], repo_root)
+    if not ok:
+        return []
+    trees: list[dict] = []
+    for line in out.splitlines():
+        key, _, value = line.partition(" ")
+        if key == "worktree":
+            trees.append({"path": Path(value), "branch": None, "locked": None})
+        elif trees and key == "branch":
+            trees[-1]["branch"] = value.removeprefix("refs/heads/")
+        elif trees and key == "locked":
+            trees[-1]["locked"] = value or "locked"
+    return trees
+
+
+def _lock_alive(reason: str) -> bool:
+    """Блокировка от процесса агента на этой машине жива, пока жив процесс; чужие блокировки не трогаем."""
+    m = _LOCK_REASON_RE.search(reason)
+    if not m:
+        return True
+    try:
+        os.kill(int(m.group(1)), 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def gc_worktrees(repo_root: Path, max_age_hours: float = WORKTREE_MAX_AGE_HOURS) -> list[Path]:
+    """
+    Удалить рабочие деревья агента, не использовавшиеся max_age_hours (кроме занятых живыми процессами),
+    и регистрации деревьев, чьих каталогов больше нет. Ветки остаются.
+    :return: удалённые пути.
+    """
+    base = worktrees_dir(repo_root)
+    removed: list[Path] = []
+    for tree in list_worktrees(repo_root):
+        path = tree["path"]
+        if path.parent != base:
+            continue
+        with _worktree_locks_guard:
+            held = path in _worktree_locks and _worktree_locks[path].locked()
+        if held or (tree["locked"] and _lock_alive(tree["locked"])):
+            continue
+        try:
+            age = time.time() - path.stat().st_mtime
+        except OSError:
+            age = float("inf")
+        if age < max_age_hours * 3600:
+            continue
+        ok, _ = run_git(["worktree", "remove", "--force", "--force", str(path)], repo_root)
+        if ok:
+            removed.append(path)
+    run_git(["worktree", "prune"], repo_root)
+    return removed
+
+
+def _sparse_dirs(paths: list[str]) -> list[str]:
+    """Каталоги для cone-режима sparse-checkout: файл (имя с точкой) — его каталог; файлы корня выгружаются всегда."""
+    dirs = set()
+    for p in paths:
+        parent, _, name = p.strip("/").rpartition("/")
+        if "." not in name:
+            dirs.add(p.strip("/"))
+        elif parent:
+            dirs.add(parent)
+    return sorted(dirs)
+
+
+def acquire_worktree(
+    repo_root: Path,
+    branch: str,
+    from_ref: str | None = None,
+    fetch: bool = False,
+    sparse: list[str] | None = None,
+    reset: bool = False,
+) -> Path | None:
+    """
+    Отдельное рабочее дерево ветки на общем хранилище объектов клона repo_root (git worktree):
+    несколько Issue/PR обрабатываются одновременно без повторного клонирования.
+    Дерево ветки переиспользуется между прогонами (остатки прерванного прогона сбрасываются);
+    пока оно выдано, другие потоки ждут, а gc_worktrees его не трогает. Вернуть — release_worktree.
+    :param from_ref: откуда создать ветку, если её ещё нет локально.
+    :param fetch: сначала подтянуть ветку из origin (режим правок по PR).
+    :param reset: поставить ветку на from_ref, даже если она уже есть (локальная ветка PR могла отстать от origin).
+    :param sparse: выгрузить только эти пути (sparse-checkout по каталогам: каталоги путей целиком
+        и файлы корня); в partial clone догружается содержимое только их файлов. None — всё дерево.
+    :return: путь рабочего дерева или None, если его не удалось создать.
+    """
+    path = worktree_path(repo_root, branch)
+    with _worktree_locks_guard:
+        lock = _worktree_locks.setdefault(path, threading.Lock())
+    lock.acquire()
+    try:
+        if fetch:
+            fetch_branches(repo_root, [branch])
+        gc_worktrees(repo_root)
+        if any(tree["path"] == path for tree in list_worktrees(repo_root)):
+            if sparse is None:
+                run_git(["sparse-checkout", "disable"], path)
+            run_git(["reset", "-q", "--hard"], path)
+            run_git(["clean", "-fdq"], path)  # без -x: игнорируемые кэши (.agent-cache) остаются
+        else:
+            if path.exists():
+                shutil.rmtree(
+                    path, ignore_errors=True
+                )  # каталог от дерева, чья регистрация потеряна
+            path.parent.mkdir(parents=True, exist_ok=True)
+            exists, _ = run_git(
+                ["rev-parse", "--verify", "--quiet", f"refs/heads/{branch}"], repo_root
+            )
+            # Для sparse файлы выгружаются уже после sparse-checkout set
+            add = ["worktree", "add", *(["--no-checkout"] if sparse is not None else [])]
+            if exists:
+                args = [*add, str(path), branch]
+            elif from_ref:
+                args = [*add, "-b", branch, str(path), from_ref]
+            else:
+                print(
+                    f"[Git] Ветки {branch} нет, и не указано, от чего её создать.", file=sys.stderr
+                )
+                lock.release()
+                return None
+            ok, out = run_git(args, repo_root)
+            if not ok:
+                print(
+                    f"[Git] Не удалось создать рабочее дерево {path}: {out.strip()}",
+                    file=sys.stderr,
+                )
+                lock.release()
+                return None
+        if sparse is not None:
+            run_git(["sparse-checkout", "set", "--cone", *_sparse_dirs(sparse)], path)
+        if reset and from_ref:
+            ok, out = run_git(["reset", "-q", "--hard", from_ref], path)
+            if not ok:
+                print(
+                    f"[Git] Не удалось поставить {branch} на {from_ref}: {out.strip()}",
+                    file=sys.stderr,
+                )
+                lock.release()
+                return None
+        elif sparse is not None:
+            run_git(["reset", "-q", "--hard"], path)
+        run_git(["worktree", "lock", "--reason", f"agent pid {os.getpid()}", str(path)], repo_root)
+        os.utime(path)
+    except BaseException:
+        lock.release()
+        raise
+    return path
+
+
+def release_worktree(repo_root: Path, path: Path) -> None:
+    """Вернуть рабочее дерево: снять блокировку и отметить время использования (для gc_worktrees)."""
+    run_git(["worktree", "unlock", str(path)], repo_root)
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    with _worktree_locks_guard:
+        lock = _worktree_locks.get(path)
+    if lock is not None and lock.locked():
+        lock.release()
+
+
 def get_current_branch(repo_root: Path) -> str:
     """Текущая ветка."""
     ok, out = run_git(["rev-parse", "--abbrev-ref", "HEAD"], repo_root)
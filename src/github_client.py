@@ -6,8 +6,73 @@ from __future__ import annotations
 
 import os
 import re
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any
+from collections.abc import Callable
+
 import requests
-from github import Github
+from github import Github, GithubException
+from github.Requester import HTTPRequestsConnectionClass, HTTPSRequestsConnectionClass, Requester
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from http_cache import CachingAdapter, http_cache_from_env
+from http_pool import HTTP_POOL_SIZE, pool_kwargs, register_adapter
+from rate_limiter import RateLimitedAdapter, RateLimiter
+
+GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
+GRAPHQL_FILES_PER_QUERY = 50  # файлов в одном GraphQL-запросе (алиасы f0..fN)
+GITHUB_RETRIES = 10
+# Объектов PR и Issue в кэше клиента (каждого вида); в режиме сервиса клиент живёт долго — давно не нужные вытесняются
+GITHUB_OBJECT_CACHE_SIZE = int(os.environ.get("GITHUB_OBJECT_CACHE_SIZE", "256"))
+
+
+class _TransportRetry(Retry):
+    """
+    Повторы запросов GitHub API (см. github_retry). PyGithub передаёт их в конструктор соединения —
+    по adapter соединение находит общий транспорт своего GithubClient.
+    """
+
+    adapter: HTTPAdapter | None = None
+
+
+def github_retry() -> _TransportRetry:
+    """
+    Повторы urllib3 только для 5xx. Ответы лимитов (403/429) urllib3 не повторяет и Retry-After не ждёт:
+    их обрабатывает RateLimitedAdapter — с учётом бюджета и RateLimitExceeded дольше RATE_LIMIT_MAX_WAIT.
+    """
+    return _TransportRetry(
+        total=GITHUB_RETRIES,
+        status_forcelist=list(range(500, 600)),
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS | {"GET", "POST"},
+        respect_retry_after_header=False,
+    )
+
+
+class _GithubAdapter(RateLimitedAdapter, CachingAdapter):
+    """Транспорт GitHub API: планировщик лимитов поверх HTTP-кэша (ответы 304 лимит не расходуют)."""
+
+
+class _GithubConnection(HTTPSRequestsConnectionClass):
+    """
+    HTTPS-соединение PyGithub поверх общего транспорта GithubClient (пул, лимиты, HTTP-кэш).
+    Подключается публичным Requester.injectConnectionClasses: PyGithub тогда создаёт соединение на каждый
+    запрос, так что параметры request() (атрибуты экземпляра до getresponse()) не делятся между потоками.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        adapter = getattr(self.retry, "adapter", None)
+        if adapter is not None:
+            self.adapter = adapter
+            self.session.mount("https://", adapter)
+
+    def close(self) -> None:
+        # Транспорт общий для всех соединений клиента — закрывается только собственная сессия
+        self.session.adapters.pop("https://", None)
+        self.session.close()
 
 
 class GithubClient:
@@ -20,15 +85,128 @@ class GithubClient:
         self._repo_name = repo_name or os.environ.get("GITHUB_REPOSITORY")
         if not self._repo_name:
             raise ValueError("GITHUB_REPOSITORY не задан (owner/repo)")
-        self._gh = Github(self._token)
+        # Один транспорт (и один пул keep-alive соединений к api.github.com) для PyGithub и прямых вызовов
+        # requests (diff, CI, GraphQL): учёт лимитов и условные запросы с ETag
+        self._rate_limiter = RateLimiter()
+        self._http_cache = http_cache_from_env()
+        retry = github_retry()
+        self._adapter = register_adapter(
+            _GithubAdapter(
+                self._rate_limiter, cache=self._http_cache, max_retries=retry, **pool_kwargs()
+            )
+        )
+        self._http = requests.Session()
+        self._http.mount("https://", self._adapter)
+        # Вызовы PyGithub идут и из пула потоков: соединение на запрос, транспорт — общий (см. _GithubConnection)
+        Requester.injectConnectionClasses(HTTPRequestsConnectionClass, _GithubConnection)
+        retry.adapter = self._adapter
+        # Паузу PyGithub между GET (0.25 с по умолчанию) не ставим: она выстраивала параллельные запросы
+        # пула потоков в очередь, а темп по лимитам уже задаёт RateLimitedAdapter
+        self._gh = Github(
+            self._token, retry=retry, pool_size=HTTP_POOL_SIZE, seconds_between_requests=None
+        )
         self._repo = self._gh.get_repo(self._repo_name)
+        # Кэш объектов PullRequest/Issue (LRU до GITHUB_OBJECT_CACHE_SIZE) и связи PR <-> Issue между номерами
+        self._pulls: OrderedDict[int, Any] = OrderedDict()
+        self._issues: OrderedDict[int, Any] = OrderedDict()
+        self._links: dict[int, set[int]] = {}
+        self._cache_lock = threading.Lock()
+        self._fetch_locks: dict[tuple[str, int], threading.Lock] = {}
+        self._cache_hits = 0
+        self._cache_misses = 0
+
+    def _cached(
+        self, kind: str, store: OrderedDict[int, Any], number: int, fetch: Callable[[int], Any]
+    ) -> Any:
+        """
+        Объект из кэша или fetch(number) при первом обращении.
+        Параллельные запросы одного объекта ждут единственный fetch.
+        """
+        with self._cache_lock:
+            if number in store:
+                self._cache_hits += 1
+                store.move_to_end(number)
+                return store[number]
+            key_lock = self._fetch_locks.setdefault((kind, number), threading.Lock())
+        with key_lock:
+            with self._cache_lock:
+                if number in store:
+                    self._cache_hits += 1
+                    return store[number]
+            obj = fetch(number)
+            with self._cache_lock:
+                store[number] = obj
+                self._cache_misses += 1
+                # Ждущие этот fetch уже держат блокировку; следующие найдут объект в кэше
+                self._fetch_locks.pop((kind, number), None)
+                while len(store) > GITHUB_OBJECT_CACHE_SIZE:
+                    evicted, _ = store.popitem(last=False)
+                    if evicted not in self._pulls and evicted not in self._issues:
+                        self._forget_links(evicted)
+            return obj
+
+    def _link(self, a: int, b: int) -> None:
+        """Запомнить связь PR и Issue: invalidate одного сбрасывает и другой."""
+        with self._cache_lock:
+            self._links.setdefault(a, set()).add(b)
+            self._links.setdefault(b, set()).add(a)
+
+    def _forget_links(self, number: int) -> set[int]:
+        linked = self._links.pop(number, set())
+        for other in linked:
+            peers = self._links.get(other)
+            if peers is not None:
+                peers.discard(number)
+                if not peers:
+                    del self._links[other]
+        return linked
+
+    def _get_pull(self, pr_number: int) -> Any:
+        return self._cached("pull", self._pulls, pr_number, self._repo.get_pull)
+
+    def _get_issue(self, issue_number: int) -> Any:
+        return self._cached("issue", self._issues, issue_number, self._repo.get_issue)
+
+    def invalidate(self, number: int | None = None) -> None:
+        """
+        Сбросить кэш PR/Issue с номером number (PR и Issue делят нумерацию) и связанных с ним
+        (Issue PR-а, PR Issue) или весь кэш при None.
+        Вызывается после записей, результат которых не отражается в закэшированном объекте.
+        """
+        with self._cache_lock:
+            if number is None:
+                self._pulls.clear()
+                self._issues.clear()
+                self._links.clear()
+            else:
+                for n in {number, *self._forget_links(number)}:
+                    self._pulls.pop(n, None)
+                    self._issues.pop(n, None)
+
+    def rate_limit_budget(self) -> dict:
+        """
+        Остаток лимита GitHub API по последним ответам: remaining (-1 — ещё неизвестно), limit, reset (epoch),
+        throttled и waited — сколько раз и сколько секунд планировщик притормаживал запросы.
+        """
+        return self._rate_limiter.budget()
+
+    def cache_stats(self) -> dict:
+        """
+        Статистика кэша PR/Issue: hits — сэкономленные запросы к API, misses — реальные загрузки.
+        При включённом HTTP-кэше добавляется http: записи диска (hits/misses/bytes).
+        """
+        with self._cache_lock:
+            stats: dict = {"hits": self._cache_hits, "misses": self._cache_misses}
+        if self._http_cache is not None:
+            stats["http"] = self._http_cache.stats()
+        return stats
 
     def get_issue_details(self, issue_number: int) -> dict:
         """
         Получить текст задачи (Issue).
         :return: dict с ключами title, body, state, number.
         """
-        issue = self._repo.get_issue(issue_number)
+        issue = self._get_issue(issue_number)
         return {
             "number": issue.number,
             "title": issue.title,
@@ -70,8 +248,9 @@ class GithubClient:
 
     def add_issue_comment(self, issue_number: int, body: str) -> None:
         """Оставить комментарий в Issue (для теста записи)."""
-        issue = self._repo.get_issue(issue_number)
+        issue = self._get_issue(issue_number)
         issue.create_comment(body)
+        self.invalidate(issue_number)
 
     def get_file_content(self, path: str, ref: str | None = None) -> str:
         """Получить содержимое файла из репозитория (ref — ветка или sha, по умолчанию default branch)."""
@@ -82,12 +261,142 @@ class GithubClient:
             return base64.b64decode(fc.content).decode("utf-8", errors="replace")
         return ""
 
-    def list_repo_files(self, path: str = "", ref: str | None = None, max_depth: int = 4) -> list[str]:
+    def get_file_contents(self, paths: list[str], ref: str | None = None) -> dict[str, str]:
+        """
+        Получить содержимое многих файлов сразу: один GraphQL-запрос на GRAPHQL_FILES_PER_QUERY путей.
+        Бинарные и отсутствующие файлы пропускаются; усечённые GraphQL-ответы и пачки,
+        на которых GraphQL упал, дочитываются поштучно через get_file_content.
+        :return: dict path -> content (только для найденных текстовых файлов).
+        """
+        ref = ref or self._repo.default_branch
+        result: dict[str, str] = {}
+        fallback: list[str] = []
+        for i in range(0, len(paths), GRAPHQL_FILES_PER_QUERY):
+            chunk = paths[i : i + GRAPHQL_FILES_PER_QUERY]
+            try:
+                blobs = self._graphql_blobs(chunk, ref)
+            except (requests.RequestException, ValueError):
+                fallback.extend(chunk)
+                continue
+            for path, blob in zip(chunk, blobs):
+                if not blob or blob.get("isBinary"):
+                    continue
+                if blob.get("isTruncated") or blob.get("text") is None:
+                    fallback.append(path)
+                    continue
+                result[path] = blob["text"]
+        for path in fallback:
+            try:
+                result[path] = self.get_file_content(path, ref=ref)
+            except GithubException:
+                continue
+        return result
+
+    def _graphql_blobs(self, paths: list[str], ref: str) -> list[dict | None]:
+        """Один GraphQL-запрос: object(expression: "ref:path") для каждого пути. Порядок совпадает с paths."""
+        owner, name = self._repo.full_name.split("/", 1)
+        params = ["$owner: String!", "$name: String!"]
+        fields = []
+        variables: dict[str, str] = {"owner": owner, "name": name}
+        for i, path in enumerate(paths):
+            params.append(f"$e{i}: String!")
+            fields.append(
+                f"f{i}: object(expression: $e{i}) {{ ... on Blob {{ text isBinary isTruncated }} }}"
+            )
+            variables[f"e{i}"] = f"{ref}:{path}"
+        query = (
+            f"query({', '.join(params)}) {{ repository(owner: $owner, name: $name) {{ "
+            + " ".join(fields)
+            + " } }"
+        )
+        r = self._http.post(
+            GITHUB_GRAPHQL_URL,
+            json={"query": query, "variables": variables},
+            headers={"Authorization": f"Bearer {self._token}"},
+            timeout=60,
+        )
+        r.raise_for_status()
+        repo_data = (r.json().get("data") or {}).get("repository")
+        if repo_data is None:
+            raise ValueError(f"GraphQL: репозиторий {self._repo.full_name} недоступен")
+        return [repo_data.get(f"f{i}") for i in range(len(paths))]
+
+    def list_repo_tree(self, ref: str | None = None) -> list[dict]:
+        """
+        Полное дерево файлов репозитория через Git Trees API (один запрос на обычный репозиторий).
+        Ref (ветка, тег или sha коммита) сервер сам разрешает в sha дерева.
+        Если GitHub вернул усечённый ответ (truncated) — дерево дочитывается по поддеревьям.
+        :return: список {path, sha, size, mode} только для файлов (blob), отсортирован по path.
+        """
+        ref = ref or self._repo.default_branch
+        tree = self._repo.get_git_tree(ref, recursive=True)
+        if tree.truncated:
+            result = self._walk_git_tree(tree.sha, "")
+        else:
+            result = self._tree_blobs(tree.tree, "")
+        return sorted(result, key=lambda x: x["path"])
+
+    def _walk_git_tree(self, sha: str, prefix: str) -> list[dict]:
+        """Обход усечённого дерева: корень без рекурсии, каждое поддерево — рекурсивным запросом."""
+        top = self._repo.get_git_tree(sha)
+        result = self._tree_blobs(top.tree, prefix)
+        for item in top.tree:
+            if item.type != "tree" or (prefix + item.path).startswith(".git"):
+                continue
+            sub_prefix = f"{prefix}{item.path}/"
+            sub = self._repo.get_git_tree(item.sha, recursive=True)
+            if sub.truncated:
+                result.extend(self._walk_git_tree(item.sha, sub_prefix))
+            else:
+                result.extend(self._tree_blobs(sub.tree, sub_prefix))
+        return result
+
+    @staticmethod
+    def _tree_blobs(items: list, prefix: str) -> list[dict]:
+        """Элементы дерева → {path, sha, size, mode}; каталоги, сабмодули и служебные .git* пропускаются."""
+        out = []
+        for item in items:
+            if item.type != "blob":
+                continue
+            path = prefix + item.path
+            if path.startswith(".git") or "/.git" in path:
+                continue
+            out.append({"path": path, "sha": item.sha, "size": item.size or 0, "mode": item.mode})
+        return out
+
+    def list_repo_files(
+        self,
+        path: str = "",
+        ref: str | None = None,
+        max_depth: int = 4,
+        use_tree: bool = True,
+    ) -> list[str]:
         """
         Список путей файлов в репозитории (рекурсивно, с ограничением глубины).
         Игнорирует .git и прочие служебные папки.
+        :param use_tree: брать дерево одним запросом через Git Trees API (см. list_repo_tree);
+            при ошибке или use_tree=False — обход каталогов через get_contents.
         """
         ref = ref or self._repo.default_branch
+        if use_tree:
+            try:
+                prefix = path.strip("/") + "/" if path.strip("/") else ""
+                paths = []
+                for entry in self.list_repo_tree(ref):
+                    p = entry["path"]
+                    if prefix and not p.startswith(prefix):
+                        continue
+                    if p[len(prefix) :].count("/") >= max_depth:
+                        continue
+                    paths.append(p)
+                return paths
+            except GithubException as e:
+                # RateLimitExceeded и прочие ошибки не маскируются: обход каталогов тоже упёрся бы в лимит
+                print(
+                    f"[GitHub] Git Trees API недоступен ({e}), обход каталогов через get_contents",
+                    file=sys.stderr,
+                )
+
         result: list[str] = []
 
         def walk(p: str, depth: int) -> None:
@@ -111,16 +420,17 @@ class GithubClient:
 
     def get_pr_for_issue(self, issue_number: int) -> dict | None:
         """Найти открытый PR, в теле которого есть «Closes #N» или «Fixes #N» для данного Issue. Возвращает {number, head_ref, body} или None."""
-        issue = self._repo.get_issue(issue_number)
+        issue = self._get_issue(issue_number)
         for pr in issue.get_pulls(state="open"):
             body = pr.body or ""
             if f"#{issue_number}" in body or f"Closes #{issue_number}" in body:
+                self._link(issue_number, pr.number)
                 return {"number": pr.number, "head_ref": pr.head.ref, "body": body}
         return None
 
     def get_pr_comments(self, pr_number: int) -> list[dict]:
         """Комментарии к PR (включая review comments). Возвращает список {body, user, created_at}."""
-        pr = self._repo.get_pull(pr_number)
+        pr = self._get_pull(pr_number)
         out: list[dict] = []
         for c in pr.get_comments():
             out.append({"body": c.body or "", "user": getattr(c.user, "login", ""), "created_at": str(c.created_at)})
@@ -133,7 +443,7 @@ class GithubClient:
 
     def get_pr_details(self, pr_number: int) -> dict:
         """Детали PR: title, body, head_sha, head_ref, base_ref."""
-        pr = self._repo.get_pull(pr_number)
+        pr = self._get_pull(pr_number)
         return {
             "number": pr.number,
             "title": pr.title,
@@ -147,7 +457,7 @@ class GithubClient:
         """Полный diff PR (unified diff)."""
         owner, repo = self._repo.full_name.split("/", 1)
         url = f"https://api.github.com/repos/{owner}/{repo}/pulls/{pr_number}"
-        r = requests.get(
+        r = self._http.get(
             url,
             headers={
                 "Accept": "application/vnd.github.v3.diff",
@@ -161,7 +471,7 @@ class GithubClient:
 
     def get_pr_changed_files(self, pr_number: int) -> list[dict]:
         """Список изменённых файлов: path, status, patch (если есть)."""
-        pr = self._repo.get_pull(pr_number)
+        pr = self._get_pull(pr_number)
         out = []
         for f in pr.get_files():
             out.append({
@@ -173,8 +483,16 @@ class GithubClient:
 
     def parse_issue_number_from_pr(self, pr_number: int) -> int | None:
         """Извлечь номер Issue из тела/заголовка PR (Closes #N, Fixes #N или #N)."""
-        pr = self._repo.get_pull(pr_number)
-        text = (pr.body or "") + "\n" + (pr.title or "")
+        pr = self._get_pull(pr_number)
+        issue_number = self.issue_number_from_text(pr.body, pr.title)
+        if issue_number is not None:
+            self._link(pr_number, issue_number)
+        return issue_number
+
+    @staticmethod
+    def issue_number_from_text(body: str | None, title: str | None = None) -> int | None:
+        """Номер Issue из уже полученных тела/заголовка PR (без запроса к API)."""
+        text = (body or "") + "\n" + (title or "")
         # Closes #123, Fixes #123 или просто #123
         m = re.search(r"(?:Closes|Fixes)\s*#(\d+)", text, re.I) or re.search(r"#(\d+)", text)
         return int(m.group(1)) if m else None
@@ -190,7 +508,7 @@ class GithubClient:
         Создать ревью PR: APPROVE, REQUEST_CHANGES или COMMENT.
         comments: список {path, line, body} или {path, line, side, body} для inline-комментариев.
         """
-        pr = self._repo.get_pull(pr_number)
+        pr = self._get_pull(pr_number)
         review_comments = []
         if comments:
             for c in comments:
@@ -204,13 +522,14 @@ class GithubClient:
                         "body": comment_body,
                     })
         review = pr.create_review(body=body, event=event, comments=review_comments)
+        self.invalidate(pr_number)
         return {"id": review.id, "state": review.state}
 
     def get_workflow_runs_for_head(self, head_sha: str, limit: int = 10) -> list[dict]:
         """Список последних workflow runs для коммита head_sha. Возвращает conclusion и имя job'ов."""
         owner, repo = self._repo.full_name.split("/", 1)
         url = f"https://api.github.com/repos/{owner}/{repo}/actions/runs"
-        r = requests.get(
+        r = self._http.get(
             url,
             params={"per_page": limit},
             headers={
@@ -236,7 +555,7 @@ class GithubClient:
 
     def get_review_count_by_user(self, pr_number: int, login: str) -> int:
         """Количество ревью от пользователя login по данному PR (для лимита итераций)."""
-        pr = self._repo.get_pull(pr_number)
+        pr = self._get_pull(pr_number)
         count = 0
         for r in pr.get_reviews():
             if getattr(r.user, "login", None) == login:
@@ -249,7 +568,7 @@ class GithubClient:
 
     def get_pr_reviews(self, pr_number: int) -> list[dict]:
         """Список ревью PR: body, user, state (APPROVED, CHANGES_REQUESTED, COMMENTED)."""
-        pr = self._repo.get_pull(pr_number)
+        pr = self._get_pull(pr_number)
         out = []
         for r in pr.get_reviews():
             out.append({
@@ -263,17 +582,18 @@ class GithubClient:
 
     def get_pr_body(self, pr_number: int) -> str:
         """Текущее тело PR (для чтения/обновления метаданных итерации)."""
-        pr = self._repo.get_pull(pr_number)
+        pr = self._get_pull(pr_number)
         return pr.body or ""
 
     def update_pr_body(self, pr_number: int, new_body: str) -> None:
         """Обновить тело PR (для записи Iteration: N)."""
-        pr = self._repo.get_pull(pr_number)
+        pr = self._get_pull(pr_number)
+        # edit() обновляет закэшированный объект данными из ответа — сбрасывать кэш не нужно
         pr.edit(body=new_body)
 
     def add_label_to_pr(self, pr_number: int, label: str) -> None:
         """Добавить метку к PR (создаётся при отсутствии)."""
-        pr = self._repo.get_pull(pr_number)
+        pr = self._get_pull(pr_number)
         try:
             self._repo.get_label(label)
         except Exception:
@@ -282,19 +602,22 @@ class GithubClient:
             except Exception:
                 pass
         pr.add_to_labels(label)
+        self.invalidate(pr_number)
 
     def remove_label_from_pr(self, pr_number: int, label: str) -> None:
         """Снять метку с PR."""
-        pr = self._repo.get_pull(pr_number)
+        pr = self._get_pull(pr_number)
         try:
             pr.remove_from_labels(label)
         except Exception:
             pass
+        self.invalidate(pr_number)
 
     def add_pr_comment(self, pr_number: int, body: str) -> None:
         """Добавить обычный комментарий к PR (в обсуждение)."""
-        pr = self._repo.get_pull(pr_number)
+        pr = self._get_pull(pr_number)
         pr.create_issue_comment(body)
+        self.invalidate(pr_number)
 
     @property
     def repo(self):
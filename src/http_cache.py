@@ -0,0 +1,107 @@
+"""
+HTTP-кэш с условными запросами (ETag / Last-Modified) для GitHub API.
+Цель: повторные чтения (Issue, PR, файлы, ревью, diff) отвечают 304 Not Modified, который GitHub
+не списывает с лимита запросов, а тело берётся из дискового кэша (disk_cache.DiskCache).
+"""
+
+from __future__ import annotations
+
+import base64
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from disk_cache import DiskCache, cache_key
+
+HTTP_CACHE_DIR = os.environ.get("GITHUB_HTTP_CACHE_DIR", "")
+HTTP_CACHE_MAX_MB = int(os.environ.get("GITHUB_HTTP_CACHE_MAX_MB", "200"))
+
+# Заголовки, которые не имеют смысла для тела, отдаваемого из кэша (requests уже распаковал его)
+_SKIP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+def http_cache_from_env() -> DiskCache | None:
+    """Дисковый кэш из GITHUB_HTTP_CACHE_DIR (и GITHUB_HTTP_CACHE_MAX_MB) или None, если не задан."""
+    if not HTTP_CACHE_DIR:
+        return None
+    try:
+        return DiskCache(HTTP_CACHE_DIR, max_bytes=HTTP_CACHE_MAX_MB * 1024 * 1024)
+    except OSError:
+        return None
+
+
+class CachingAdapter(HTTPAdapter):
+    """
+    Транспорт requests с условными GET: к запросу добавляются If-None-Match / If-Modified-Since
+    из сохранённого ответа; на 304 возвращается сохранённый ответ (со свежими X-RateLimit-* заголовками).
+    Кэшируются только GET без stream с ответом 200 и ETag или Last-Modified; при cache=None — обычный транспорт.
+    """
+
+    def __init__(self, cache: DiskCache | None, **kwargs):
+        super().__init__(**kwargs)
+        self.cache = cache
+        self.not_modified = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(request: requests.PreparedRequest) -> str:
+        # Токен в ключ не входит: он меняется от запуска к запуску, а данные репозитория — те же
+        return cache_key(request.method, request.url, request.headers.get("Accept", ""))
+
+    def send(self, request, stream=False, **kwargs):  # type: ignore[override]
+        if self.cache is None or request.method != "GET" or stream:
+            return super().send(request, stream=stream, **kwargs)
+        key = self._key(request)
+        entry = self.cache.get(key)
+        if entry:
+            if entry.get("etag"):
+                request.headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                request.headers["If-Modified-Since"] = entry["last_modified"]
+        resp = super().send(request, stream=stream, **kwargs)
+        if resp.status_code == 304 and entry:
+            with self._lock:
+                self.not_modified += 1
+            return self._from_entry(entry, request, resp)
+        if resp.status_code == 200:
+            etag = resp.headers.get("ETag")
+            last_modified = resp.headers.get("Last-Modified")
+            if etag or last_modified:
+                self.cache.set(
+                    key,
+                    {
+                        "etag": etag,
+                        "last_modified": last_modified,
+                        "headers": {
+                            k: v for k, v in resp.headers.items() if k.lower() not in _SKIP_HEADERS
+                        },
+                        "encoding": resp.encoding,
+                        "body": base64.b64encode(resp.content).decode("ascii"),
+                    },
+                )
+        return resp
+
+    def _from_entry(
+        self,
+        entry: dict,
+        request: requests.PreparedRequest,
+        not_modified: requests.Response,
+    ) -> requests.Response:
+        """Собрать ответ 200 из записи кэша; заголовки лимитов берутся из свежего 304."""
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.reason = "OK"
+        resp.headers = CaseInsensitiveDict(entry.get("headers") or {})
+        for name, value in not_modified.headers.items():
+            if name.lower().startswith("x-ratelimit") or name.lower() == "date":
+                resp.headers[name] = value
+        resp._content = base64.b64decode(entry.get("body") or "")
+        resp.encoding = entry.get("encoding")
+        resp.url = not_modified.url
+        resp.request = request
+        resp.elapsed = not_modified.elapsed
+        resp.connection = self
+        return resp
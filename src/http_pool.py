@@ -0,0 +1,92 @@
+"""
+Общий слой HTTP-соединений с пулом и keep-alive для GithubClient и LLMClient.
+Цель: не платить TCP+TLS рукопожатие на каждый запрос (module-level requests.get/post создают
+новое соединение каждый раз); переиспользование соединений видно в connection_stats().
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "10"))  # соединений на хост
+HTTP2 = os.environ.get("HTTP2", "") == "1"  # HTTP/2 для клиента OpenAI (httpx + пакет h2)
+
+_lock = threading.Lock()
+_session: requests.Session | None = None
+_adapters: list[HTTPAdapter] = []
+
+
+def pool_kwargs() -> dict:
+    """Параметры пула для HTTPAdapter (и его наследников) из HTTP_POOL_SIZE."""
+    return {"pool_connections": HTTP_POOL_SIZE, "pool_maxsize": HTTP_POOL_SIZE}
+
+
+def register_adapter(adapter: HTTPAdapter) -> HTTPAdapter:
+    """Учитывать пул адаптера в connection_stats (адаптеры со своим транспортом, например GitHub)."""
+    with _lock:
+        if adapter not in _adapters:
+            _adapters.append(adapter)
+    return adapter
+
+
+def shared_session() -> requests.Session:
+    """Процессный requests.Session с пулом соединений; потокобезопасен для параллельных запросов."""
+    global _session
+    with _lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(**pool_kwargs())
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _adapters.append(adapter)
+            _session = session
+        return _session
+
+
+def httpx_client(timeout: float):
+    """
+    httpx.Client с пулом keep-alive для SDK OpenAI; HTTP/2 — при HTTP2=1 и установленном h2.
+    None, если httpx недоступен (тогда SDK создаёт клиент сам).
+    """
+    try:
+        import httpx
+    except ImportError:
+        return None
+    http2 = False
+    if HTTP2:
+        try:
+            import h2  # noqa: F401
+
+            http2 = True
+        except ImportError:
+            pass
+    limits = httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE)
+    return httpx.Client(limits=limits, http2=http2, timeout=timeout)
+
+
+def connection_stats() -> dict:
+    """
+    Статистика по всем зарегистрированным пулам urllib3: requests — отправлено запросов,
+    connections — открыто соединений, reused — запросов, ушедших по уже открытому соединению.
+    """
+    total_requests = 0
+    total_connections = 0
+    with _lock:
+        adapters = list(_adapters)
+    for adapter in adapters:
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            total_requests += pool.num_requests
+            total_connections += pool.num_connections
+    return {
+        "requests": total_requests,
+        "connections": total_connections,
+        "reused": max(total_requests - total_connections, 0),
+    }
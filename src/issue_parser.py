@@ -5,7 +5,14 @@
 from __future__ import annotations
 
 import os
-from typing import TYPE_CHECKING
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from context_ranker import path_scores, select_context, token_budget
+from local_repo import LocalRepo
+from repo_index import RepoIndex
+from rate_limiter import RATE_LIMIT_RESERVE, RUN_MIN_BUDGET
 
 if TYPE_CHECKING:
     from github_client import GithubClient
@@ -16,6 +23,12 @@ KEY_EXTENSIONS = (".py", ".yaml", ".yml", ".toml", ".txt", ".md", ".json")
 KEY_PREFIXES = ("src/", "config/", "tests/", ".")
 MAX_FILE_SIZE = 32 * 1024  # не более 32 КБ на файл
 MAX_TOTAL_CONTEXT = 80 * 1024  # ориентир на объём контекста (примерно)
+# Для ранжирования (context_ranker) загружается больше файлов, чем попадёт в промпт
+RANK_CANDIDATES = int(os.environ.get("CONTEXT_RANK_CANDIDATES", "150"))
+RANK_MAX_CONTEXT = 1024 * 1024
+CONTENT_BATCH_SIZE = 50  # файлов за один вызов gh.get_file_contents
+# Ниже этого остатка лимита GitHub API файлы контекста больше не догружаем (оставляем запросы на PR)
+CONTEXT_MIN_BUDGET = RATE_LIMIT_RESERVE + RUN_MIN_BUDGET
 
 
 def _is_key_file(path: str) -> bool:
@@ -28,42 +41,148 @@ def _is_key_file(path: str) -> bool:
     return path in ("README.md", "requirements.txt", "pyproject.toml") or path.endswith(KEY_EXTENSIONS)
 
 
-def get_issue_context(gh: "GithubClient", issue_number: int) -> dict:
+def _context_source(
+    gh: GithubClient,
+    repo_root: str | Path | None,
+    ref: str,
+    *fallback_refs: str | None,
+) -> tuple[Any, str, str]:
     """
-    Собрать контекст для агента: Issue, структура репо, ключевые файлы, комментарии Reviewer (если есть PR).
-    :return: dict с ключами issue, file_list, files (path -> content), reviewer_feedback (str или None).
+    Откуда читать файлы контекста: локальный клон (если в нём есть коммит ref или одного из fallback_refs)
+    или GitHub API.
+    :return: (источник с list_repo_files/get_file_contents, ref для него, "local" | "api").
     """
-    issue = gh.get_issue_details(issue_number)
-    ref = os.environ.get("GITHUB_REF_NAME") or gh.repo.default_branch
+    local = LocalRepo.open(repo_root)
+    if local is not None:
+        for candidate in (ref, *fallback_refs):
+            sha = local.resolve_ref(candidate) if candidate else None
+            if sha:
+                return local, sha, "local"
+    return gh, ref, "api"
+
+
+def _budget_low(source: Any) -> bool:
+    """Остаток лимита GitHub API известен и меньше CONTEXT_MIN_BUDGET (для LocalRepo — всегда False)."""
+    budget = getattr(source, "rate_limit_budget", None)
+    if budget is None:
+        return False
+    remaining = budget()["remaining"]
+    return 0 <= remaining < CONTEXT_MIN_BUDGET
 
-    file_list = gh.list_repo_files("", ref=ref)
-    key_paths = [p for p in file_list if _is_key_file(p)]
 
+def _collect_files(
+    gh: Any, key_paths: list[str], ref: str, max_total: int = MAX_TOTAL_CONTEXT
+) -> dict[str, str]:
+    """
+    Загрузить содержимое ключевых файлов пачками (gh.get_file_contents), пока не набрано max_total символов.
+    gh — GithubClient или LocalRepo. Файлы больше MAX_FILE_SIZE обрезаются, кроме Python: большие .py
+    целиком нужны для ранжирования и outline (context_ranker.select_context).
+    """
     files: dict[str, str] = {}
     total = 0
-    for path in key_paths:
-        if total >= MAX_TOTAL_CONTEXT:
+    for i in range(0, len(key_paths), CONTENT_BATCH_SIZE):
+        if total >= max_total:
+            break
+        if _budget_low(gh):
+            print(
+                f"[Context] Мало запросов GitHub API, контекст урезан до {len(files)} файлов.",
+                file=sys.stderr,
+            )
             break
+        batch = key_paths[i : i + CONTENT_BATCH_SIZE]
         try:
-            content = gh.get_file_content(path, ref=ref)
-            if len(content) > MAX_FILE_SIZE:
+            contents = gh.get_file_contents(batch, ref=ref)
+        except Exception:
+            continue
+        for path in batch:
+            if total >= max_total:
+                break
+            content = contents.get(path)
+            if content is None:
+                continue
+            if len(content) > MAX_FILE_SIZE and not path.endswith(".py"):
                 content = content[:MAX_FILE_SIZE] + "\n... (обрезано)\n"
             files[path] = content
             total += len(content)
-        except Exception:
-            continue
+    return files
+
+
+def repo_index(source: Any, ref: str, repo_root: str | Path | None = None) -> RepoIndex | None:
+    """
+    Индекс Python-кода для ref (RepoIndex, хранится между запусками); None, если построить не удалось.
+    Строится только из локального клона: через API пришлось бы загрузить все .py файлы репозитория
+    в обход RANK_CANDIDATES/RANK_MAX_CONTEXT — без индекса файлы ранжируются только по путям.
+    """
+    if not isinstance(source, LocalRepo):
+        return None
+    try:
+        return RepoIndex.for_repo(repo_root).update(source, ref)
+    except Exception as e:
+        print(f"[Context] Индекс репозитория недоступен: {e}", file=sys.stderr)
+        return None
+
+
+def _select_files(
+    source: Any,
+    file_list: list[str],
+    ref: str,
+    query: str,
+    pinned: list[str] | None = None,
+    index: RepoIndex | None = None,
+) -> dict[str, str]:
+    """
+    Файлы для промпта: ключевые файлы (и pinned) загружаются в порядке быстрой оценки по путям и индексу
+    (не больше RANK_CANDIDATES), ранжируются по тексту задачи и упаковываются в бюджет токенов провайдера.
+    """
+    pinned = [p for p in (pinned or []) if p in set(file_list)]
+    key_paths = [p for p in file_list if _is_key_file(p) and p not in pinned]
+    prescore = path_scores(query, key_paths, index)
+    key_paths.sort(key=lambda p: -prescore.get(p, 0.0))
+    candidates = (pinned + key_paths)[:RANK_CANDIDATES]
+    contents = _collect_files(source, candidates, ref, max_total=RANK_MAX_CONTEXT)
+    return select_context(query, contents, token_budget(), pinned=pinned)
+
+
+def _query_text(issue: dict, reviewer_feedback: str | None) -> str:
+    return "\n".join(filter(None, [issue.get("title"), issue.get("body"), reviewer_feedback]))
+
+
+def get_issue_context(
+    gh: GithubClient,
+    issue_number: int,
+    repo_root: str | Path | None = None,
+) -> dict:
+    """
+    Собрать контекст для агента: Issue, структура репо, ключевые файлы, комментарии Reviewer (если есть PR).
+    :param repo_root: локальный клон; файлы читаются из него, если там есть нужный коммит, иначе через API.
+    :return: dict с ключами issue, file_list, files (path -> content), reviewer_feedback (str или None),
+        ref, source ("local" или "api").
+    """
+    issue = gh.get_issue_details(issue_number)
+    ref = os.environ.get("GITHUB_REF_NAME") or gh.repo.default_branch
+    # В Actions checkout сделан на GITHUB_SHA — это тот же коммит, что и ref
+    source, source_ref, source_kind = _context_source(
+        gh, repo_root, ref, os.environ.get("GITHUB_SHA")
+    )
 
     reviewer_feedback = None
     pr = gh.get_pr_for_issue(issue_number)
     if pr:
         reviewer_feedback = get_reviewer_feedback_from_pr(gh, pr["number"])
 
+    file_list = source.list_repo_files("", ref=source_ref)
+    index = repo_index(source, source_ref, repo_root)
+    files = _select_files(
+        source, file_list, source_ref, _query_text(issue, reviewer_feedback), index=index
+    )
+
     return {
         "issue": issue,
         "file_list": file_list,
         "files": files,
         "reviewer_feedback": reviewer_feedback,
         "ref": ref,
+        "source": source_kind,
     }
 
 
@@ -81,34 +200,44 @@ def get_reviewer_feedback_from_pr(gh: "GithubClient", pr_number: int) -> str | N
     return None
 
 
-def get_issue_context_for_pr(gh: "GithubClient", pr_number: int) -> dict:
+def get_issue_context_for_pr(
+    gh: GithubClient,
+    pr_number: int,
+    repo_root: str | Path | None = None,
+) -> dict:
     """
     Контекст для Code Agent в режиме правок: Issue из PR, код из head-ветки PR, замечания Reviewer.
+    :param repo_root: локальный клон с подтянутой head-веткой; без него файлы читаются через API.
     """
     pr_details = gh.get_pr_details(pr_number)
-    issue_number = gh.parse_issue_number_from_pr(pr_number)
+    issue_number = gh.parse_issue_number_from_pr(pr_number)  # PR уже в кэше клиента
     head_ref = pr_details["head_ref"]
     if not issue_number:
         issue_number = 0
         issue = {"number": 0, "title": pr_details["title"], "body": pr_details["body"], "state": "open"}
     else:
         issue = gh.get_issue_details(issue_number)
-    file_list = gh.list_repo_files("", ref=head_ref)
-    key_paths = [p for p in file_list if _is_key_file(p)]
-    files = {}
-    total = 0
-    for path in key_paths:
-        if total >= MAX_TOTAL_CONTEXT:
-            break
-        try:
-            content = gh.get_file_content(path, ref=head_ref)
-            if len(content) > MAX_FILE_SIZE:
-                content = content[:MAX_FILE_SIZE] + "\n... (обрезано)\n"
-            files[path] = content
-            total += len(content)
-        except Exception:
-            continue
+    source, source_ref, source_kind = _context_source(
+        gh, repo_root, head_ref, pr_details["head_sha"]
+    )
     reviewer_feedback = get_reviewer_feedback_from_pr(gh, pr_number)
+    # Файлы, изменённые в PR, нужны для правок в первую очередь
+    try:
+        changed = [
+            f["path"] for f in gh.get_pr_changed_files(pr_number) if f.get("status") != "removed"
+        ]
+    except Exception:
+        changed = []
+    file_list = source.list_repo_files("", ref=source_ref)
+    index = repo_index(source, source_ref, repo_root)
+    files = _select_files(
+        source,
+        file_list,
+        source_ref,
+        _query_text(issue, reviewer_feedback),
+        pinned=changed,
+        index=index,
+    )
     return {
         "issue": issue,
         "file_list": file_list,
@@ -116,6 +245,7 @@ def get_issue_context_for_pr(gh: "GithubClient", pr_number: int) -> dict:
         "reviewer_feedback": reviewer_feedback,
         "ref": head_ref,
         "pr": pr_details,
+        "source": source_kind,
     }
 
 
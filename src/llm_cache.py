@@ -0,0 +1,42 @@
+"""
+Дисковый кэш ответов LLM (по содержимому запроса).
+Цель: повторные прогоны той же Issue, перезапуски workflow и тест скелета отправляют одинаковые
+пары (system_prompt, user_prompt) — из кэша ответ берётся без задержки и без оплаты запроса.
+Включается переменной LLM_CACHE_DIR; записанные ответы позволяют гонять интеграционные тесты офлайн.
+"""
+
+from __future__ import annotations
+
+import os
+
+from disk_cache import DiskCache, cache_key
+
+LLM_CACHE_DIR = os.environ.get("LLM_CACHE_DIR", "")
+LLM_CACHE_MAX_MB = int(os.environ.get("LLM_CACHE_MAX_MB", "100"))
+# Срок жизни ответа в секундах (0 — бессрочно)
+LLM_CACHE_TTL = float(os.environ.get("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+
+
+def llm_cache_from_env() -> DiskCache | None:
+    """Дисковый кэш из LLM_CACHE_DIR (LLM_CACHE_MAX_MB, LLM_CACHE_TTL) или None, если не задан."""
+    if not LLM_CACHE_DIR:
+        return None
+    try:
+        return DiskCache(
+            LLM_CACHE_DIR,
+            max_bytes=LLM_CACHE_MAX_MB * 1024 * 1024,
+            ttl=LLM_CACHE_TTL or None,
+        )
+    except OSError:
+        return None
+
+
+def response_key(
+    provider: str,
+    model: str,
+    temperature: float | None,
+    system_prompt: str,
+    user_prompt: str,
+) -> str:
+    """Ключ ответа: хэш провайдера, модели, параметров генерации и обоих промптов."""
+    return cache_key("llm", provider, model, temperature, system_prompt, user_prompt)
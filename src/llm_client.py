@@ -7,7 +7,10 @@ from __future__ import annotations
 import os
 import time
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
+from collections.abc import Callable, Iterator
 
 # OpenAI
 from openai import OpenAI
@@ -16,6 +19,38 @@ from openai import APITimeoutError, APIConnectionError
 # Yandex — через requests к API (документация Yandex Cloud)
 import requests
 
+from disk_cache import DiskCache
+from http_pool import httpx_client, shared_session
+from llm_cache import llm_cache_from_env, response_key
+
+# Одновременных запросов в generate_many
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "4"))
+# Лимит запросов в минуту на провайдера (общий для всех клиентов процесса)
+LLM_RPM = {
+    "openai": int(os.environ.get("OPENAI_RPM", "500")),
+    "yandex": int(os.environ.get("YANDEX_RPM", "60")),
+}
+
+
+class _ProviderRateLimit:
+    """Равномерный темп запросов к провайдеру: не чаще одного раза в 60 / rpm секунд."""
+
+    def __init__(self, rpm: int):
+        self.interval = 60.0 / rpm if rpm > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+_RATE_LIMITS = {name: _ProviderRateLimit(rpm) for name, rpm in LLM_RPM.items()}
+
 
 class LLMClient:
     """
@@ -36,11 +71,14 @@ class LLMClient:
         timeout: float = DEFAULT_TIMEOUT,
         max_retries: int = DEFAULT_MAX_RETRIES,
         retry_delay: float = DEFAULT_RETRY_DELAY,
+        cache: DiskCache | None = None,
     ):
+        """:param cache: кэш ответов; по умолчанию — из LLM_CACHE_DIR (см. llm_cache), None — без кэша."""
         self.provider = (provider or os.environ.get("LLM_PROVIDER", "yandex")).lower()
         self.timeout = timeout
         self.max_retries = max_retries
         self.retry_delay = retry_delay
+        self.cache = cache if cache is not None else llm_cache_from_env()
 
         if self.provider == "openai":
             self._openai_key = (
@@ -60,7 +98,14 @@ class LLMClient:
                     "В .env указан плейсхолдер вместо реального ключа OpenAI. "
                     "Замените OPENAI_API_KEY на ключ с https://platform.openai.com/api-keys"
                 )
-            self._client = OpenAI(api_key=self._openai_key)
+            self.model = "gpt-4o-mini"
+            self.temperature: float | None = None  # значение по умолчанию API
+            # Пул keep-alive соединений (и HTTP/2 при HTTP2=1) вместо клиента по умолчанию
+            http_client = httpx_client(timeout)
+            if http_client is not None:
+                self._client = OpenAI(api_key=self._openai_key, http_client=http_client)
+            else:
+                self._client = OpenAI(api_key=self._openai_key)
         elif self.provider == "yandex":
             self._yandex_key = yandex_api_key or os.environ.get("YANDEX_API_KEY")
             self._yandex_folder = yandex_folder_id or os.environ.get("YANDEX_FOLDER_ID")
@@ -75,7 +120,10 @@ class LLMClient:
                     "YANDEX_FOLDER_ID не задан для провайдера yandex. "
                     "Укажите в .env идентификатор каталога (folder) из Yandex Cloud."
                 )
+            self.model = "yandexgpt/latest"
+            self.temperature = 0.3
             self._client = None
+            self._http = shared_session()
         else:
             raise ValueError(f"Неизвестный провайдер LLM: {self.provider}")
 
@@ -85,21 +133,32 @@ class LLMClient:
         user_prompt: str,
         *,
         as_json: bool = False,
+        validate: Callable[[str], bool] | None = None,
     ) -> str | dict[str, Any]:
         """
         Отправить запрос в LLM и вернуть ответ.
         :param system_prompt: системный промпт (роль).
         :param user_prompt: запрос пользователя.
         :param as_json: если True — парсить ответ как JSON и вернуть dict.
+        :param validate: проверка текста ответа вызывающим (например, есть ли в нём файлы): не прошедший
+            её ответ возвращается, но не кэшируется, а такой же из кэша не используется.
         :return: строка ответа или dict при as_json=True.
         """
         last_error = None
         for attempt in range(self.max_retries):
             try:
-                text = self._call_llm(system_prompt, user_prompt)
-                if as_json:
-                    return json.loads(text)
-                return text
+                # Повтор идёт в LLM мимо кэша: закэшированный ответ мог оказаться невалидным JSON
+                text = self._cache_get(system_prompt, user_prompt) if attempt == 0 else None
+                if text is not None and validate is not None and not validate(text):
+                    text = None
+                fresh = text is None
+                if text is None:
+                    text = self._call_llm(system_prompt, user_prompt)
+                result = json.loads(text) if as_json else text
+                # В кэш — только ответ, который разобрался и прошёл проверку
+                if fresh and (validate is None or validate(text)):
+                    self._cache_set(system_prompt, user_prompt, text)
+                return result
             except (APITimeoutError, APIConnectionError, requests.exceptions.Timeout) as e:
                 last_error = e
                 if attempt < self.max_retries - 1:
@@ -110,14 +169,72 @@ class LLMClient:
                     time.sleep(self.retry_delay)
         raise last_error  # type: ignore[misc]
 
+    def generate_many(
+        self,
+        prompts: list[tuple[str, str]],
+        *,
+        as_json: bool = False,
+        max_concurrency: int | None = None,
+        return_exceptions: bool = False,
+        validate: Callable[[str], bool] | None = None,
+    ) -> list[Any]:
+        """
+        Отправить несколько запросов параллельно (пул потоков) и вернуть ответы в порядке prompts.
+        Темп запросов ограничен лимитом провайдера (LLM_RPM), retry — как в generate_response.
+        :param prompts: список пар (system_prompt, user_prompt).
+        :param max_concurrency: одновременных запросов (по умолчанию LLM_MAX_CONCURRENCY).
+        :param return_exceptions: вернуть исключение на месте неудачного ответа вместо того, чтобы бросить его.
+        :param validate: как в generate_response — кэшируются только прошедшие проверку ответы.
+        """
+        if not prompts:
+            return []
+        workers = max(1, min(max_concurrency or LLM_MAX_CONCURRENCY, len(prompts)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(
+                    self.generate_response, system, user, as_json=as_json, validate=validate
+                )
+                for system, user in prompts
+            ]
+            results: list[Any] = []
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    if not return_exceptions:
+                        raise
+                    results.append(e)
+        return results
+
+    def cache_stats(self) -> dict:
+        """Попадания и промахи кэша ответов (hits, misses, bytes); нули, если кэш выключен."""
+        if self.cache is None:
+            return {"hits": 0, "misses": 0, "bytes": 0}
+        return self.cache.stats()
+
+    def _cache_key(self, system_prompt: str, user_prompt: str) -> str:
+        return response_key(self.provider, self.model, self.temperature, system_prompt, user_prompt)
+
+    def _cache_get(self, system_prompt: str, user_prompt: str) -> str | None:
+        if self.cache is None:
+            return None
+        entry = self.cache.get(self._cache_key(system_prompt, user_prompt))
+        return entry.get("text") if entry else None
+
+    def _cache_set(self, system_prompt: str, user_prompt: str, text: str) -> None:
+        # Пустой ответ не кэшируем: скорее всего это сбой, и повтор должен уйти в LLM
+        if self.cache is not None and text:
+            self.cache.set(self._cache_key(system_prompt, user_prompt), {"text": text})
+
     def _call_llm(self, system_prompt: str, user_prompt: str) -> str:
+        _RATE_LIMITS[self.provider].acquire()
         if self.provider == "openai":
             return self._call_openai(system_prompt, user_prompt)
         return self._call_yandex(system_prompt, user_prompt)
 
     def _call_openai(self, system_prompt: str, user_prompt: str) -> str:
         response = self._client.chat.completions.create(
-            model="gpt-4o-mini",
+            model=self.model,
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt},
@@ -126,7 +243,10 @@ class LLMClient:
         )
         return (response.choices[0].message.content or "").strip()
 
-    def _call_yandex(self, system_prompt: str, user_prompt: str) -> str:
+    def _yandex_request(
+        self, system_prompt: str, user_prompt: str, *, stream: bool
+    ) -> tuple[str, dict, dict]:
+        """URL, заголовки и тело запроса к YandexGPT (обычного или потокового)."""
         # Yandex GPT API (REST): https://cloud.yandex.ru/docs/yandexgpt/api-ref/
         url = "https://llm.api.cloud.yandex.net/foundationModels/v1/completion"
         headers = {
@@ -134,10 +254,10 @@ class LLMClient:
             "Content-Type": "application/json",
         }
         payload = {
-            "modelUri": f"gpt://{self._yandex_folder}/yandexgpt/latest",
+            "modelUri": f"gpt://{self._yandex_folder}/{self.model}",
             "completionOptions": {
-                "stream": False,
-                "temperature": 0.3,
+                "stream": stream,
+                "temperature": self.temperature,
                 "maxTokens": "2000",
             },
             "messages": [
@@ -145,7 +265,11 @@ class LLMClient:
                 {"role": "user", "text": user_prompt},
             ],
         }
-        resp = requests.post(
+        return url, headers, payload
+
+    def _call_yandex(self, system_prompt: str, user_prompt: str) -> str:
+        url, headers, payload = self._yandex_request(system_prompt, user_prompt, stream=False)
+        resp = self._http.post(
             url,
             json=payload,
             headers=headers,
@@ -157,3 +281,79 @@ class LLMClient:
         if not alternatives:
             return ""
         return (alternatives[0].get("message", {}).get("text", "") or "").strip()
+
+    def stream_response(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        validate: Callable[[str], bool] | None = None,
+    ) -> Iterator[str]:
+        """
+        Потоковый ответ LLM: фрагменты текста по мере генерации.
+        Повтор при ошибке — только пока не получен первый фрагмент (иначе ответ был бы склеен из двух).
+        Ответ из кэша отдаётся одним фрагментом; полученный потоком ответ сохраняется в кэш целиком,
+        если прошёл validate (оборванный или пустой ответ иначе повторялся бы при каждом перезапуске).
+        """
+        cached = self._cache_get(system_prompt, user_prompt)
+        if cached is not None and (validate is None or validate(cached)):
+            yield cached
+            return
+        last_error: Exception | None = None
+        for attempt in range(self.max_retries):
+            started = False
+            try:
+                _RATE_LIMITS[self.provider].acquire()
+                if self.provider == "openai":
+                    chunks = self._stream_openai(system_prompt, user_prompt)
+                else:
+                    chunks = self._stream_yandex(system_prompt, user_prompt)
+                parts: list[str] = []
+                for chunk in chunks:
+                    started = True
+                    parts.append(chunk)
+                    yield chunk
+                text = "".join(parts).strip()
+                if validate is None or validate(text):
+                    self._cache_set(system_prompt, user_prompt, text)
+                return
+            except Exception as e:
+                if started:
+                    raise
+                last_error = e
+                if attempt < self.max_retries - 1:
+                    time.sleep(self.retry_delay)
+        raise last_error  # type: ignore[misc]
+
+    def _stream_openai(self, system_prompt: str, user_prompt: str) -> Iterator[str]:
+        stream = self._client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            timeout=self.timeout,
+            stream=True,
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def _stream_yandex(self, system_prompt: str, user_prompt: str) -> Iterator[str]:
+        # В потоковом режиме YandexGPT присылает JSON-строки с накопленным текстом — отдаём только прирост
+        url, headers, payload = self._yandex_request(system_prompt, user_prompt, stream=True)
+        with self._http.post(
+            url, json=payload, headers=headers, timeout=self.timeout, stream=True
+        ) as resp:
+            resp.raise_for_status()
+            sent = 0
+            for line in resp.iter_lines(decode_unicode=True):
+                if not line:
+                    continue
+                data = json.loads(line)
+                alternatives = data.get("result", {}).get("alternatives", [])
+                if not alternatives:
+                    continue
+                text = alternatives[0].get("message", {}).get("text", "") or ""
+                if len(text) > sent:
+                    yield text[sent:]
+                    sent = len(text)
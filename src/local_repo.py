@@ -0,0 +1,123 @@
+"""
+Чтение структуры и файлов репозитория из локального git-клона.
+Цель: собирать контекст без GitHub API, когда репозиторий уже склонирован (в Actions — /app).
+Интерфейс совпадает с GithubClient (list_repo_tree, list_repo_files, get_file_contents).
+"""
+
+from __future__ import annotations
+
+import subprocess
+from pathlib import Path
+
+
+class LocalRepo:
+    """Дерево и содержимое файлов для ref из локального клона: git ls-tree и git cat-file --batch."""
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+
+    @classmethod
+    def open(cls, root: str | Path | None) -> LocalRepo | None:
+        """LocalRepo, если root — рабочая копия git; иначе None."""
+        if not root or not Path(root).is_dir():
+            return None
+        repo = cls(root)
+        out = repo._git(["rev-parse", "--is-inside-work-tree"])
+        if out is None or out.strip() != b"true":
+            return None
+        return repo
+
+    def _git(self, args: list[str], stdin: bytes | None = None) -> bytes | None:
+        """Выполнить git, вернуть stdout (bytes) или None при ошибке."""
+        try:
+            r = subprocess.run(
+                ["git"] + args,
+                check=False,
+                cwd=self.root,
+                input=stdin,
+                capture_output=True,
+                timeout=60,
+            )
+        except (OSError, subprocess.SubprocessError):
+            return None
+        return r.stdout if r.returncode == 0 else None
+
+    def resolve_ref(self, ref: str | None) -> str | None:
+        """
+        Sha коммита для ref, если он есть локально: сначала origin/<ref> (свежее локальной ветки), затем ref.
+        Без ref — HEAD. None, если коммита в клоне нет (тогда нужен GitHub API).
+        """
+        candidates = [f"origin/{ref}", ref] if ref else ["HEAD"]
+        for name in candidates:
+            out = self._git(["rev-parse", "--verify", "--quiet", f"{name}^{{commit}}"])
+            if out:
+                return out.decode().strip()
+        return None
+
+    def list_repo_tree(self, ref: str | None = None) -> list[dict]:
+        """Все файлы ref: {path, sha, size, mode}, как GithubClient.list_repo_tree."""
+        sha = self.resolve_ref(ref)
+        if sha is None:
+            raise ValueError(f"ref {ref!r} не найден в локальном клоне {self.root}")
+        out = self._git(["ls-tree", "-r", "-l", "-z", "--full-tree", sha])
+        if out is None:
+            raise RuntimeError(f"git ls-tree {sha} не выполнен")
+        result = []
+        for record in out.decode("utf-8", errors="replace").split("\0"):
+            if not record or "\t" not in record:
+                continue
+            meta, path = record.split("\t", 1)
+            mode, obj_type, obj_sha, size = meta.split()
+            if obj_type != "blob":
+                continue
+            if path.startswith(".git") or "/.git" in path:
+                continue
+            result.append({"path": path, "sha": obj_sha, "size": int(size), "mode": mode})
+        return sorted(result, key=lambda x: x["path"])
+
+    def list_repo_files(
+        self, path: str = "", ref: str | None = None, max_depth: int = 4
+    ) -> list[str]:
+        """Список путей файлов (с ограничением глубины относительно path), как GithubClient.list_repo_files."""
+        prefix = path.strip("/") + "/" if path.strip("/") else ""
+        result = []
+        for entry in self.list_repo_tree(ref):
+            p = entry["path"]
+            if prefix and not p.startswith(prefix):
+                continue
+            if p[len(prefix) :].count("/") >= max_depth:
+                continue
+            result.append(p)
+        return result
+
+    def get_file_contents(self, paths: list[str], ref: str | None = None) -> dict[str, str]:
+        """
+        Содержимое файлов одним вызовом git cat-file --batch.
+        Отсутствующие и бинарные (с NUL-байтами) файлы пропускаются.
+        """
+        sha = self.resolve_ref(ref)
+        if sha is None:
+            raise ValueError(f"ref {ref!r} не найден в локальном клоне {self.root}")
+        names = [p for p in paths if p and "\n" not in p]
+        if not names:
+            return {}
+        stdin = "".join(f"{sha}:{p}\n" for p in names).encode("utf-8")
+        out = self._git(["cat-file", "--batch"], stdin=stdin)
+        if out is None:
+            raise RuntimeError("git cat-file --batch не выполнен")
+        result: dict[str, str] = {}
+        pos = 0
+        for path in names:
+            eol = out.index(b"\n", pos)
+            line = out[pos:eol]
+            pos = eol + 1
+            if line.endswith((b" missing", b" ambiguous")):
+                continue
+            header = line.split()
+            size = int(header[2])
+            data = out[pos : pos + size]
+            pos += size + 1
+            if header[1] != b"blob" or b"\0" in data:
+                continue
+            result[path] = data.decode("utf-8", errors="replace")
+        return result
@@ -9,6 +9,7 @@ import os
 import sys
 import json
 import argparse
+from typing import TYPE_CHECKING
 
 # Загрузка .env при локальном запуске
 try:
@@ -17,6 +18,14 @@ try:
 except ImportError:
     pass
 
+from rate_limiter import RateLimitExceeded
+
+if TYPE_CHECKING:
+    from github_client import GithubClient
+
+# Код выхода, когда прогон остановлен лимитом GitHub API (EX_TEMPFAIL: повторить после сброса)
+EXIT_RATE_LIMITED = 75
+
 
 def run_skeleton_tests(
     *,
@@ -96,8 +105,19 @@ def main() -> int:
     parser.add_argument("--no-github-read", action="store_true", help="(скелет) Не читать Issue")
     parser.add_argument("--test-write", action="store_true", help="(скелет) Тест записи: комментарий в Issue или ветка")
     parser.add_argument("--branch", type=str, help="(скелет) Имя ветки для теста создания")
+    parser.add_argument(
+        "--serve", action="store_true", help="Режим сервиса: приём вебхуков GitHub по HTTP"
+    )
+    parser.add_argument(
+        "--port", type=int, help="(сервис) Порт HTTP, по умолчанию AGENT_SERVICE_PORT"
+    )
     args = parser.parse_args()
 
+    if args.serve:
+        from agent_service import AGENT_SERVICE_PORT, serve
+
+        return serve(args.port or AGENT_SERVICE_PORT)
+
     # Контекст из аргументов или из GitHub Actions
     issue_number = args.issue
     pr_number = args.pr
@@ -120,11 +140,40 @@ def main() -> int:
     if issue_number is None:
         issue_number = int(os.environ.get("ISSUE_NUMBER", "0")) or None
 
+    # Событие по устаревшему head PR (после него уже был push) — прогон по новому head его заменит.
+    # Клиент проверки передаётся агенту; не удалось создать — агент создаст свой и сообщит ошибку
+    gh: GithubClient | None = None
+    head_sha = os.environ.get("HEAD_SHA")
+    if pr_number and head_sha and not args.skeleton:
+        import requests
+        from github import GithubException
+
+        from agent_service import is_stale
+        from github_client import GithubClient
+
+        try:
+            gh = GithubClient()
+            if is_stale(gh, {"number": pr_number, "head_sha": head_sha}):
+                print(
+                    f"[main] PR #{pr_number}: head уже не {head_sha[:7]}, событие устарело — пропуск."
+                )
+                return 0
+        except RateLimitExceeded as e:
+            print(f"[main] Лимит GitHub API, прогон остановлен: {e}", file=sys.stderr)
+            return EXIT_RATE_LIMITED
+        except (ValueError, GithubException, requests.RequestException) as e:
+            print(f"[main] Не удалось проверить head PR: {e}", file=sys.stderr)
+
     # Code Agent Fix: правки по замечаниям Reviewer (триггер: review REQUEST_CHANGES)
     if pr_number and not args.skeleton and os.environ.get("FIX_MODE") == "1":
         try:
             from code_agent import run_code_agent_fix
-            return run_code_agent_fix(pr_number)
+            return run_code_agent_fix(pr_number, gh=gh)
+        except RateLimitExceeded as e:
+            print(
+                f"[main] Code Agent Fix: лимит GitHub API, прогон остановлен: {e}", file=sys.stderr
+            )
+            return EXIT_RATE_LIMITED
         except Exception as e:
             print(f"[main] Ошибка Code Agent Fix: {e}", file=sys.stderr)
             return 1
@@ -133,7 +182,12 @@ def main() -> int:
     if pr_number and not args.skeleton:
         try:
             from reviewer_agent import run_reviewer_agent
-            return run_reviewer_agent(pr_number)
+            return run_reviewer_agent(pr_number, gh=gh)
+        except RateLimitExceeded as e:
+            print(
+                f"[main] Reviewer Agent: лимит GitHub API, прогон остановлен: {e}", file=sys.stderr
+            )
+            return EXIT_RATE_LIMITED
         except Exception as e:
             print(f"[main] Ошибка Reviewer Agent: {e}", file=sys.stderr)
             return 1
@@ -143,6 +197,9 @@ def main() -> int:
         try:
             from code_agent import run_code_agent
             return run_code_agent(issue_number)
+        except RateLimitExceeded as e:
+            print(f"[main] Code Agent: лимит GitHub API, прогон остановлен: {e}", file=sys.stderr)
+            return EXIT_RATE_LIMITED
         except Exception as e:
             print(f"[main] Ошибка Code Agent: {e}", file=sys.stderr)
             return 1
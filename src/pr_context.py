@@ -4,28 +4,73 @@
 """
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from typing import TYPE_CHECKING
 
+from issue_parser import repo_index
+from local_repo import LocalRepo
+
 if TYPE_CHECKING:
     from github_client import GithubClient
 
+PR_CONTEXT_WORKERS = 4  # параллельных запросов к GitHub при сборе контекста
+
+
+def _get_issue_or_none(gh: GithubClient, issue_number: int) -> dict | None:
+    try:
+        return gh.get_issue_details(issue_number)
+    except Exception:
+        return None
+
+
+def _dependents(
+    head_sha: str, changed_files: list[dict], repo_root: str | Path | None
+) -> list[str]:
+    """
+    Файлы, импортирующие изменённые в PR Python-модули (сами не изменённые): по индексу репозитория
+    для head_sha из локального клона. Без коммита в клоне — пусто: через API индекс не строится.
+    """
+    changed = {f["path"] for f in changed_files if f.get("status") != "removed"}
+    py_changed = sorted(p for p in changed if p.endswith(".py"))
+    if not py_changed:
+        return []
+    local = LocalRepo.open(repo_root)
+    sha = local.resolve_ref(head_sha) if local is not None else None
+    index = repo_index(local, sha, repo_root) if sha else None
+    if index is None:
+        return []
+    out: list[str] = []
+    for path in py_changed:
+        out.extend(p for p in index.dependents(path) if p not in changed and p not in out)
+    return out
+
 
-def get_pr_context(gh: "GithubClient", pr_number: int) -> dict:
+def get_pr_context(gh: GithubClient, pr_number: int, repo_root: str | Path | None = None) -> dict:
     """
-    Собрать контекст PR: diff, детали PR, связанный Issue, изменённые файлы, результаты CI.
-    :return: dict с ключами pr, diff, issue, changed_files, ci_summary.
+    Собрать контекст PR: diff, детали PR, связанный Issue, изменённые файлы, результаты CI,
+    зависимые от изменённых модулей файлы (по индексу репозитория, см. repo_index).
+    Независимые запросы (детали, diff, файлы) идут параллельно; Issue и CI по head_sha
+    запускаются, как только готовы детали PR.
+    :param repo_root: локальный клон — источник файлов для индекса и место его хранения.
+    :return: dict с ключами pr, diff, issue, changed_files, dependents, ci_summary.
     """
-    pr = gh.get_pr_details(pr_number)
-    diff = gh.get_pr_diff(pr_number)
-    changed_files = gh.get_pr_changed_files(pr_number)
-    issue_number = gh.parse_issue_number_from_pr(pr_number)
-    issue = None
-    if issue_number:
-        try:
-            issue = gh.get_issue_details(issue_number)
-        except Exception:
-            pass
-    ci_runs = gh.get_workflow_runs_for_head(pr["head_sha"])
+    with ThreadPoolExecutor(max_workers=PR_CONTEXT_WORKERS) as pool:
+        pr_future = pool.submit(gh.get_pr_details, pr_number)
+        diff_future = pool.submit(gh.get_pr_diff, pr_number)
+        files_future = pool.submit(gh.get_pr_changed_files, pr_number)
+
+        pr = pr_future.result()
+        ci_future = pool.submit(gh.get_workflow_runs_for_head, pr["head_sha"])
+        issue_number = gh.parse_issue_number_from_pr(pr_number)  # PR уже в кэше клиента
+        issue_future = pool.submit(_get_issue_or_none, gh, issue_number) if issue_number else None
+
+        diff = diff_future.result()
+        changed_files = files_future.result()
+        issue = issue_future.result() if issue_future else None
+        ci_runs = ci_future.result()
+    dependents = _dependents(pr["head_sha"], changed_files, repo_root)
+
     ci_summary = "\n".join(
         f"- {r['name']}: {r['conclusion']}" + (f" ({r['html_url']})" if r.get("html_url") else "")
         for r in ci_runs
@@ -36,6 +81,7 @@ def get_pr_context(gh: "GithubClient", pr_number: int) -> dict:
         "diff": diff,
         "issue": issue,
         "changed_files": changed_files,
+        "dependents": dependents,
         "ci_summary": ci_summary,
         "ci_runs": ci_runs,
     }
@@ -58,17 +104,31 @@ def format_pr_context_for_llm(ctx: dict) -> str:
         parts.append(issue.get("body") or "(нет описания)")
     else:
         parts.append("(Issue не найден по Closes #N в PR)")
-    parts.extend([
-        "",
-        "## Изменённые файлы",
-        "\n".join(f"- {f['path']} ({f['status']})" for f in ctx["changed_files"]),
-        "",
-        "## Результаты CI",
-        ctx["ci_summary"],
-        "",
-        "## Diff (изменения в коде)",
-        "```diff",
-        ctx["diff"][:50000] + ("\n... (обрезано)" if len(ctx["diff"]) > 50000 else ""),
-        "```",
-    ])
+    parts.extend(
+        [
+            "",
+            "## Изменённые файлы",
+            "\n".join(f"- {f['path']} ({f['status']})" for f in ctx["changed_files"]),
+            "",
+        ]
+    )
+    if ctx.get("dependents"):
+        parts.extend(
+            [
+                "## Зависимые модули (импортируют изменённые файлы — проверь совместимость)",
+                "\n".join(f"- {path}" for path in ctx["dependents"]),
+                "",
+            ]
+        )
+    parts.extend(
+        [
+            "## Результаты CI",
+            ctx["ci_summary"],
+            "",
+            "## Diff (изменения в коде)",
+            "```diff",
+            ctx["diff"][:50000] + ("\n... (обрезано)" if len(ctx["diff"]) > 50000 else ""),
+            "```",
+        ]
+    )
     return "\n".join(parts)
@@ -3,7 +3,13 @@
 """
 from __future__ import annotations
 
-SYSTEM_PROMPT = """Ты — Senior Python Developer. Твоя задача — проанализировать Issue (задачу) и внести минимально необходимые, но полные изменения в код репозитория.
+# Второй формат ответа: правки блоками поиска/замены вместо полного содержимого файла
+EDITS_FORMAT = """Для существующего файла вместо "content" можно вернуть "edits" — список правок {"search": "...", "replace": "..."}: "search" — точный фрагмент текущего файла (несколько строк целиком, достаточно, чтобы он встречался один раз), "replace" — чем его заменить. Пример:
+{"files": [{"path": "src/foo.py", "edits": [{"search": "def bar():\\n    pass\\n", "replace": "def bar():\\n    return 1\\n"}]}]}
+"""
+
+SYSTEM_PROMPT = (
+    """Ты — Senior Python Developer. Твоя задача — проанализировать Issue (задачу) и внести минимально необходимые, но полные изменения в код репозитория.
 
 Правила:
 - Меняй только те файлы, которые нужны для выполнения задачи.
@@ -12,17 +18,36 @@ SYSTEM_PROMPT = """Ты — Senior Python Developer. Твоя задача — 
 
 Формат ответа — один JSON-объект с ключом "files": массив объектов, каждый с полями "path" (строка, путь к файлу) и "content" (строка, полное содержимое файла после изменений). Если файл не менялся — не включай его. Пример:
 {"files": [{"path": "src/foo.py", "content": "def bar():\\n    pass\\n"}]}
+
 """
+    + EDITS_FORMAT
+)
+
 
+def edits_hint(paths: list[str]) -> str:
+    """Указание возвращать правки (edits), а не файл целиком, для больших файлов."""
+    return (
+        "Файлы " + ", ".join(paths) + ' большие: для них верни только "edits" '
+        '(блоки search/replace), а не полное "content".'
+    )
 
-def build_user_prompt(context_text: str, reviewer_feedback: str | None = None) -> str:
-    """Собрать user prompt: контекст Issue + репо и при повторе — замечания Reviewer."""
+
+def build_user_prompt(
+    context_text: str,
+    reviewer_feedback: str | None = None,
+    edit_paths: list[str] | None = None,
+) -> str:
+    """
+    Собрать user prompt: контекст Issue + репо и при повторе — замечания Reviewer.
+    :param edit_paths: большие файлы, для которых нужен формат edits.
+    """
     parts = [
         "Ниже контекст: описание задачи (Issue), структура репозитория и содержимое ключевых файлов.",
-        "Верни JSON с полем \"files\" — массив изменённых файлов {path, content}.",
-        "",
-        context_text,
+        'Верни JSON с полем "files" — массив изменённых файлов {path, content} или {path, edits}.',
     ]
+    if edit_paths:
+        parts.append(edits_hint(edit_paths))
+    parts += ["", context_text]
     if reviewer_feedback:
         parts.append("\n\n--- Замечания Reviewer (обязательно учти при правках) ---\n")
         parts.append(reviewer_feedback)
@@ -52,7 +77,8 @@ REVIEWER_SYSTEM_PROMPT = """Ты — строгий, но конструктив
 
 # --- Code Agent: режим правок по замечаниям Reviewer ---
 
-FIX_PROMPT = """Ты — Senior Python Developer. Проанализируй замечания ревьюера и внеси правки в существующий код, чтобы устранить указанные недостатки.
+FIX_PROMPT = (
+    """Ты — Senior Python Developer. Проанализируй замечания ревьюера и внеси правки в существующий код, чтобы устранить указанные недостатки.
 
 Правила:
 - Меняй только то, что указано в замечаниях (инкрементальные правки, hotfixes).
@@ -60,4 +86,8 @@ FIX_PROMPT = """Ты — Senior Python Developer. Проанализируй з
 - Сохраняй стиль кода (black, ruff).
 - Отвечай только валидным JSON без markdown-обёртки.
 
-Формат ответа — один JSON-объект с ключом "files": массив объектов {"path": "...", "content": "..."} с полным содержимым изменённых файлов. Включай только файлы, в которые вносишь правки."""
+Формат ответа — один JSON-объект с ключом "files": массив объектов {"path": "...", "content": "..."} с полным содержимым изменённых файлов. Включай только файлы, в которые вносишь правки.
+
+"""
+    + EDITS_FORMAT
+)
@@ -0,0 +1,264 @@
+"""
+Параллельный pytest: тестовые файлы раскладываются по шардам (по числу ядер) с учётом
+длительностей прошлых запусков, шарды идут одновременно под общим бюджетом времени.
+Цель: большой набор тестов укладывается в бюджет итерации агента, а по истечении бюджета
+прерываются только незавершённые шарды — результаты уже прошедших тестов всё равно попадают в лог.
+Модуль же — плагин pytest (-p pytest_shards): пишет по тесту строку JSON с длительностью,
+из которых собирается история (JSON-артефакт, в workflow — через actions/cache).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+# Шардов не больше стольких (по умолчанию — число ядер)
+PYTEST_WORKERS = int(os.environ.get("PYTEST_WORKERS", "0")) or os.cpu_count() or 1
+# История длительностей тестов (относительно корня репозитория)
+PYTEST_DURATIONS_FILE = os.environ.get(
+    "PYTEST_DURATIONS_FILE", ".agent-cache/pytest-durations.json"
+)
+# Не меньше стольких секунд ожидаемой работы на шард (мелкие наборы не дробятся ради запуска процессов)
+SHARD_MIN_SECONDS = 2.0
+# Оценка длительности файла без истории
+UNKNOWN_FILE_SECONDS = 1.0
+
+# Запуск шарда: (аргументы pytest, файл для вывода, таймаут) -> успех или None, если прерван по таймауту
+ShardRunner = Callable[[list[str], str, float], "bool | None"]
+
+
+# --- Плагин pytest ---
+
+
+class _DurationRecorder:
+    """Пишет в файл строки {"nodeid", "start"} при старте теста и {"nodeid", "duration", "outcome"} по окончании."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.durations: dict[str, float] = {}
+        self.failed: set[str] = set()
+
+    def _write(self, record: dict) -> None:
+        # Файл открывается на каждую запись: строка на диске сразу, даже если шард прервут
+        with open(self.path, "a", encoding="utf-8") as out:
+            out.write(json.dumps(record) + "\n")
+
+    def pytest_runtest_logstart(self, nodeid: str, location: Any) -> None:
+        self._write({"nodeid": nodeid, "start": time.time()})
+
+    def pytest_runtest_logreport(self, report: Any) -> None:
+        self.durations[report.nodeid] = self.durations.get(report.nodeid, 0.0) + report.duration
+        if report.failed:
+            self.failed.add(report.nodeid)
+
+    def pytest_runtest_logfinish(self, nodeid: str, location: Any) -> None:
+        outcome = "failed" if nodeid in self.failed else "passed"
+        self._write(
+            {
+                "nodeid": nodeid,
+                "duration": round(self.durations.pop(nodeid, 0.0), 4),
+                "outcome": outcome,
+            }
+        )
+        # Вывод -v уходит в файл: без сброса буфера при прерывании шарда последние строки потерялись бы
+        sys.stdout.flush()
+
+
+def pytest_addoption(parser: Any) -> None:
+    parser.addoption(
+        "--shard-report", default=None, help="файл для длительностей тестов (JSON lines)"
+    )
+
+
+def pytest_configure(config: Any) -> None:
+    path = config.getoption("shard_report")
+    if path:
+        config.pluginmanager.register(_DurationRecorder(path), "shard-report")
+
+
+# --- Раскладка и запуск ---
+
+
+def load_durations(repo_root: str | Path) -> dict[str, float]:
+    """История: nodeid теста -> длительность последнего прогона, секунд."""
+    try:
+        data = json.loads((Path(repo_root) / PYTEST_DURATIONS_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return {k: float(v) for k, v in data.items()} if isinstance(data, dict) else {}
+
+
+def save_durations(repo_root: str | Path, durations: dict[str, float]) -> None:
+    """Записать историю атомарно (ошибки записи не фатальны)."""
+    path = Path(repo_root) / PYTEST_DURATIONS_FILE
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(durations, indent=0, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def collect_test_files(repo_root: str | Path, targets: list[str]) -> list[str]:
+    """Раскрыть каталоги в тестовые файлы (test_*.py, *_test.py); файлы и node id остаются как есть."""
+    root = Path(repo_root)
+    files: list[str] = []
+    for target in targets:
+        full = root / target
+        if full.is_dir():
+            found = sorted(
+                str(p.relative_to(root)).replace(os.sep, "/")
+                for p in full.rglob("*.py")
+                if (p.name.startswith("test_") or p.name.endswith("_test.py"))
+                and "__pycache__" not in p.parts
+            )
+            files.extend(f for f in found if f not in files)
+        elif target not in files:
+            files.append(target)
+    return files
+
+
+def file_durations(files: list[str], history: dict[str, float]) -> dict[str, float]:
+    """Ожидаемая длительность каждого файла: сумма его тестов из истории (без истории — средняя)."""
+    per_file: dict[str, float] = {}
+    for nodeid, seconds in history.items():
+        path = nodeid.split("::", 1)[0]
+        per_file[path] = per_file.get(path, 0.0) + seconds
+    known = [per_file[f] for f in files if f in per_file]
+    default = sum(known) / len(known) if known else UNKNOWN_FILE_SECONDS
+    return {f: per_file.get(f.split("::", 1)[0], default) for f in files}
+
+
+def plan_shards(
+    files: list[str], durations: dict[str, float], workers: int = PYTEST_WORKERS
+) -> list[list[str]]:
+    """
+    Разложить файлы по шардам: медленные — первыми, каждый следующий — в наименее загруженный шард (LPT).
+    Внутри шарда файлы идут по убыванию длительности, чтобы долгие тесты не оставались на конец бюджета.
+    """
+    if not files:
+        return []
+    total = sum(durations[f] for f in files)
+    count = max(1, min(workers, len(files), int(total / SHARD_MIN_SECONDS) or 1))
+    shards: list[list[str]] = [[] for _ in range(count)]
+    loads = [0.0] * count
+    for path in sorted(files, key=lambda f: -durations[f]):
+        i = loads.index(min(loads))
+        shards[i].append(path)
+        loads[i] += durations[path]
+    return [shard for shard in shards if shard]
+
+
+def run_subprocess(
+    cmd: list[str], cwd: str | Path, output_path: str, timeout: float
+) -> bool | None:
+    """ShardRunner на subprocess: вывод — в файл без буферизации; None — процесс убит по таймауту."""
+    env = dict(os.environ, PYTHONUNBUFFERED="1")
+    src = str(Path(__file__).resolve().parent)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [src, env.get("PYTHONPATH")]))
+    with open(output_path, "wb") as out:
+        try:
+            proc = subprocess.Popen(cmd, cwd=cwd, stdout=out, stderr=subprocess.STDOUT, env=env)
+        except OSError as e:
+            out.write(str(e).encode())
+            return False
+        try:
+            return proc.wait(timeout=timeout) == 0
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+            return None
+
+
+def _read_records(path: Path) -> list[dict]:
+    try:
+        lines = path.read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return []
+    records = []
+    for line in lines:
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            pass  # строка, оборванная при прерывании
+    return records
+
+
+def run_sharded(
+    repo_root: str | Path,
+    targets: list[str],
+    args: list[str],
+    run_shard: ShardRunner,
+    budget: float,
+    workers: int = PYTEST_WORKERS,
+) -> tuple[bool, str]:
+    """
+    Запустить тесты targets шардами одновременно и обновить историю длительностей.
+    :param args: общие аргументы pytest (например -v --tb=short).
+    :param run_shard: как запускать один шард (тёплый процесс проверок или subprocess).
+    :param budget: секунд на весь прогон; шарды, не уложившиеся в него, прерываются, а в лог идёт
+        их частичный вывод и тест, на котором шард остановился.
+    :return: (все тесты прошли и ни один шард не прерван, лог).
+    """
+    root = Path(repo_root)
+    history = load_durations(root)
+    files = collect_test_files(root, targets)
+    shards = plan_shards(files, file_durations(files, history), workers)
+    if not shards:
+        return True, "Нет тестов."
+    with tempfile.TemporaryDirectory(prefix="pytest-shards-") as tmp:
+        outputs = [Path(tmp, f"shard-{i}.log") for i in range(len(shards))]
+        reports = [Path(tmp, f"shard-{i}.jsonl") for i in range(len(shards))]
+        with ThreadPoolExecutor(max_workers=len(shards)) as pool:
+            futures = [
+                pool.submit(
+                    run_shard,
+                    ["-p", "pytest_shards", f"--shard-report={reports[i]}", *args, *shard],
+                    str(outputs[i]),
+                    budget,
+                )
+                for i, shard in enumerate(shards)
+            ]
+            results = [f.result() for f in futures]
+        now = time.time()
+
+        logs: list[str] = []
+        for i, (shard, result) in enumerate(zip(shards, results)):
+            try:
+                output = outputs[i].read_text(encoding="utf-8", errors="replace")
+            except OSError:
+                output = ""
+            running: dict[str, float] = {}
+            for record in _read_records(reports[i]):
+                if "start" in record:
+                    running[record["nodeid"]] = record["start"]
+                else:
+                    running.pop(record["nodeid"], None)
+                    history[record["nodeid"]] = record["duration"]
+            if len(shards) > 1:
+                logs.append(f"--- шард {i + 1}/{len(shards)}: {', '.join(shard)} ---")
+            logs.append(output)
+            if result is None:
+                # Прерванный тест запоминается хотя бы с уже потраченным временем — в следующий раз он пойдёт первым
+                for nodeid, started in running.items():
+                    history[nodeid] = max(history.get(nodeid, 0.0), now - started)
+                # Строки в формате итога pytest (FAILED/ERROR ...), чтобы их разбирал тот же код
+                logs.extend(
+                    f"TIMEOUT {nodeid} - шард прерван по бюджету {budget:.0f}s "
+                    "(результаты выше — только для завершившихся тестов)"
+                    for nodeid in (running or shard)
+                )
+    # Тесты удалённых файлов из истории выбрасываются
+    save_durations(
+        root, {k: v for k, v in history.items() if (root / k.split("::", 1)[0]).is_file()}
+    )
+    return all(result is True for result in results), "\n".join(logs)
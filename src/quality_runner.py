@@ -4,9 +4,56 @@
 """
 from __future__ import annotations
 
+import atexit
+import json
+import os
+import re
 import subprocess
 import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
+from collections.abc import Callable
+
+from check_daemon import CheckDaemon
+from pytest_shards import run_sharded, run_subprocess
+from repo_index import module_name, parse_python, resolve_import
+
+CHECK_TIMEOUT = 120  # секунд на одну команду
+# Собирать ошибки всех проверок сразу (0 — прерывать остальные после первой ошибки)
+QUALITY_REPORT_ALL = os.environ.get("QUALITY_REPORT_ALL", "1") == "1"
+# Кэш инкрементального mypy (относительно корня репозитория; в workflow сохраняется через actions/cache)
+MYPY_CACHE_DIR = os.environ.get("MYPY_CACHE_DIR", ".agent-cache/mypy")
+CHECK_DIRS = ("src", "tests")
+# Тёплый процесс для black/pytest (check_daemon) и dmypy вместо холодного запуска на каждой итерации
+QUALITY_DAEMON = os.environ.get("QUALITY_DAEMON", "1") == "1"
+# Бюджет на pytest (секунд): шарды, не уложившиеся в него, прерываются с частичным результатом
+PYTEST_BUDGET = float(os.environ.get("PYTEST_BUDGET", str(CHECK_TIMEOUT)))
+
+# Замечаний на инструмент в отчёте для LLM (остальные только подсчитываются)
+QUALITY_MAX_ISSUES = int(os.environ.get("QUALITY_MAX_ISSUES", "20"))
+MAX_MESSAGE_CHARS = 300
+# Упавшая проверка без распознанных замечаний передаётся хвостом вывода такого размера
+RAW_TAIL_CHARS = 2000
+
+# Проверка: команда для subprocess или функция, возвращающая (успех, вывод)
+Check = list[str] | Callable[[], tuple[bool, str]]
+
+_daemons: dict[Path, CheckDaemon | None] = {}
+_daemons_lock = threading.Lock()
+
+# path -> (mtime, импорты): разбор файлов для графа импортов между итерациями одного прогона
+_imports_cache: dict[str, tuple[float, list[str]]] = {}
+
+_MYPY_RE = re.compile(
+    r"^(?P<file>[^\s:][^:\n]*\.pyi?):(?P<line>\d+):(?:\d+:)? error: (?P<message>.*?)(?:  \[(?P<code>[\w-]+)\])?$",
+    re.MULTILINE,
+)
+_PYTEST_SUMMARY_RE = re.compile(
+    r"^(?P<code>FAILED|ERROR|TIMEOUT) (?P<nodeid>\S+)(?: - (?P<message>.*))?$", re.MULTILINE
+)
+_PYTEST_SECTION_RE = re.compile(r"^_{3,} (?P<name>.+?) _{3,}$", re.MULTILINE)
+_PYTEST_FRAME_RE = re.compile(r"^(?P<file>[^\s/][^:\n]*\.py):(?P<line>\d+): ", re.MULTILINE)
 
 
 def run_cmd(cmd: list[str], cwd: str | Path) -> tuple[bool, str]:
@@ -17,46 +64,383 @@ def run_cmd(cmd: list[str], cwd: str | Path) -> tuple[bool, str]:
             cwd=cwd,
             capture_output=True,
             text=True,
-            timeout=120,
+            timeout=CHECK_TIMEOUT,
         )
         out = (r.stdout or "") + (r.stderr or "")
         return r.returncode == 0, out
     except subprocess.TimeoutExpired:
-        return False, "Timeout 120s"
+        return False, f"Timeout {CHECK_TIMEOUT}s"
     except Exception as e:
         return False, str(e)
 
 
-def run_quality_checks(repo_root: str | Path) -> tuple[bool, str]:
+def _daemon(root: Path) -> CheckDaemon | None:
+    """Тёплый процесс проверок для root (запускается при первом обращении и живёт до конца прогона)."""
+    if not QUALITY_DAEMON:
+        return None
+    with _daemons_lock:
+        if root not in _daemons:
+            daemon = CheckDaemon(root)
+            if daemon.start():
+                (root / MYPY_CACHE_DIR).mkdir(parents=True, exist_ok=True)
+                atexit.register(daemon.stop)
+                atexit.register(run_cmd, _dmypy_cmd("stop"), root)
+                _daemons[root] = daemon
+            else:
+                _daemons[root] = None
+        return _daemons[root]
+
+
+def _dmypy_cmd(*args: str) -> list[str]:
+    status = os.path.join(MYPY_CACHE_DIR, "dmypy.json")
+    return [sys.executable, "-m", "mypy.dmypy", "--status-file", status, *args]
+
+
+def _tool(root: Path, tool: str, args: list[str]) -> Check:
+    """black/pytest: через тёплый процесс, если он есть (при его недоступности — обычный subprocess)."""
+    cmd = [sys.executable, "-m", tool, *args]
+    daemon = _daemon(root)
+    if daemon is None:
+        return cmd
+
+    def call() -> tuple[bool, str]:
+        try:
+            return daemon.run(tool, args, timeout=CHECK_TIMEOUT)
+        except (OSError, ValueError):
+            return run_cmd(cmd, root)
+
+    return call
+
+
+def _pytest_shards(root: Path, tests: list[str], args: list[str]) -> Check:
+    """pytest шардами по ядрам (pytest_shards): каждый шард — через тёплый процесс или subprocess."""
+    daemon = _daemon(root)
+
+    def run_shard(shard_args: list[str], output_path: str, timeout: float) -> bool | None:
+        if daemon is not None:
+            try:
+                return daemon.run_to_file("pytest", shard_args, output_path, timeout)
+            except (OSError, ValueError):
+                pass
+        return run_subprocess(
+            [sys.executable, "-m", "pytest", *shard_args], root, output_path, timeout
+        )
+
+    return lambda: run_sharded(root, tests, args, run_shard, budget=PYTEST_BUDGET)
+
+
+def run_parallel(
+    checks: list[tuple[str, Check]],
+    cwd: str | Path,
+    report_all: bool = False,
+) -> dict[str, tuple[bool, str]]:
+    """
+    Запустить независимые проверки одновременно.
+    :param checks: [(имя, команда или функция)].
+    :param report_all: дождаться всех проверок; иначе после первой ошибки остальные прерываются
+        (их вывод заменяется пометкой «прервано»; проверки-функции дорабатывают, но их результат тот же).
+    :return: имя -> (успех, вывод) в порядке checks.
+    """
+    cancelled = threading.Event()
+    lock = threading.Lock()
+    procs: list[subprocess.Popen] = []
+
+    def run(cmd: Check) -> tuple[bool, str]:
+        if callable(cmd):
+            ok, out = cmd()
+            if not ok and cancelled.is_set():
+                return False, "(прервано после ошибки другой проверки)"
+            return ok, out
+        try:
+            proc = subprocess.Popen(
+                cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+            )
+        except OSError as e:
+            return False, str(e)
+        with lock:
+            procs.append(proc)
+            if cancelled.is_set():
+                proc.kill()
+        try:
+            out, _ = proc.communicate(timeout=CHECK_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.communicate()
+            return False, f"Timeout {CHECK_TIMEOUT}s"
+        if proc.returncode < 0 and cancelled.is_set():
+            return False, "(прервано после ошибки другой проверки)"
+        return proc.returncode == 0, out or ""
+
+    results: dict[str, tuple[bool, str]] = {}
+    with ThreadPoolExecutor(max_workers=max(1, len(checks))) as pool:
+        futures = {pool.submit(run, cmd): name for name, cmd in checks}
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = futures[future]
+                results[name] = future.result()
+                if not results[name][0] and not report_all and not cancelled.is_set():
+                    cancelled.set()
+                    with lock:
+                        for proc in procs:
+                            if proc.poll() is None:
+                                proc.kill()
+    return {name: results[name] for name, _ in checks}
+
+
+def _file_imports(root: Path, path: str) -> list[str]:
+    full = root / path
+    try:
+        mtime = full.stat().st_mtime
+    except OSError:
+        return []
+    cached = _imports_cache.get(str(full))
+    if cached and cached[0] == mtime:
+        return cached[1]
+    try:
+        imports = parse_python(full.read_text(encoding="utf-8"))["imports"]
+    except (OSError, UnicodeDecodeError):
+        imports = []
+    _imports_cache[str(full)] = (mtime, imports)
+    return imports
+
+
+def affected_tests(repo_root: str | Path, changed: list[str]) -> list[str] | None:
     """
-    Запустить black (форматирование), ruff check, mypy и pytest.
-    :return: (всё ли прошло, объединённый лог).
+    Тестовые файлы, которые прямо или через другие модули импортируют изменённые файлы
+    (граф импортов рабочего дерева src/ и tests/), плюс изменённые тесты.
+    :return: пути тестов или None, если нужен полный прогон (изменён conftest.py).
+    """
+    root = Path(repo_root)
+    if any(Path(p).name == "conftest.py" for p in changed):
+        return None
+    files = sorted(
+        str(p.relative_to(root)).replace(os.sep, "/")
+        for d in CHECK_DIRS
+        if (root / d).is_dir()
+        for p in (root / d).rglob("*.py")
+        if "__pycache__" not in p.parts
+    )
+    by_module: dict[str, str] = {}
+    for path in files:
+        by_module.setdefault(module_name(path), path)
+        by_module.setdefault(module_name(path).rsplit(".", 1)[-1], path)
+    importers: dict[str, set[str]] = {}
+    for path in files:
+        for name in _file_imports(root, path):
+            absolute = resolve_import(path, name)
+            target = by_module.get(absolute) or by_module.get(absolute.rsplit(".", 1)[-1])
+            if target and target != path:
+                importers.setdefault(target, set()).add(path)
+    affected = set(changed)
+    queue = list(changed)
+    while queue:
+        for importer in importers.get(queue.pop(), ()):
+            if importer not in affected:
+                affected.add(importer)
+                queue.append(importer)
+    return sorted(
+        p
+        for p in affected
+        if p.startswith("tests/") and Path(p).name.startswith("test_") and (root / p).is_file()
+    )
+
+
+def _issue(tool: str, file: str | None, line: int | None, code: str | None, message: str) -> dict:
+    message = " ".join(message.split())
+    if len(message) > MAX_MESSAGE_CHARS:
+        message = message[: MAX_MESSAGE_CHARS - 3] + "..."
+    return {"tool": tool, "file": file, "line": line, "code": code, "message": message}
+
+
+def _ruff_issues(root: Path, output: str) -> list[dict]:
+    start = re.search(r"^\[", output, re.MULTILINE)
+    if not start:
+        return []
+    try:
+        items, _ = json.JSONDecoder().raw_decode(output[start.start() :])
+    except ValueError:
+        return []
+    issues = []
+    for item in items:
+        path = Path(item.get("filename") or "")
+        if path.is_absolute() and path.is_relative_to(root.resolve()):
+            path = path.relative_to(root.resolve())
+        line = (item.get("location") or {}).get("row")
+        issues.append(
+            _issue("ruff", path.as_posix(), line, item.get("code"), item.get("message") or "")
+        )
+    return issues
+
+
+def _mypy_issues(output: str) -> list[dict]:
+    return [
+        _issue("mypy", m["file"], int(m["line"]), m["code"], m["message"])
+        for m in _MYPY_RE.finditer(output)
+    ]
+
+
+def _pytest_issues(output: str) -> list[dict]:
+    """
+    Из строк итога pytest (FAILED/ERROR, TIMEOUT — от pytest_shards) и секций --tb=short:
+    file/line — последний кадр трассировки в файле проекта (место падения), message — из итога или строки E.
+    """
+    sections: dict[str, str] = {}
+    headers = list(_PYTEST_SECTION_RE.finditer(output))
+    for header, following in zip(headers, [*headers[1:], None]):
+        end = following.start() if following else len(output)
+        sections[header["name"]] = output[header.end() : end].split("\n=", 1)[0]
+    issues = []
+    for m in _PYTEST_SUMMARY_RE.finditer(output):
+        nodeid = m["nodeid"]
+        name = nodeid.split("::", 1)[1].replace("::", ".") if "::" in nodeid else nodeid
+        body = next(
+            (
+                sections[key]
+                for key in (
+                    name,
+                    f"ERROR at setup of {name}",
+                    f"ERROR at teardown of {name}",
+                    f"ERROR collecting {nodeid}",
+                )
+                if key in sections
+            ),
+            "",
+        )
+        frames = list(_PYTEST_FRAME_RE.finditer(body))
+        file, line = (
+            (frames[-1]["file"], int(frames[-1]["line"]))
+            if frames
+            else (nodeid.split("::", 1)[0], None)
+        )
+        message = m["message"] or next(
+            (ln[1:].strip() for ln in body.splitlines() if ln.startswith("E ")), ""
+        )
+        issues.append(
+            _issue("pytest", file, line, m["code"], f"{nodeid}: {message}" if message else nodeid)
+        )
+    return issues
+
+
+def _check_issues(root: Path, name: str, output: str) -> list[dict]:
+    """Замечания упавшей проверки; если вывод не распознан — одно замечание с хвостом вывода."""
+    tool = name.split()[0]
+    if tool == "ruff":
+        issues = _ruff_issues(root, output)
+    elif tool == "mypy":
+        issues = _mypy_issues(output)
+    elif tool == "pytest":
+        issues = _pytest_issues(output)
+    else:
+        issues = []
+    if not issues:
+        tail = output[-RAW_TAIL_CHARS:].strip() or "(нет вывода)"
+        issues = [{"tool": tool, "file": None, "line": None, "code": None, "message": tail}]
+    return issues
+
+
+def run_quality_report(
+    repo_root: str | Path,
+    report_all: bool = QUALITY_REPORT_ALL,
+    paths: list[str] | None = None,
+) -> dict:
+    """
+    Запустить black (форматирование), затем одновременно ruff check, mypy и pytest
+    (pytest — шардами по ядрам в пределах PYTEST_BUDGET, см. pytest_shards).
+    :param report_all: собрать ошибки всех проверок (для LLM — все проблемы за одну итерацию);
+        иначе при первой ошибке остальные проверки прерываются.
+    :param paths: проверить только эти (записанные агентом) файлы: black/ruff — по ним, pytest — тесты,
+        затронутые по графу импортов (affected_tests). None — полный прогон по src и tests.
+        mypy в обоих режимах инкрементальный (кэш MYPY_CACHE_DIR) и перепроверяет только изменённое.
+    :return: {"ok", "issues": [{tool, file, line, code, message}] без повторов, не больше QUALITY_MAX_ISSUES
+        на инструмент, "omitted": {tool: сколько замечаний отброшено}, "log": полный вывод по инструментам}.
     """
     root = Path(repo_root)
     logs: list[str] = []
+    targets = list(CHECK_DIRS)
+    tests: list[str] | None = ["tests"]
+    if paths is not None:
+        targets = [p for p in paths if p.endswith(".py") and (root / p).is_file()]
+        if not targets:
+            return {
+                "ok": True,
+                "issues": [],
+                "omitted": {},
+                "log": "Нет изменённых Python-файлов — проверки пропущены.",
+            }
+        selected = affected_tests(root, targets)
+        tests = ["tests"] if selected is None else selected
 
-    # black — автоформатирование (чтобы не падать на стиле)
-    ok, out = run_cmd([sys.executable, "-m", "black", "src", "tests"], root)
+    # black — автоформатирование (чтобы не падать на стиле); остальные проверки идут по отформатированному коду
+    black = _tool(root, "black", targets)
+    ok, out = black() if callable(black) else run_cmd(black, root)
     logs.append("=== black ===\n" + out)
 
-    # ruff check
-    ok, out = run_cmd([sys.executable, "-m", "ruff", "check", "src", "tests", "--output-format=text"], root)
-    logs.append("=== ruff check ===\n" + out)
-    if not ok:
-        logs.append("(ruff: ошибки)\n")
-        return False, "\n".join(logs)
-
-    # mypy (может быть отключён, если нет конфига)
-    mypy_ok, mypy_out = run_cmd([sys.executable, "-m", "mypy", "src", "--no-error-summary"], root)
-    logs.append("=== mypy ===\n" + mypy_out)
-    if not mypy_ok:
-        logs.append("(mypy: ошибки типов)\n")
-        return False, "\n".join(logs)
-
-    # pytest
-    ok, out = run_cmd([sys.executable, "-m", "pytest", "tests", "-v", "--tb=short"], root)
-    logs.append("=== pytest ===\n" + out)
-    if not ok:
-        return False, "\n".join(logs)
-
-    return True, "\n".join(logs)
+    # mypy (может быть отключён, если нет конфига); с тёплым процессом — через dmypy, который держит
+    # разобранные модули в памяти между итерациями
+    mypy_args = ["src", "--no-error-summary", "--incremental", "--cache-dir", MYPY_CACHE_DIR]
+    if _daemon(root) is not None:
+        mypy: Check = _dmypy_cmd("run", "--", *mypy_args)
+    else:
+        mypy = [sys.executable, "-m", "mypy", *mypy_args]
+    checks: list[tuple[str, Check]] = [
+        ("ruff check", [sys.executable, "-m", "ruff", "check", *targets, "--output-format=json"]),
+        ("mypy", mypy),
+    ]
+    if tests:
+        checks.append(("pytest", _pytest_shards(root, tests, ["-v", "--tb=short"])))
+    results = run_parallel(checks, root, report_all=report_all)
+    all_ok = True
+    issues: list[dict] = []
+    omitted: dict[str, int] = {}
+    for name, (ok, out) in results.items():
+        logs.append(f"=== {name} ===\n" + out)
+        if ok:
+            continue
+        all_ok = False
+        seen: set[tuple] = set()
+        unique = []
+        for issue in _check_issues(root, name, out):
+            key = (issue["file"], issue["line"], issue["code"], issue["message"])
+            if key not in seen:
+                seen.add(key)
+                unique.append(issue)
+        if paths is not None:
+            # В лимит в первую очередь попадают замечания по файлам, записанным агентом
+            unique.sort(key=lambda issue: issue["file"] not in targets)
+        issues.extend(unique[:QUALITY_MAX_ISSUES])
+        if len(unique) > QUALITY_MAX_ISSUES:
+            omitted[unique[0]["tool"]] = len(unique) - QUALITY_MAX_ISSUES
+    if not tests:
+        logs.append("=== pytest ===\nНет тестов, затронутых изменениями.")
+
+    return {"ok": all_ok, "issues": issues, "omitted": omitted, "log": "\n".join(logs)}
+
+
+def run_quality_checks(
+    repo_root: str | Path,
+    report_all: bool = QUALITY_REPORT_ALL,
+    paths: list[str] | None = None,
+) -> tuple[bool, str]:
+    """То же, что run_quality_report: (всё ли прошло, полный лог по инструментам)."""
+    report = run_quality_report(repo_root, report_all=report_all, paths=paths)
+    return report["ok"], report["log"]
+
+
+def format_issues(report: dict) -> str:
+    """Текст для LLM: замечания проверок по инструментам, по одной строке «файл:строка код: сообщение»."""
+    lines: list[str] = []
+    tool = None
+    for issue in report["issues"]:
+        if issue["tool"] != tool:
+            tool = issue["tool"]
+            lines.append(f"[{tool}]")
+        where = (issue["file"] or "") + (f":{issue['line']}" if issue["line"] else "")
+        code = f" {issue['code']}" if issue["code"] else ""
+        lines.append(
+            f"- {where}{code}: {issue['message']}" if where or code else f"- {issue['message']}"
+        )
+    for tool, count in report.get("omitted", {}).items():
+        lines.append(f"[{tool}] ... и ещё замечаний: {count}")
+    return "\n".join(lines)
@@ -0,0 +1,169 @@
+"""
+Планировщик запросов к GitHub API с учётом лимитов.
+Цель: не упасть посреди прогона (после того как уже потрачены вызовы LLM) из-за исчерпания лимита:
+читаем X-RateLimit-* и Retry-After из каждого ответа, притормаживаем запросы при малом остатке,
+ждём сброса лимита или вторичного ограничения и показываем агентам оставшийся бюджет.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+
+from requests.adapters import HTTPAdapter
+
+# Сколько запросов держать в резерве: при остатке меньше — запросы распределяются равномерно до сброса
+RATE_LIMIT_RESERVE = int(os.environ.get("GITHUB_RATE_LIMIT_RESERVE", "50"))
+# Дольше этого (сек) не ждём сброса лимита — бросаем RateLimitExceeded
+RATE_LIMIT_MAX_WAIT = float(os.environ.get("GITHUB_RATE_LIMIT_MAX_WAIT", "300"))
+# Базовая пауза при вторичном ограничении без Retry-After (удваивается с каждой попыткой)
+SECONDARY_BACKOFF = float(os.environ.get("GITHUB_SECONDARY_BACKOFF", "30"))
+# Максимальная пауза между запросами при остатке меньше резерва
+RATE_LIMIT_PACE_MAX = float(os.environ.get("GITHUB_RATE_LIMIT_PACE_MAX", "2"))
+MAX_RATE_LIMIT_RETRIES = 3
+# Запросов к API, которые нужны агенту после вызова LLM (PR, метки, комментарии):
+# при меньшем остатке прогон не начинаем, чтобы не потратить LLM впустую
+RUN_MIN_BUDGET = int(os.environ.get("GITHUB_RUN_MIN_BUDGET", "20"))
+
+
+class RateLimitExceeded(RuntimeError):
+    """Лимит GitHub API исчерпан, а ждать сброса дольше RATE_LIMIT_MAX_WAIT; retry_after — сколько секунд до сброса."""
+
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    """
+    Общее состояние лимита для всех запросов одного токена (потокобезопасно).
+    remaining/limit/reset — из последних заголовков X-RateLimit-* (-1 / 0, пока ответов не было).
+    """
+
+    def __init__(
+        self,
+        reserve: int = RATE_LIMIT_RESERVE,
+        max_wait: float = RATE_LIMIT_MAX_WAIT,
+        sleep=time.sleep,
+    ):
+        self.reserve = reserve
+        self.max_wait = max_wait
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.limit = -1
+        self.remaining = -1
+        self.reset = 0.0
+        self.blocked_until = 0.0
+        self.waited = 0.0
+        self.throttled = 0
+
+    def _wait(self, seconds: float, reason: str) -> None:
+        if seconds <= 0:
+            return
+        if seconds > self.max_wait:
+            raise RateLimitExceeded(
+                f"{reason}: ждать {seconds:.0f} с (больше {self.max_wait:.0f} с)", seconds
+            )
+        with self._lock:
+            self.waited += seconds
+            self.throttled += 1
+        self._sleep(seconds)
+
+    def acquire(self) -> None:
+        """Вызывается перед запросом: ждёт окончания блокировки или сброса лимита, растягивает остаток."""
+        now = time.time()
+        with self._lock:
+            blocked = self.blocked_until - now
+            remaining, reset = self.remaining, self.reset
+            if self.remaining > 0:
+                self.remaining -= 1  # учитываем запросы «в полёте» до прихода свежих заголовков
+        if blocked > 0:
+            self._wait(blocked, "вторичное ограничение GitHub")
+            return
+        if remaining < 0 or reset <= now:
+            return
+        if remaining == 0:
+            self._wait(reset - now + 1, "лимит GitHub API исчерпан")
+        elif remaining < self.reserve:
+            # Остаток резерва распределяем равномерно до сброса окна
+            self._wait(
+                min((reset - now) / remaining, RATE_LIMIT_PACE_MAX),
+                "мало запросов до сброса лимита",
+            )
+
+    def update(
+        self, status: int, headers, *, secondary: bool = False, attempt: int = 0
+    ) -> float | None:
+        """
+        Обновить состояние по ответу.
+        :param secondary: в теле ответа сообщение о вторичном ограничении (secondary rate limit).
+        :param attempt: номер повтора — пауза без Retry-After растёт как SECONDARY_BACKOFF * 2**attempt.
+        :return: сколько секунд ждать перед повтором (ответ — ошибка лимита) или None.
+        """
+        now = time.time()
+        with self._lock:
+            # Учитываем основной (core) лимит; у GraphQL и поиска свои счётчики
+            resource = headers.get("X-RateLimit-Resource", "core")
+            if resource == "core" and headers.get("X-RateLimit-Remaining") is not None:
+                try:
+                    self.remaining = int(headers["X-RateLimit-Remaining"])
+                    self.limit = int(headers.get("X-RateLimit-Limit", self.limit))
+                    self.reset = float(headers.get("X-RateLimit-Reset", self.reset))
+                except ValueError:
+                    pass
+            if status not in (403, 429):
+                return None
+            retry_after = headers.get("Retry-After")
+            if retry_after is not None:
+                try:
+                    delay = float(retry_after)
+                except ValueError:
+                    delay = SECONDARY_BACKOFF
+            elif self.remaining == 0 and self.reset > now:
+                delay = self.reset - now + 1
+            elif status == 429 or secondary:
+                delay = SECONDARY_BACKOFF * 2**attempt
+            else:
+                return None  # обычный 403 (нет прав) — не ограничение лимита
+            self.blocked_until = max(self.blocked_until, now + delay)
+            return delay
+
+    def budget(self) -> dict:
+        """Остаток лимита для агентов: remaining, limit, reset (epoch), throttled (пауз), waited (сек)."""
+        with self._lock:
+            return {
+                "remaining": self.remaining,
+                "limit": self.limit,
+                "reset": self.reset,
+                "throttled": self.throttled,
+                "waited": round(self.waited, 1),
+            }
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """
+    Транспорт requests, пропускающий каждый запрос через RateLimiter.
+    Ответы 403/429 с Retry-After или при исчерпанном лимите повторяются с паузой (экспоненциальной,
+    если сервер её не указал), не более MAX_RATE_LIMIT_RETRIES раз.
+    Кооперативный: можно комбинировать с другими адаптерами через наследование.
+    """
+
+    def __init__(self, limiter: RateLimiter, **kwargs):
+        self.limiter = limiter
+        super().__init__(**kwargs)
+
+    def send(self, request, *args, **kwargs):  # type: ignore[override]
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            self.limiter.acquire()
+            resp = super().send(request, *args, **kwargs)
+            secondary = (
+                resp.status_code == 403 and "secondary rate limit" in (resp.text or "").lower()
+            )
+            delay = self.limiter.update(
+                resp.status_code, resp.headers, secondary=secondary, attempt=attempt
+            )
+            if delay is None or attempt == MAX_RATE_LIMIT_RETRIES:
+                return resp
+            resp.close()
+        return resp
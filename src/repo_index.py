@@ -0,0 +1,240 @@
+"""
+Индекс Python-кода репозитория: символы верхнего уровня, импорты и вызовы по каждому файлу.
+Цель: быстро (без скачивания и чтения файлов) отвечать «где определено X», «кто импортирует модуль»
+для ранжирования контекста и ревью. Записи строятся через ast и хранятся по sha блоба — между
+запусками (файл на диске, в workflow — через actions/cache) заново разбираются только изменённые файлы.
+"""
+
+from __future__ import annotations
+
+import ast
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any
+
+REPO_INDEX_PATH = os.environ.get("REPO_INDEX_PATH", "")
+REPO_INDEX_MAX_BLOBS = int(os.environ.get("REPO_INDEX_MAX_BLOBS", "20000"))
+INDEX_BATCH_SIZE = 50  # файлов за один вызов source.get_file_contents
+INDEX_VERSION = 1
+
+
+def module_name(path: str) -> str:
+    """src/pkg/mod.py → pkg.mod (корень src/ не входит в имя модуля, как при запуске из src)."""
+    name = path.removesuffix(".py")
+    name = name.removeprefix("src/")
+    name = name.removesuffix("/__init__")
+    return name.replace("/", ".")
+
+
+def _call_name(node: ast.expr) -> str | None:
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    return None
+
+
+def parse_python(source: str) -> dict:
+    """
+    Разобрать файл: symbols — [{name, kind, line, end_line}] (функции, классы, их методы как Class.method,
+    константы модуля), imports — имена модулей (относительные — с точками), calls — имена вызываемых.
+    Файл с синтаксической ошибкой даёт пустую запись с error=True.
+    """
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return {"symbols": [], "imports": [], "calls": [], "error": True}
+    symbols: list[dict] = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            kind = "class" if isinstance(node, ast.ClassDef) else "function"
+            symbols.append(
+                {"name": node.name, "kind": kind, "line": node.lineno, "end_line": node.end_lineno}
+            )
+            if isinstance(node, ast.ClassDef):
+                for item in node.body:
+                    if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                        symbols.append(
+                            {
+                                "name": f"{node.name}.{item.name}",
+                                "kind": "method",
+                                "line": item.lineno,
+                                "end_line": item.end_lineno,
+                            }
+                        )
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                if isinstance(target, ast.Name):
+                    symbols.append(
+                        {
+                            "name": target.id,
+                            "kind": "variable",
+                            "line": node.lineno,
+                            "end_line": node.end_lineno,
+                        }
+                    )
+    imports: list[str] = []
+    calls: set[str] = set()
+    for sub in ast.walk(tree):
+        if isinstance(sub, ast.Import):
+            imports.extend(alias.name for alias in sub.names)
+        elif isinstance(sub, ast.ImportFrom):
+            base = "." * sub.level + (sub.module or "")
+            imports.append(base)
+            # from pkg import mod — mod может быть модулем
+            prefix = base if base.endswith(".") else base + "."
+            imports.extend(prefix + alias.name for alias in sub.names if alias.name != "*")
+        elif isinstance(sub, ast.Call):
+            name = _call_name(sub.func)
+            if name:
+                calls.add(name)
+    return {"symbols": symbols, "imports": sorted(set(imports)), "calls": sorted(calls)}
+
+
+def resolve_import(path: str, name: str) -> str:
+    """Относительный импорт (.mod, ..pkg.mod) из файла path → абсолютное имя модуля."""
+    if not name.startswith("."):
+        return name
+    level = len(name) - len(name.lstrip("."))
+    package = module_name(path).split(".")
+    if not path.endswith("/__init__.py"):
+        package = package[:-1]
+    package = package[: len(package) - (level - 1)] if level > 1 else package
+    rest = name.lstrip(".")
+    return ".".join([*package, rest] if rest else package)
+
+
+class RepoIndex:
+    """
+    Индекс по sha блобов (blobs) и текущее дерево (files: path -> sha) последнего update().
+    :param path: JSON-файл индекса на диске (None — только в памяти).
+    """
+
+    def __init__(self, path: str | Path | None = None, max_blobs: int = REPO_INDEX_MAX_BLOBS):
+        self.path = Path(path) if path else None
+        self.max_blobs = max_blobs
+        self.blobs: dict[str, dict] = {}
+        self.files: dict[str, str] = {}
+        self.parsed = 0  # файлов разобрано заново при последнем update()
+        self._by_name: dict[str, list[dict]] = {}
+        self._by_module: dict[str, str] = {}
+        self._importers: dict[str, set[str]] = {}
+        self._load()
+
+    @classmethod
+    def for_repo(cls, repo_root: str | Path | None = None) -> RepoIndex:
+        """Индекс в REPO_INDEX_PATH или в .agent-cache/repo-index.json локального клона; иначе — в памяти."""
+        if REPO_INDEX_PATH:
+            return cls(REPO_INDEX_PATH)
+        if repo_root is not None:
+            return cls(Path(repo_root) / ".agent-cache" / "repo-index.json")
+        return cls()
+
+    def _load(self) -> None:
+        if self.path is None:
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if data.get("version") == INDEX_VERSION:
+            self.blobs = data.get("blobs") or {}
+
+    def save(self) -> None:
+        """Записать индекс на диск атомарно (ошибки записи не фатальны — индекс пересоберётся)."""
+        if self.path is None:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(
+                json.dumps({"version": INDEX_VERSION, "blobs": self.blobs}), encoding="utf-8"
+            )
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+    def update(self, source: Any, ref: str) -> RepoIndex:
+        """
+        Привести индекс к дереву ref: source — GithubClient или LocalRepo (list_repo_tree, get_file_contents).
+        Загружаются и разбираются только .py файлы, sha которых ещё нет в индексе.
+        """
+        tree = [e for e in source.list_repo_tree(ref) if e["path"].endswith(".py")]
+        self.files = {e["path"]: e["sha"] for e in tree}
+        missing = [e["path"] for e in tree if e["sha"] not in self.blobs]
+        self.parsed = 0
+        for i in range(0, len(missing), INDEX_BATCH_SIZE):
+            batch = missing[i : i + INDEX_BATCH_SIZE]
+            contents = source.get_file_contents(batch, ref=ref)
+            for path in batch:
+                if path in contents:
+                    self.blobs[self.files[path]] = parse_python(contents[path])
+                    self.parsed += 1
+        now = time.time()
+        for sha in self.files.values():
+            if sha in self.blobs:
+                self.blobs[sha]["seen"] = now
+        self._prune()
+        self._build_lookups()
+        if self.parsed:
+            self.save()
+        return self
+
+    def _prune(self) -> None:
+        """Оставить не больше max_blobs записей, вытесняя давно не встречавшиеся в деревьях."""
+        if len(self.blobs) <= self.max_blobs:
+            return
+        by_age = sorted(self.blobs, key=lambda sha: self.blobs[sha].get("seen", 0), reverse=True)
+        self.blobs = {sha: self.blobs[sha] for sha in by_age[: self.max_blobs]}
+
+    def _build_lookups(self) -> None:
+        self._by_name = {}
+        self._by_module = {}
+        self._importers = {}
+        for path in self.files:
+            self._by_module[module_name(path)] = path
+        for path, sha in self.files.items():
+            entry = self.blobs.get(sha)
+            if not entry:
+                continue
+            for symbol in entry["symbols"]:
+                found = {"path": path, **symbol}
+                self._by_name.setdefault(symbol["name"], []).append(found)
+                short = symbol["name"].rsplit(".", 1)[-1]
+                if short != symbol["name"]:
+                    self._by_name.setdefault(short, []).append(found)
+            for name in entry["imports"]:
+                target = self._by_module.get(resolve_import(path, name))
+                if target and target != path:
+                    self._importers.setdefault(target, set()).add(path)
+
+    def _entry(self, path: str) -> dict:
+        return self.blobs.get(self.files.get(path, ""), {"symbols": [], "imports": [], "calls": []})
+
+    def definitions(self, name: str) -> list[dict]:
+        """Где определено имя (функция, класс, метод — по короткому или полному имени, константа)."""
+        return list(self._by_name.get(name, []))
+
+    def symbols(self, path: str) -> list[dict]:
+        """Символы файла."""
+        return list(self._entry(path)["symbols"])
+
+    def imports(self, path: str) -> list[str]:
+        """Пути файлов репозитория, которые импортирует path."""
+        out = []
+        for name in self._entry(path)["imports"]:
+            target = self._by_module.get(resolve_import(path, name))
+            if target and target != path and target not in out:
+                out.append(target)
+        return out
+
+    def dependents(self, path: str) -> list[str]:
+        """Файлы, которые импортируют path."""
+        return sorted(self._importers.get(path, ()))
+
+    def references(self, name: str) -> list[str]:
+        """Файлы, в которых вызывается name (по имени функции или метода)."""
+        return sorted(path for path in self.files if name in self._entry(path)["calls"])
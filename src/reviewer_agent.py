@@ -7,14 +7,18 @@ import os
 import sys
 import json
 import re
+import threading
 from pathlib import Path
 
 from github_client import GithubClient
 from pr_context import get_pr_context, format_pr_context_for_llm
 from prompts import REVIEWER_SYSTEM_PROMPT
 from llm_client import LLMClient
+from rate_limiter import RUN_MIN_BUDGET
+from http_pool import connection_stats
 
 MAX_REVIEW_ITERATIONS = int(os.environ.get("REVIEWER_MAX_ITERATIONS", "3"))
+REPO_ROOT = Path(__file__).resolve().parent.parent
 
 
 def _load_reviewer_prompt_file() -> str | None:
@@ -52,22 +56,31 @@ def _parse_review_response(text: str) -> dict:
     return {"verdict": verdict, "summary": summary, "inline_comments": out_comments[:30]}
 
 
-def run_reviewer_agent(pr_number: int) -> int:
+def run_reviewer_agent(
+    pr_number: int,
+    gh: GithubClient | None = None,
+    llm: LLMClient | None = None,
+    cancelled: threading.Event | None = None,
+) -> int:
     """
     Собрать контекст PR → вызвать LLM → разобрать вердикт → опубликовать ревью (APPROVE или REQUEST_CHANGES).
+    :param gh, llm: готовые клиенты (режим сервиса); без них создаются новые.
+    :param cancelled: установлен — в PR новый push, ревью устарело и не публикуется.
     :return: 0 при успехе, 1 при ошибке.
     """
-    try:
-        gh = GithubClient()
-    except ValueError as e:
-        print(f"[Reviewer] Ошибка GitHub: {e}", file=sys.stderr)
-        return 1
-
-    try:
-        llm = LLMClient()
-    except ValueError as e:
-        print(f"[Reviewer] Ошибка LLM: {e}", file=sys.stderr)
-        return 1
+    if gh is None:
+        try:
+            gh = GithubClient()
+        except ValueError as e:
+            print(f"[Reviewer] Ошибка GitHub: {e}", file=sys.stderr)
+            return 1
+
+    if llm is None:
+        try:
+            llm = LLMClient()
+        except ValueError as e:
+            print(f"[Reviewer] Ошибка LLM: {e}", file=sys.stderr)
+            return 1
 
     # Лимит итераций: не более N ревью от этого бота по данному PR
     try:
@@ -80,11 +93,21 @@ def run_reviewer_agent(pr_number: int) -> int:
         return 0
 
     print(f"[Reviewer] PR #{pr_number}")
-    ctx = get_pr_context(gh, pr_number)
+    ctx = get_pr_context(gh, pr_number, repo_root=REPO_ROOT)
+    remaining = gh.rate_limit_budget()["remaining"]
+    if 0 <= remaining < RUN_MIN_BUDGET:
+        print(
+            f"[Reviewer] Осталось {remaining} запросов к GitHub API, ревью отложено до сброса лимита.",
+            file=sys.stderr,
+        )
+        return 1
     context_text = format_pr_context_for_llm(ctx)
     system_prompt = _load_reviewer_prompt_file() or REVIEWER_SYSTEM_PROMPT
     user_prompt = "Ниже контекст Pull Request (описание, Issue, изменённые файлы, CI, diff). Верни JSON: verdict (APPROVE или REQUEST_CHANGES), summary (Markdown), inline_comments (массив {path, line, body}).\n\n" + context_text
 
+    if cancelled is not None and cancelled.is_set():
+        print("[Reviewer] Ревью отменено: в PR новый push.")
+        return 0
     try:
         response = llm.generate_response(system_prompt, user_prompt, as_json=False)
     except Exception as e:
@@ -100,6 +123,9 @@ def run_reviewer_agent(pr_number: int) -> int:
     print(f"[Reviewer] Вердикт: {verdict}")
     print(f"[Reviewer] Summary (фрагмент): {summary[:500]}...")
 
+    if cancelled is not None and cancelled.is_set():
+        print("[Reviewer] Ревью отменено: в PR новый push.")
+        return 0
     event = "APPROVE" if verdict == "APPROVE" else "REQUEST_CHANGES"
     try:
         review = gh.create_pr_review(pr_number, event=event, body=summary, comments=inline_comments)
@@ -118,4 +144,14 @@ def run_reviewer_agent(pr_number: int) -> int:
     except Exception:
         pass
 
+    stats = gh.cache_stats()
+    print(
+        f"[Reviewer] GitHub кэш PR/Issue: загружено {stats['misses']}, сэкономлено запросов {stats['hits']}"
+    )
+    llm_stats = llm.cache_stats()
+    print(f"[Reviewer] Кэш LLM: попаданий {llm_stats['hits']}, промахов {llm_stats['misses']}")
+    conn = connection_stats()
+    print(
+        f"[Reviewer] HTTP: запросов {conn['requests']}, соединений {conn['connections']}, повторно использовано {conn['reused']}"
+    )
     return 0
@@ -0,0 +1,135 @@
+"""Сервис вебхуков (agent_service): разбор событий, подпись, очередь задач."""
+
+import hashlib
+import hmac
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from agent_service import AgentService, job_from_event, make_server, verify_signature
+from rate_limiter import RateLimitExceeded
+
+
+def test_job_from_event():
+    assert job_from_event("issues", {"action": "opened", "issue": {"number": 3}}) == {
+        "kind": "issue",
+        "number": 3,
+    }
+    assert job_from_event("issues", {"action": "closed", "issue": {"number": 3}}) is None
+    assert (
+        job_from_event(
+            "issues", {"action": "opened", "issue": {"number": 3, "pull_request": {"url": "x"}}}
+        )
+        is None
+    )
+    pr = {"number": 7}
+    assert job_from_event("pull_request", {"action": "synchronize", "pull_request": pr}) == {
+        "kind": "review",
+        "number": 7,
+    }
+    review = {"action": "submitted", "pull_request": pr, "review": {"state": "CHANGES_REQUESTED"}}
+    assert job_from_event("pull_request_review", review) == {"kind": "fix", "number": 7}
+    pushed = {"action": "synchronize", "pull_request": {"number": 7, "head": {"sha": "abc"}}}
+    assert job_from_event("pull_request", pushed) == {
+        "kind": "review",
+        "number": 7,
+        "head_sha": "abc",
+    }
+    review["review"] = {"state": "approved"}
+    assert job_from_event("pull_request_review", review) is None
+
+
+def test_verify_signature():
+    body = b'{"a": 1}'
+    signature = "sha256=" + hmac.new(b"s3cret", body, hashlib.sha256).hexdigest()
+    assert verify_signature("s3cret", body, signature)
+    assert not verify_signature("s3cret", body, "sha256=00")
+    assert not verify_signature("s3cret", body, None)
+    assert verify_signature("", body, None)
+
+
+def _post(url: str, event: str, payload: dict) -> tuple[int, dict]:
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload).encode(),
+        headers={"X-GitHub-Event": event, "Content-Type": "application/json"},
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_webhook_jobs_run_on_worker_pool():
+    done: list[dict] = []
+    service = AgentService(workers=2, runner=lambda job: done.append(job) or 0)
+    service.start()
+    server = make_server(service, "127.0.0.1", 0, secret="")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+    try:
+        status, body = _post(url, "issues", {"action": "opened", "issue": {"number": 5}})
+        assert status == 202 and body["queued"] == {"kind": "issue", "number": 5}
+        status, body = _post(
+            url, "pull_request", {"action": "closed", "pull_request": {"number": 6}}
+        )
+        assert status == 200 and body["ignored"]
+        status, _ = _post(url, "pull_request", {"action": "opened", "pull_request": {"number": 6}})
+        assert status == 202
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.stop()
+    assert sorted(job["number"] for job in done) == [5, 6]
+    assert service.processed == 2
+
+
+def test_burst_is_coalesced_and_superseded_run_cancelled():
+    started = threading.Event()
+    runs: list[tuple[str, bool]] = []
+
+    def runner(job):
+        if job["head_sha"] == "a1":
+            started.set()
+            # Первый прогон ждёт отмены, как агент — проверки флага между шагами
+            runs.append((job["head_sha"], job["cancelled"].wait(10)))
+        else:
+            runs.append((job["head_sha"], job["cancelled"].is_set()))
+        return 0
+
+    service = AgentService(workers=2, runner=runner, debounce=0.1)
+    service.start()
+    try:
+        service.submit({"kind": "review", "number": 4, "head_sha": "a1"})
+        assert started.wait(10)
+        # Серия push'ей во время прогона: идущий отменяется, из серии выполняется только последний head
+        for sha in ("b2", "c3", "d4"):
+            service.submit({"kind": "review", "number": 4, "head_sha": sha})
+    finally:
+        service.stop()
+    assert runs == [("a1", True), ("d4", False)]
+    assert service.cancelled == 1 and service.coalesced == 2 and service.processed == 2
+
+
+def test_rate_limited_job_is_retried_after_reset():
+    attempts: list[int] = []
+
+    def runner(job):
+        attempts.append(job.get("attempt", 0))
+        if len(attempts) == 1:
+            raise RateLimitExceeded("лимит GitHub API исчерпан", retry_after=0.0)
+        return 0
+
+    service = AgentService(workers=1, runner=runner, debounce=0)
+    service.start()
+    try:
+        service.submit({"kind": "issue", "number": 9})
+        deadline = time.monotonic() + 10
+        while service.processed < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        service.stop()
+    assert attempts == [0, 1]
@@ -0,0 +1,27 @@
+"""Тёплый процесс проверок (check_daemon.CheckDaemon)."""
+
+import pytest
+
+from check_daemon import CheckDaemon
+
+pytestmark = pytest.mark.skipif(not CheckDaemon.supported(), reason="нужны Unix-сокеты и fork")
+
+
+def test_daemon_runs_pytest_with_fresh_project_modules(tmp_path):
+    (tmp_path / "mod.py").write_text("VALUE = 1\n", encoding="utf-8")
+    (tmp_path / "test_mod.py").write_text(
+        "import mod\n\n\ndef test_value():\n    assert mod.VALUE == 1\n", encoding="utf-8"
+    )
+    daemon = CheckDaemon(tmp_path)
+    assert daemon.start()
+    try:
+        ok, out = daemon.run("pytest", ["-q", "-p", "no:cacheprovider", "test_mod.py"], timeout=60)
+        assert ok, out
+        # Изменение модуля видно следующему запуску: каждый запрос — в свежем fork
+        (tmp_path / "mod.py").write_text("VALUE = 2\n", encoding="utf-8")
+        ok, out = daemon.run("pytest", ["-q", "-p", "no:cacheprovider", "test_mod.py"], timeout=60)
+        assert not ok and "1 failed" in out
+        ok, out = daemon.run("unknown", [], timeout=10)
+        assert not ok
+    finally:
+        daemon.stop()
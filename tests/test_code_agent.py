@@ -0,0 +1,50 @@
+"""Выбор варианта ответа LLM в Code Agent (code_agent._generate_files)."""
+
+import json
+
+import code_agent
+
+
+class _LLM:
+    def __init__(self, responses):
+        self.responses = responses
+
+    def generate_many(self, prompts, **kwargs):
+        assert len(prompts) == len(self.responses)
+        return self.responses
+
+
+def _edits(search):
+    return json.dumps(
+        {"files": [{"path": "a.py", "edits": [{"search": search, "replace": "x = 2"}]}]}
+    )
+
+
+def test_candidate_with_fewest_failed_edits_is_chosen(tmp_path, monkeypatch):
+    (tmp_path / "a.py").write_text("x = 1\n", encoding="utf-8")
+    monkeypatch.setattr(code_agent, "CANDIDATES", 4)
+    llm = _LLM([RuntimeError("timeout"), "без файлов", _edits("нет такой строки"), _edits("x = 1")])
+    files = code_agent._generate_files(llm, "sys", "user", tmp_path)
+    assert files[0]["edits"][0]["search"] == "x = 1"
+    # Примерка вариантов ничего не записывает
+    assert (tmp_path / "a.py").read_text(encoding="utf-8") == "x = 1\n"
+
+
+class _SpentGithub:
+    """Лимит GitHub API исчерпан: прогон должен остановиться до любых запросов."""
+
+    def rate_limit_budget(self):
+        return {"remaining": 0}
+
+    def __getattr__(self, name):
+        raise AssertionError(f"лишний запрос к GitHub: {name}")
+
+
+def test_exhausted_budget_stops_before_context_and_checkout(monkeypatch):
+    def unexpected(*args, **kwargs):
+        raise AssertionError("прогон без бюджета не должен собирать контекст и переключать ветку")
+
+    for name in ("get_issue_context", "get_issue_context_for_pr", "_checkout", "get_iteration"):
+        monkeypatch.setattr(code_agent, name, unexpected)
+    assert code_agent.run_code_agent(1, gh=_SpentGithub(), llm=object()) == 1
+    assert code_agent.run_code_agent_fix(2, gh=_SpentGithub(), llm=object()) == 1
@@ -0,0 +1,110 @@
+"""Применение ответа LLM: потоковый разбор (FilesStreamParser) и правки блоками search/replace."""
+
+import json
+
+from code_applier import FilesStreamParser, apply_changes_report, apply_changes_stream, apply_edits
+
+RESPONSE = (
+    "```json\n"
+    + json.dumps(
+        {
+            "files": [
+                {"path": "a.py", "content": "x = {'k': \"}\"}\n"},
+                {"path": "b.py", "content": "y = '\\\\'\n"},
+            ]
+        }
+    )
+    + "\n```"
+)
+
+
+def _chunks(text, size=7):
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+def test_parser_emits_each_file_when_its_object_closes():
+    parser = FilesStreamParser()
+    emitted = []
+    for chunk in _chunks(RESPONSE):
+        for item in parser.feed(chunk):
+            emitted.append((item["path"], len(parser.text)))
+    assert [path for path, _ in emitted] == ["a.py", "b.py"]
+    # Первый файл отдан до того, как пришёл второй объект
+    assert emitted[0][1] < RESPONSE.index('"b.py"')
+
+
+def test_apply_changes_stream_writes_files_incrementally(tmp_path):
+    seen = []
+    files, report = apply_changes_stream(_chunks(RESPONSE), tmp_path, on_file=seen.append)
+    assert report["written"] == ["a.py", "b.py"] == seen
+    assert (tmp_path / "a.py").read_text(encoding="utf-8") == "x = {'k': \"}\"}\n"
+    assert len(files) == 2
+
+
+def test_apply_changes_stream_falls_back_to_full_parse(tmp_path):
+    # Без массива files потоковый разбор ничего не находит — разбирается весь текст
+    files, report = apply_changes_stream(["не JSON"], tmp_path)
+    assert files == [] and report == {"written": [], "failed": []}
+
+
+SOURCE = "class A:\n    def f(self):\n        x = 1\n        return x\n\n    def g(self):\n        return 2\n"
+
+
+def test_apply_edits_exact_and_reindented():
+    text, failed = apply_edits(
+        SOURCE,
+        [
+            {"search": "        x = 1\n", "replace": "        x = 10\n"},
+            # Блок без отступа класса — совпадает построчно, replace сдвигается так же
+            {"search": "def g(self):\n    return 2", "replace": "def g(self):\n    return 20"},
+        ],
+    )
+    assert failed == []
+    assert "        x = 10\n" in text
+    assert "    def g(self):\n        return 20\n" in text
+
+
+def test_apply_edits_fuzzy_match():
+    text, failed = apply_edits(SOURCE, [{"search": "x = 1\nreturn  x", "replace": "return 1"}])
+    assert failed == []
+    assert "        return 1\n" in text and "x = 1" not in text
+
+
+def test_apply_edits_reports_failed_hunks_and_keeps_others():
+    text, failed = apply_edits(
+        SOURCE,
+        [
+            {"search": "return", "replace": "yield"},
+            {"search": "completely different text", "replace": ""},
+            {"search": "return 2", "replace": "return 3"},
+        ],
+    )
+    assert [f["index"] for f in failed] == [0, 1]
+    assert "return 3" in text
+
+
+def test_apply_changes_report_edits(tmp_path):
+    (tmp_path / "m.py").write_text(SOURCE, encoding="utf-8")
+    report = apply_changes_report(
+        [
+            {"path": "m.py", "edits": [{"search": "return 2", "replace": "return 3"}]},
+            {"path": "new.py", "edits": [{"search": "", "replace": "X = 1\n"}]},
+            {"path": "missing.py", "edits": [{"search": "a", "replace": "b"}]},
+        ],
+        tmp_path,
+    )
+    assert report["written"] == ["m.py", "new.py"]
+    assert report["failed"] == [{"path": "missing.py", "index": None, "reason": "файл не найден"}]
+    assert "return 3" in (tmp_path / "m.py").read_text(encoding="utf-8")
+
+
+def test_apply_changes_report_dry_run_writes_nothing(tmp_path):
+    (tmp_path / "a.py").write_text("x = 1\n", encoding="utf-8")
+    files = [
+        {"path": "a.py", "edits": [{"search": "x = 1", "replace": "x = 2"}]},
+        {"path": "new/b.py", "content": "y = 1\n"},
+    ]
+    report = apply_changes_report(files, tmp_path, dry_run=True)
+    assert report == {"written": ["a.py", "new/b.py"], "failed": []}
+    assert (tmp_path / "a.py").read_text(encoding="utf-8") == "x = 1\n"
+    assert not (tmp_path / "new").exists()
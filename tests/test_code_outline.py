@@ -0,0 +1,59 @@
+"""Структура Python-файла для контекста LLM (code_outline.outline_python)."""
+
+from code_outline import OUTLINE_HEADER, outline_python
+
+SOURCE = '''"""Модуль."""
+import os
+
+LIMIT = 10
+
+
+@decorator
+def compute(
+    a: int,
+    b: int,
+) -> int:
+    """Сумма."""
+    total = a + b
+    return total
+
+
+class Store:
+    """Хранилище."""
+
+    name = "store"
+
+    def get(self, key):
+        return os.environ.get(key)
+
+    def short(self): return 1
+
+
+if __name__ == "__main__":
+    compute(1, 2)
+'''
+
+
+def test_outline_keeps_signatures_and_docstrings():
+    outline = outline_python(SOURCE)
+    assert outline.startswith(OUTLINE_HEADER)
+    for kept in (
+        '"""Модуль."""',
+        "import os",
+        "LIMIT = 10",
+        "@decorator",
+        "    b: int,\n) -> int:",
+        '    """Сумма."""',
+        "class Store:",
+        '    name = "store"',
+        "    def get(self, key):",
+        "    def short(self): return 1",
+    ):
+        assert kept in outline
+    for dropped in ("total = a + b", "os.environ.get", "__main__"):
+        assert dropped not in outline
+    assert "        ...\n" in outline
+
+
+def test_outline_invalid_source():
+    assert outline_python("def broken(:\n") is None
@@ -0,0 +1,55 @@
+"""Ранжирование файлов контекста и упаковка в бюджет токенов (context_ranker)."""
+
+from context_ranker import estimate_tokens, rank_files, select_context
+
+CONTENTS = {
+    "README.md": "Проект агента. " * 50,
+    "src/alpha.py": "def unrelated():\n    return 1\n",
+    "src/billing.py": "from invoice import Invoice\n\n\ndef charge(amount):\n    return Invoice(amount)\n",
+    "src/invoice.py": "class Invoice:\n    def __init__(self, amount):\n        self.amount = amount\n",
+    "src/zeta.py": "def total_amount(items):\n    return sum(items)\n",
+}
+
+
+def _paths(ranked):
+    return [path for path, _ in ranked]
+
+
+def test_rank_prefers_mentioned_symbols_and_import_neighbours():
+    ranked = _paths(rank_files("Invoice не сохраняет amount", CONTENTS))
+    assert ranked[0] == "src/invoice.py"
+    # billing.py импортирует invoice — выше несвязанных файлов
+    assert ranked.index("src/billing.py") < ranked.index("src/alpha.py")
+
+
+def test_rank_path_mention_and_pinned():
+    ranked = _paths(rank_files("Ошибка в src/zeta.py", CONTENTS, pinned=["src/alpha.py"]))
+    assert ranked[:2] == ["src/alpha.py", "src/zeta.py"]
+
+
+def test_select_context_respects_budget():
+    budget = estimate_tokens(CONTENTS["src/invoice.py"]) + estimate_tokens(
+        CONTENTS["src/billing.py"]
+    )
+    selected = select_context("Invoice amount", CONTENTS, budget)
+    assert list(selected) == ["src/invoice.py", "src/billing.py"]
+    assert sum(estimate_tokens(c) for c in selected.values()) <= budget
+
+
+def test_select_context_truncates_relevant_file():
+    contents = {"src/big.py": "class Big:\n" + "    x = 1\n" * 2000}
+    selected = select_context("Big", contents, 600)
+    assert selected["src/big.py"].endswith("... (обрезано)\n")
+    assert estimate_tokens(selected["src/big.py"]) <= 600
+
+
+def test_select_context_outlines_large_unrelated_python():
+    body = "".join(
+        f"def helper_{i}(x):\n    y = x * {i}\n    return y + {i}\n\n\n" for i in range(300)
+    )
+    contents = {"src/invoice.py": CONTENTS["src/invoice.py"], "src/helpers.py": body}
+    selected = select_context("Invoice amount", contents, 100000)
+    assert selected["src/invoice.py"] == CONTENTS["src/invoice.py"]
+    assert selected["src/helpers.py"].startswith("# (структура файла")
+    assert "def helper_299(x):" in selected["src/helpers.py"]
+    assert "return y" not in selected["src/helpers.py"]
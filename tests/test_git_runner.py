@@ -0,0 +1,124 @@
+"""Коммит и push (git_runner.commit_and_push)."""
+
+import subprocess
+
+import git_runner
+from git_runner import commit_and_push
+
+
+def _git(root, *args):
+    return subprocess.run(
+        ["git", *args], cwd=root, check=True, capture_output=True, text=True
+    ).stdout
+
+
+def test_commit_and_push_commits_only_given_paths(tmp_path, monkeypatch):
+    monkeypatch.delenv("GITHUB_TOKEN", raising=False)
+    monkeypatch.setattr(git_runner, "ADD_CHUNK_CHARS", 20)  # несколько вызовов git add
+    remote, work = tmp_path / "remote.git", tmp_path / "work"
+    _git(tmp_path, "init", "-q", "--bare", str(remote))
+    _git(tmp_path, "init", "-q", "-b", "main", str(work))
+    _git(work, "remote", "add", "origin", str(remote))
+    (work / "keep.txt").write_text("base\n", encoding="utf-8")
+    _git(work, "add", "keep.txt")
+    _git(work, "-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", "init")
+
+    paths = [f"src/module_{i}.py" for i in range(5)] + ["keep.txt"]
+    (work / "src").mkdir()
+    for path in paths:
+        (work / path).write_text("x = 1\n", encoding="utf-8")
+    (work / "untouched.txt").write_text("not for commit\n", encoding="utf-8")
+
+    ok, out = commit_and_push(work, "main", "feat: files", paths=paths)
+    assert ok, out
+    assert sorted(_git(work, "show", "--name-only", "--format=", "HEAD").split()) == sorted(paths)
+    assert _git(remote, "rev-parse", "main") == _git(work, "rev-parse", "HEAD")
+    assert "untouched.txt" in _git(work, "status", "--short")
+
+    assert commit_and_push(work, "main", "again", paths=paths) == (True, "(нет изменений)")
+
+
+def test_worktrees_are_reused_and_collected(tmp_path, monkeypatch):
+    repo = tmp_path / "repo"
+    _git(tmp_path, "init", "-q", "-b", "main", str(repo))
+    (repo / "a.txt").write_text("base\n", encoding="utf-8")
+    _git(repo, "add", "a.txt")
+    _git(repo, "-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", "init")
+    monkeypatch.setattr(git_runner, "GIT_WORKTREES_DIR", str(tmp_path / "trees"))
+
+    first = git_runner.acquire_worktree(repo, "fix/issue-1", from_ref="main")
+    second = git_runner.acquire_worktree(repo, "fix/issue-2", from_ref="main")
+    assert first == (tmp_path / "trees" / "fix-issue-1").resolve()
+    assert _git(first, "rev-parse", "--abbrev-ref", "HEAD").strip() == "fix/issue-1"
+    assert (
+        _git(repo, "rev-parse", "--abbrev-ref", "HEAD").strip() == "main"
+    )  # клон не переключается
+    (first / "a.txt").write_text("dirty\n", encoding="utf-8")
+    (first / "new.txt").write_text("left over\n", encoding="utf-8")
+    git_runner.release_worktree(repo, first)
+
+    # Повторная выдача — то же дерево без остатков прошлого прогона
+    assert git_runner.acquire_worktree(repo, "fix/issue-1") == first
+    assert (first / "a.txt").read_text(encoding="utf-8") == "base\n" and not (
+        first / "new.txt"
+    ).exists()
+    git_runner.release_worktree(repo, first)
+
+    # Старые свободные деревья удаляются, выданное — нет
+    assert git_runner.gc_worktrees(repo, max_age_hours=0) == [first]
+    assert not first.exists() and second.exists()
+    git_runner.release_worktree(repo, second)
+
+
+def test_shallow_fetch_deepens_to_merge_base_and_sparse_worktree(tmp_path, monkeypatch):
+    upstream = tmp_path / "upstream"
+    _git(tmp_path, "init", "-q", "-b", "main", str(upstream))
+    commit = ["-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm"]
+    for i in range(4):
+        for d in ("src", "docs", "assets"):
+            (upstream / d).mkdir(exist_ok=True)
+            (upstream / d / f"f{i}.py").write_text(f"{i}\n", encoding="utf-8")
+        _git(upstream, "add", "-A")
+        _git(upstream, *commit, f"c{i}")
+    _git(upstream, "checkout", "-qb", "feat")
+    (upstream / "docs" / "f0.py").write_text("feat\n", encoding="utf-8")
+    _git(upstream, *commit, "feat", "-a")
+    _git(upstream, "checkout", "-q", "main")
+    for i in range(3):
+        (upstream / "README").write_text(f"{i}\n", encoding="utf-8")
+        _git(upstream, "add", "README")
+        _git(upstream, *commit, f"m{i}")
+
+    clone = tmp_path / "clone"
+    _git(tmp_path, "clone", "-q", "--depth=1", f"file://{upstream}", str(clone))
+    monkeypatch.setattr(git_runner, "GIT_FETCH_DEPTH", 1)
+    monkeypatch.setattr(git_runner, "GIT_WORKTREES_DIR", str(tmp_path / "trees"))
+
+    assert git_runner.fetch_branches(clone, ["feat", "main"])
+    assert _git(clone, "rev-parse", "--is-shallow-repository").strip() == "true"
+    assert git_runner.changed_paths(clone, "origin/main", "origin/feat") == ["docs/f0.py"]
+
+    tree = git_runner.acquire_worktree(
+        clone, "feat", from_ref="origin/feat", sparse=["src", "docs/f0.py"]
+    )
+    assert sorted(p.name for p in tree.iterdir() if p.name != ".git") == ["docs", "src"]
+    (tree / "assets" / "new.py").parent.mkdir()
+    (tree / "assets" / "new.py").write_text("x\n", encoding="utf-8")
+    monkeypatch.delenv("GITHUB_TOKEN", raising=False)
+    ok, out = commit_and_push(tree, "feat", "add asset", paths=["assets/new.py"])
+    assert ok, out
+    assert _git(upstream, "show", "feat:assets/new.py") == "x\n"
+    git_runner.release_worktree(clone, tree)
+
+    # Ветку PR продвинули в origin после прогона: режим правок ставит дерево на свежий head
+    _git(upstream, "checkout", "-q", "feat")
+    (upstream / "src" / "f0.py").write_text("newer\n", encoding="utf-8")
+    _git(upstream, *commit, "newer", "-a")
+    _git(upstream, "checkout", "-q", "main")
+    assert git_runner.fetch_branches(clone, ["feat"])
+    tree = git_runner.acquire_worktree(
+        clone, "feat", from_ref="origin/feat", sparse=["src"], reset=True
+    )
+    assert _git(tree, "rev-parse", "HEAD") == _git(upstream, "rev-parse", "feat")
+    assert (tree / "src" / "f0.py").read_text(encoding="utf-8") == "newer\n"
+    git_runner.release_worktree(clone, tree)
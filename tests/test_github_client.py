@@ -0,0 +1,262 @@
+"""Клиент GitHub (github_client.GithubClient) поверх подставного репозитория PyGithub."""
+
+import base64
+import threading
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import pytest
+from github import GithubException
+
+import github_client
+from github_client import GithubClient
+from rate_limiter import RateLimitExceeded
+
+
+def _client(repo):
+    # Состояние кэша — как в GithubClient.__init__, без токена и запросов к API
+    client = GithubClient.__new__(GithubClient)
+    client._repo = repo
+    client._pulls = OrderedDict()
+    client._issues = OrderedDict()
+    client._links = {}
+    client._cache_lock = threading.Lock()
+    client._fetch_locks = {}
+    client._cache_hits = 0
+    client._cache_misses = 0
+    client._http_cache = None
+    return client
+
+
+def _item(path, type_="blob", sha=None, size=1):
+    return SimpleNamespace(
+        path=path, type=type_, sha=sha or f"sha-{path}", size=size, mode="100644"
+    )
+
+
+class _TreeRepo:
+    """Git Trees API: trees[(sha, recursive)] -> (truncated, items)."""
+
+    default_branch = "main"
+
+    def __init__(self, trees):
+        self.trees = trees
+        self.calls = []
+
+    def get_git_tree(self, sha, recursive=False):
+        self.calls.append((sha, recursive))
+        truncated, items = self.trees[(sha, recursive)]
+        return SimpleNamespace(sha=f"tree-{sha}", truncated=truncated, tree=items)
+
+
+def test_list_repo_tree_returns_blobs_with_sha():
+    repo = _TreeRepo(
+        {
+            ("main", True): (
+                False,
+                [
+                    _item("src", "tree"),
+                    _item("src/app.py", sha="b1", size=10),
+                    _item("README.md", sha="b2", size=5),
+                    _item("vendor/lib", "commit"),  # сабмодуль
+                    _item(".github/workflows/ci.yml"),
+                ],
+            )
+        }
+    )
+    assert _client(repo).list_repo_tree() == [
+        {"path": "README.md", "sha": "b2", "size": 5, "mode": "100644"},
+        {"path": "src/app.py", "sha": "b1", "size": 10, "mode": "100644"},
+    ]
+    assert repo.calls == [("main", True)]
+
+
+def test_truncated_tree_is_read_by_subtrees():
+    repo = _TreeRepo(
+        {
+            ("main", True): (True, []),
+            ("tree-main", False): (
+                False,
+                [
+                    _item("README.md", sha="r"),
+                    _item("src", "tree", sha="t-src"),
+                    _item("vendor", "commit"),
+                    _item(".github", "tree", sha="t-gh"),
+                ],
+            ),
+            # Поддерево тоже усечено — дочитывается следующим уровнем
+            ("t-src", True): (True, []),
+            ("t-src", False): (False, [_item("a.py", sha="a"), _item("pkg", "tree", sha="t-pkg")]),
+            ("t-pkg", True): (False, [_item("b.py", sha="b"), _item("ext", "commit")]),
+        }
+    )
+    tree = _client(repo).list_repo_tree()
+    assert [(e["path"], e["sha"]) for e in tree] == [
+        ("README.md", "r"),
+        ("src/a.py", "a"),
+        ("src/pkg/b.py", "b"),
+    ]
+    assert ("t-gh", True) not in repo.calls
+
+
+class _ContentsRepo(_TreeRepo):
+    """Обход каталогов через get_contents: dirs[path] -> пути файлов."""
+
+    def __init__(self, error, dirs):
+        super().__init__({})
+        self.error = error
+        self.dirs = dirs
+
+    def get_git_tree(self, sha, recursive=False):
+        raise self.error
+
+    def get_contents(self, path, ref=None):
+        return [
+            SimpleNamespace(path=p, type="dir" if p in self.dirs else "file")
+            for p in self.dirs[path]
+        ]
+
+
+def test_list_repo_files_falls_back_on_github_error(capsys):
+    repo = _ContentsRepo(
+        GithubException(500, {"message": "boom"}), {"": ["src", "README.md"], "src": ["src/a.py"]}
+    )
+    assert _client(repo).list_repo_files() == ["README.md", "src/a.py"]
+    assert "get_contents" in capsys.readouterr().err
+
+
+def test_list_repo_files_does_not_mask_rate_limit():
+    repo = _ContentsRepo(RateLimitExceeded("лимит GitHub API исчерпан", 600), {"": []})
+    with pytest.raises(RateLimitExceeded):
+        _client(repo).list_repo_files()
+
+
+class _ObjectRepo:
+    """get_pull / get_issue с подсчётом загрузок; тело PR ссылается на Issue."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.fetched = []
+
+    def get_pull(self, number):
+        self.fetched.append(("pull", number))
+        time.sleep(self.delay)
+        return SimpleNamespace(number=number, body=f"Closes #{number + 100}", title="fix")
+
+    def get_issue(self, number):
+        self.fetched.append(("issue", number))
+        time.sleep(self.delay)
+        return SimpleNamespace(number=number, title="bug", body="", state="open")
+
+
+def test_concurrent_requests_share_one_fetch():
+    repo = _ObjectRepo(delay=0.1)
+    client = _client(repo)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(client._get_pull(7))) for _ in range(5)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert repo.fetched == [("pull", 7)]
+    assert all(r is results[0] for r in results)
+    assert client.cache_stats() == {"hits": 4, "misses": 1}
+    assert client._fetch_locks == {}
+
+
+def test_least_recently_used_object_is_evicted(monkeypatch):
+    monkeypatch.setattr(github_client, "GITHUB_OBJECT_CACHE_SIZE", 2)
+    repo = _ObjectRepo()
+    client = _client(repo)
+    client._get_pull(1)
+    client._get_pull(2)
+    client._get_pull(1)  # 1 свежее 2
+    client._get_pull(3)  # вытесняет 2
+    assert list(client._pulls) == [1, 3]
+    client._get_pull(2)
+    assert repo.fetched == [("pull", 1), ("pull", 2), ("pull", 3), ("pull", 2)]
+    assert client.cache_stats() == {"hits": 1, "misses": 4}
+
+
+def test_invalidate_pr_drops_linked_issue():
+    repo = _ObjectRepo()
+    client = _client(repo)
+    assert client.parse_issue_number_from_pr(5) == 105
+    client.get_issue_details(105)
+    client.get_issue_details(9)
+    client.invalidate(5)
+    assert 5 not in client._pulls and 105 not in client._issues
+    assert 9 in client._issues and client._links == {}
+    client.get_issue_details(105)
+    assert repo.fetched.count(("issue", 105)) == 2
+
+
+class _GraphqlHttp:
+    """Подмена _http.post: ответ GraphQL из blobs[path], запросы запоминаются."""
+
+    def __init__(self, blobs):
+        self.blobs = blobs
+        self.queries = []
+
+    def post(self, url, json=None, headers=None, timeout=None):
+        expressions = [v for k, v in json["variables"].items() if k.startswith("e")]
+        self.queries.append([e.split(":", 1)[1] for e in expressions])
+        data = {f"f{i}": self.blobs.get(e.split(":", 1)[1]) for i, e in enumerate(expressions)}
+        return SimpleNamespace(
+            raise_for_status=lambda: None, json=lambda: {"data": {"repository": data}}
+        )
+
+
+class _RestRepo:
+    default_branch = "main"
+    full_name = "owner/repo"
+
+    def __init__(self, files):
+        self.files = files
+        self.rest = []
+
+    def get_contents(self, path, ref=None):
+        self.rest.append(path)
+        if path not in self.files:
+            raise GithubException(404, {"message": "Not Found"})
+        return SimpleNamespace(content=base64.b64encode(self.files[path].encode()).decode())
+
+
+def test_get_file_contents_batches_and_falls_back_to_rest(monkeypatch):
+    monkeypatch.setattr(github_client, "GRAPHQL_FILES_PER_QUERY", 2)
+    repo = _RestRepo({"big.py": "full text\n"})
+    client = _client(repo)
+    client._token = "t"
+    client._http = _GraphqlHttp(
+        {
+            "a.py": {"text": "a\n", "isBinary": False, "isTruncated": False},
+            "b.py": {"text": "b\n", "isBinary": False, "isTruncated": False},
+            "big.py": {"text": None, "isBinary": False, "isTruncated": True},
+            "logo.png": {"text": None, "isBinary": True, "isTruncated": False},
+        }
+    )
+    paths = ["a.py", "b.py", "big.py", "logo.png", "missing.py"]
+    assert client.get_file_contents(paths) == {
+        "a.py": "a\n",
+        "b.py": "b\n",
+        "big.py": "full text\n",
+    }
+    assert client._http.queries == [["a.py", "b.py"], ["big.py", "logo.png"], ["missing.py"]]
+    # REST — только для усечённого; бинарный и отсутствующий пропускаются
+    assert repo.rest == ["big.py"]
+
+
+def test_failed_graphql_batch_is_read_through_rest():
+    repo = _RestRepo({"a.py": "a\n"})
+    client = _client(repo)
+    client._token = "t"
+    client._http = SimpleNamespace(
+        post=lambda *a, **kw: SimpleNamespace(
+            raise_for_status=lambda: None, json=lambda: {"data": {"repository": None}}
+        )
+    )
+    assert client.get_file_contents(["a.py", "gone.py"]) == {"a.py": "a\n"}
+    assert repo.rest == ["a.py", "gone.py"]
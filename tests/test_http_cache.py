@@ -0,0 +1,58 @@
+"""Условные запросы и дисковый кэш (http_cache.CachingAdapter, disk_cache.DiskCache)."""
+
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import requests
+
+from disk_cache import DiskCache
+from http_cache import CachingAdapter
+
+
+class _Handler(BaseHTTPRequestHandler):
+    hits = 0
+
+    def do_GET(self):
+        type(self).hits += 1
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.send_header("X-RateLimit-Remaining", "4999")
+            self.end_headers()
+            return
+        body = b'{"title": "issue"}'
+        self.send_response(200)
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_not_modified_is_served_from_cache(tmp_path):
+    server = HTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        adapter = CachingAdapter(DiskCache(tmp_path, max_bytes=1024 * 1024))
+        session = requests.Session()
+        session.mount("http://", adapter)
+        url = f"http://127.0.0.1:{server.server_port}/repos/o/r/issues/1"
+        first = session.get(url)
+        second = session.get(url)
+    finally:
+        server.shutdown()
+    assert first.json() == second.json() == {"title": "issue"}
+    assert second.status_code == 200
+    assert second.headers["X-RateLimit-Remaining"] == "4999"
+    assert adapter.not_modified == 1
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=600)
+    for i in range(10):
+        cache.set(f"{i:064x}", {"payload": "x" * 100})
+    assert cache.stats()["bytes"] <= 600
+    assert cache.get(f"{9:064x}") == {"payload": "x" * 100}
+    assert cache.get(f"{0:064x}") is None
@@ -0,0 +1,46 @@
+"""Общий пул HTTP-соединений (http_pool): учёт переиспользования keep-alive соединений."""
+
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from http_pool import connection_stats, register_adapter
+
+
+class _KeepAlive(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+def test_registered_adapter_reports_reused_connections():
+    server = HTTPServer(("127.0.0.1", 0), _KeepAlive)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    adapter = HTTPAdapter()
+    assert register_adapter(adapter) is register_adapter(
+        adapter
+    )  # повторная регистрация не дублирует
+    session = requests.Session()
+    session.mount("http://", adapter)
+    before = connection_stats()
+    try:
+        for _ in range(3):
+            assert session.get(f"http://127.0.0.1:{server.server_address[1]}/", timeout=5).ok
+        # Пулы считаются, пока адаптер открыт (close очищает poolmanager)
+        after = connection_stats()
+    finally:
+        session.close()
+        server.shutdown()
+        server.server_close()
+    assert after["requests"] - before["requests"] == 3
+    assert after["connections"] - before["connections"] == 1
+    assert after["reused"] - before["reused"] == 2
@@ -0,0 +1,116 @@
+"""Параллельные запросы к LLM (llm_client.LLMClient.generate_many) и кэш ответов."""
+
+import time
+
+from disk_cache import DiskCache
+from llm_client import LLMClient
+
+
+def _client(call, cache=None):
+    client = LLMClient.__new__(LLMClient)
+    client.provider = "openai"
+    client.model = "gpt-4o-mini"
+    client.temperature = None
+    client.max_retries = 1
+    client.retry_delay = 0
+    client.cache = cache
+    client._call_openai = call
+    return client
+
+
+def test_generate_many_keeps_submission_order():
+    def call(system_prompt, user_prompt):
+        time.sleep(0.05 * (3 - int(user_prompt)))
+        return f"answer {user_prompt}"
+
+    client = _client(call)
+    prompts = [("sys", str(i)) for i in range(3)]
+    assert client.generate_many(prompts, max_concurrency=3) == ["answer 0", "answer 1", "answer 2"]
+
+
+def test_generate_many_return_exceptions():
+    def call(system_prompt, user_prompt):
+        if user_prompt == "bad":
+            raise ValueError("boom")
+        return "ok"
+
+    results = _client(call).generate_many([("s", "good"), ("s", "bad")], return_exceptions=True)
+    assert results[0] == "ok"
+    assert isinstance(results[1], ValueError)
+
+
+def test_cached_response_skips_llm_call(tmp_path):
+    calls = []
+
+    def call(system_prompt, user_prompt):
+        calls.append(user_prompt)
+        return f"answer {user_prompt}"
+
+    client = _client(call, cache=DiskCache(tmp_path, max_bytes=1024 * 1024, ttl=60))
+    assert client.generate_response("sys", "q") == "answer q"
+    assert client.generate_response("sys", "q") == "answer q"
+    assert client.generate_response("sys", "other") == "answer other"
+    assert calls == ["q", "other"]
+    assert client.cache_stats()["hits"] == 1
+
+    # Другая модель — другой ключ
+    client.model = "gpt-4o"
+    client.generate_response("sys", "q")
+    assert calls == ["q", "other", "q"]
+
+
+def test_invalid_json_is_not_cached_and_retry_reaches_llm(tmp_path):
+    answers = ["not json", '{"files": []}']
+    calls = []
+
+    def call(system_prompt, user_prompt):
+        calls.append(user_prompt)
+        return answers[len(calls) - 1]
+
+    cache = DiskCache(tmp_path, max_bytes=1024 * 1024, ttl=60)
+    cache.set(_client(call)._cache_key("sys", "q"), {"text": "stale broken"})
+    client = _client(call, cache=cache)
+    client.max_retries = 3
+    assert client.generate_response("sys", "q", as_json=True) == {"files": []}
+    assert calls == ["q", "q"]
+    # В кэше — разобравшийся ответ
+    assert client.generate_response("sys", "q", as_json=True) == {"files": []}
+    assert calls == ["q", "q"]
+
+
+def test_response_failing_validation_is_not_cached(tmp_path):
+    answers = ["обрыв ответа", '{"files": [{"path": "a.py", "content": ""}]}']
+    calls = []
+
+    def call(system_prompt, user_prompt):
+        calls.append(user_prompt)
+        return answers[len(calls) - 1]
+
+    def has_files(text):
+        return "files" in text
+
+    client = _client(call, cache=DiskCache(tmp_path, max_bytes=1024 * 1024, ttl=60))
+    assert client.generate_response("sys", "q", validate=has_files) == "обрыв ответа"
+    assert client.generate_response("sys", "q", validate=has_files) == answers[1]
+    assert client.generate_response("sys", "q", validate=has_files) == answers[1]
+    assert calls == ["q", "q"]
+
+
+def test_stream_caches_only_validated_text(tmp_path):
+    streams = [['{"fi'], ['{"files": ', "[]}"]]
+    calls = []
+
+    def stream(system_prompt, user_prompt):
+        calls.append(user_prompt)
+        yield from streams[len(calls) - 1]
+
+    client = _client(None, cache=DiskCache(tmp_path, max_bytes=1024 * 1024, ttl=60))
+    client._stream_openai = stream
+
+    def complete(text):
+        return text.endswith("}")
+
+    assert "".join(client.stream_response("sys", "q", validate=complete)) == '{"fi'
+    assert "".join(client.stream_response("sys", "q", validate=complete)) == '{"files": []}'
+    assert list(client.stream_response("sys", "q", validate=complete)) == ['{"files": []}']
+    assert len(calls) == 2
@@ -0,0 +1,32 @@
+"""Чтение дерева и файлов из локального git-клона (local_repo.LocalRepo)."""
+
+import subprocess
+
+from local_repo import LocalRepo
+
+
+def _git(root, *args):
+    subprocess.run(["git", *args], cwd=root, check=True, capture_output=True)
+
+
+def test_local_repo_reads_committed_tree(tmp_path):
+    _git(tmp_path, "init", "-q")
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "app.py").write_text("print('ok')\n", encoding="utf-8")
+    (tmp_path / "data.bin").write_bytes(b"\0\1\2")
+    _git(tmp_path, "add", "-A")
+    _git(tmp_path, "-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", "init")
+    (tmp_path / "src" / "app.py").write_text("changed\n", encoding="utf-8")
+
+    repo = LocalRepo.open(tmp_path)
+    assert repo is not None
+    sha = repo.resolve_ref(None)
+    assert repo.list_repo_files("", ref=sha) == ["data.bin", "src/app.py"]
+    contents = repo.get_file_contents(["src/app.py", "missing.py", "data.bin"], ref=sha)
+    assert contents == {"src/app.py": "print('ok')\n"}
+    assert repo.resolve_ref("no-such-branch") is None
+
+
+def test_local_repo_open_outside_git(tmp_path):
+    assert LocalRepo.open(tmp_path) is None
+    assert LocalRepo.open(None) is None
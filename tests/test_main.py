@@ -0,0 +1,52 @@
+"""Точка входа (main.main): проверка устаревшего head PR перед прогоном."""
+
+import sys
+
+from github import GithubException
+
+import github_client
+import main
+import reviewer_agent
+
+
+def _run(monkeypatch, client_factory):
+    runs = []
+    monkeypatch.setattr(sys, "argv", ["main.py", "--pr", "4"])
+    monkeypatch.setenv("HEAD_SHA", "abc1234")
+    monkeypatch.delenv("GITHUB_EVENT_PATH", raising=False)
+    monkeypatch.delenv("FIX_MODE", raising=False)
+    monkeypatch.setattr(github_client, "GithubClient", client_factory)
+    monkeypatch.setattr(
+        reviewer_agent, "run_reviewer_agent", lambda number, gh=None: runs.append(gh) or 0
+    )
+    return main.main(), runs
+
+
+class _Client:
+    created = 0
+
+    def __init__(self, head="abc1234"):
+        _Client.created += 1
+        self.head = head
+
+    def get_pr_details(self, number):
+        return {"head_sha": self.head}
+
+
+def test_run_reuses_the_client_of_the_head_check(monkeypatch):
+    _Client.created = 0
+    code, runs = _run(monkeypatch, _Client)
+    assert code == 0 and len(runs) == 1
+    assert isinstance(runs[0], _Client) and _Client.created == 1
+
+    code, runs = _run(monkeypatch, lambda: _Client(head="fffffff"))
+    assert code == 0 and runs == []  # событие устарело — агент не запускается
+
+
+def test_head_check_failure_does_not_stop_the_run(monkeypatch, capsys):
+    def failing_client():
+        raise GithubException(502, {"message": "Bad Gateway"})
+
+    code, runs = _run(monkeypatch, failing_client)
+    assert code == 0 and runs == [None]
+    assert "Не удалось проверить head PR" in capsys.readouterr().err
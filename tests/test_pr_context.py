@@ -0,0 +1,72 @@
+"""Сбор контекста PR (pr_context.get_pr_context): параллельные запросы и зависимые вызовы."""
+
+import threading
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+
+from github_client import GithubClient
+from pr_context import get_pr_context
+
+
+class _Repo:
+    full_name = "owner/repo"
+
+    def __init__(self):
+        self.pulls = []
+
+    def get_pull(self, number):
+        self.pulls.append(number)
+        time.sleep(0.05)
+        files = [SimpleNamespace(filename="src/a.py", status="modified", patch="@@")]
+        return SimpleNamespace(
+            number=number,
+            title="fix",
+            body="Fixes #12",
+            head=SimpleNamespace(sha="h1", ref="feat"),
+            base=SimpleNamespace(ref="main"),
+            get_files=lambda: files,
+        )
+
+    def get_issue(self, number):
+        return SimpleNamespace(number=number, title="bug", body="", state="open")
+
+
+class _Http:
+    def get(self, url, params=None, headers=None, timeout=None):
+        if url.endswith("/actions/runs"):
+            runs = [
+                {"head_sha": "old", "name": "ci", "conclusion": "failure"},
+                {"head_sha": "h1", "name": "ci", "conclusion": "success"},
+            ]
+            return SimpleNamespace(
+                raise_for_status=lambda: None, json=lambda: {"workflow_runs": runs}
+            )
+        return SimpleNamespace(raise_for_status=lambda: None, text="diff --git a/src/a.py")
+
+
+def _client(repo):
+    client = GithubClient.__new__(GithubClient)
+    client._repo = repo
+    client._token = "t"
+    client._http = _Http()
+    client._pulls = OrderedDict()
+    client._issues = OrderedDict()
+    client._links = {}
+    client._cache_lock = threading.Lock()
+    client._fetch_locks = {}
+    client._cache_hits = 0
+    client._cache_misses = 0
+    client._http_cache = None
+    return client
+
+
+def test_dependent_calls_chain_on_one_pull_fetch():
+    repo = _Repo()
+    ctx = get_pr_context(_client(repo), 7)
+    # Детали, файлы и номер Issue параллельно читают один объект PR
+    assert repo.pulls == [7]
+    assert ctx["issue"]["number"] == 12
+    assert ctx["ci_summary"] == "- ci: success"
+    assert ctx["changed_files"] == [{"path": "src/a.py", "status": "modified", "patch": "@@"}]
+    assert ctx["diff"].startswith("diff --git")
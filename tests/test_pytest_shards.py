@@ -0,0 +1,57 @@
+"""Шардирование pytest и бюджет времени (pytest_shards)."""
+
+import sys
+
+from pytest_shards import file_durations, load_durations, plan_shards, run_sharded, run_subprocess
+
+
+def test_plan_shards_balances_by_history_and_puts_slow_first():
+    files = ["tests/test_a.py", "tests/test_b.py", "tests/test_c.py", "tests/test_d.py"]
+    history = {
+        "tests/test_a.py::t1": 8.0,
+        "tests/test_b.py::t1": 3.0,
+        "tests/test_b.py::t2": 3.0,
+        "tests/test_c.py::t": 4.0,
+    }
+    durations = file_durations(files, history)
+    assert durations["tests/test_b.py"] == 6.0
+    assert durations["tests/test_d.py"] == 6.0  # без истории — средняя по известным
+
+    assert plan_shards(files, durations, workers=2) == [
+        ["tests/test_a.py", "tests/test_c.py"],
+        ["tests/test_b.py", "tests/test_d.py"],
+    ]
+    # Короткий набор не дробится
+    assert plan_shards(files, dict.fromkeys(files, 0.1), workers=4) == [files]
+
+
+def test_run_sharded_kills_only_stragglers_and_records_durations(tmp_path):
+    tests = tmp_path / "tests"
+    tests.mkdir()
+    (tests / "test_fast.py").write_text("def test_ok():\n    assert True\n", encoding="utf-8")
+    (tests / "test_slow.py").write_text(
+        "import time\n\n\ndef test_first():\n    pass\n\n\ndef test_hangs():\n    time.sleep(60)\n",
+        encoding="utf-8",
+    )
+
+    def run_shard(args, output_path, timeout):
+        return run_subprocess(
+            [sys.executable, "-m", "pytest", "-p", "no:cacheprovider", *args],
+            tmp_path,
+            output_path,
+            timeout,
+        )
+
+    ok, log = run_sharded(tmp_path, ["tests"], ["-v"], run_shard, budget=3, workers=2)
+    assert not ok
+    assert "test_fast.py::test_ok PASSED" in log
+    assert "test_slow.py::test_first PASSED" in log
+    assert "TIMEOUT tests/test_slow.py::test_hangs - шард прерван по бюджету" in log
+
+    history = load_durations(tmp_path)
+    assert history["tests/test_slow.py::test_hangs"] > history["tests/test_fast.py::test_ok"]
+    # Следующий прогон ставит зависший файл первым и отдельно от быстрого
+    files = ["tests/test_fast.py", "tests/test_slow.py"]
+    assert (
+        plan_shards(files, file_durations(files, history), workers=2)[0][0] == "tests/test_slow.py"
+    )
@@ -0,0 +1,133 @@
+"""Параллельный запуск проверок и выбор затронутых тестов (quality_runner)."""
+
+import sys
+import time
+
+from quality_runner import _check_issues, affected_tests, format_issues, run_parallel
+
+
+def _py(code):
+    return [sys.executable, "-c", code]
+
+
+def test_run_parallel_runs_concurrently_and_keeps_order(tmp_path):
+    sleep = "import time; time.sleep(0.5); print('{}')"
+    start = time.monotonic()
+    results = run_parallel(
+        [(n, _py(sleep.format(n))) for n in ("a", "b", "c")], tmp_path, report_all=True
+    )
+    assert time.monotonic() - start < 1.4
+    assert list(results) == ["a", "b", "c"]
+    assert results["b"] == (True, "b\n")
+
+
+def test_run_parallel_report_all_vs_fail_fast(tmp_path):
+    checks = [
+        ("fail", _py("import sys; print('bad'); sys.exit(1)")),
+        ("slow", _py("import time; time.sleep(5); print('done')")),
+    ]
+    results = run_parallel(checks, tmp_path, report_all=False)
+    assert results["fail"] == (False, "bad\n")
+    assert results["slow"][0] is False and "прервано" in results["slow"][1]
+
+    checks[1] = ("slow", _py("import time; time.sleep(0.2); print('done')"))
+    results = run_parallel(checks, tmp_path, report_all=True)
+    assert results["slow"] == (True, "done\n")
+
+
+def test_affected_tests_follow_import_graph(tmp_path):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "tests").mkdir()
+    (tmp_path / "src" / "core.py").write_text("X = 1\n", encoding="utf-8")
+    (tmp_path / "src" / "service.py").write_text("from core import X\n", encoding="utf-8")
+    (tmp_path / "src" / "other.py").write_text("Y = 2\n", encoding="utf-8")
+    (tmp_path / "tests" / "test_service.py").write_text("import service\n", encoding="utf-8")
+    (tmp_path / "tests" / "test_other.py").write_text("from other import Y\n", encoding="utf-8")
+
+    assert affected_tests(tmp_path, ["src/core.py"]) == ["tests/test_service.py"]
+    assert affected_tests(tmp_path, ["src/other.py", "tests/test_service.py"]) == [
+        "tests/test_other.py",
+        "tests/test_service.py",
+    ]
+    assert affected_tests(tmp_path, ["tests/conftest.py"]) is None
+
+
+PYTEST_OUTPUT = """\
+=================================== FAILURES ===================================
+__________________________________ test_b[1] ___________________________________
+tests/test_x.py:11: in test_b
+    helper()
+src/helper.py:4: in helper
+    raise ValueError("boom")
+E   ValueError: boom
+_______________________ ERROR collecting tests/test_y.py _______________________
+tests/test_y.py:1: in <module>
+    import nonexist
+E   ModuleNotFoundError: No module named 'nonexist'
+=========================== short test summary info ============================
+FAILED tests/test_x.py::test_b[1] - ValueError: boom
+ERROR tests/test_y.py
+TIMEOUT tests/test_z.py::test_slow - шард прерван по бюджету 120s
+"""
+
+
+def test_check_issues_are_structured(tmp_path):
+    assert _check_issues(tmp_path, "pytest", PYTEST_OUTPUT) == [
+        {
+            "tool": "pytest",
+            "file": "src/helper.py",
+            "line": 4,
+            "code": "FAILED",
+            "message": "tests/test_x.py::test_b[1]: ValueError: boom",
+        },
+        {
+            "tool": "pytest",
+            "file": "tests/test_y.py",
+            "line": 1,
+            "code": "ERROR",
+            "message": "tests/test_y.py: ModuleNotFoundError: No module named 'nonexist'",
+        },
+        {
+            "tool": "pytest",
+            "file": "tests/test_z.py",
+            "line": None,
+            "code": "TIMEOUT",
+            "message": "tests/test_z.py::test_slow: шард прерван по бюджету 120s",
+        },
+    ]
+    mypy = "src/a.py:2: error: Incompatible types in assignment  [assignment]\nsrc/a.py:3: note: see docs\n"
+    assert _check_issues(tmp_path, "mypy", mypy) == [
+        {
+            "tool": "mypy",
+            "file": "src/a.py",
+            "line": 2,
+            "code": "assignment",
+            "message": "Incompatible types in assignment",
+        },
+    ]
+    ruff = '[{"code": "F401", "filename": "%s", "location": {"row": 1, "column": 8}, "message": "`os` imported but unused"}]'
+    assert _check_issues(tmp_path, "ruff check", ruff % (tmp_path / "src" / "a.py")) == [
+        {
+            "tool": "ruff",
+            "file": "src/a.py",
+            "line": 1,
+            "code": "F401",
+            "message": "`os` imported but unused",
+        },
+    ]
+    # Нераспознанный вывод — хвостом
+    assert _check_issues(tmp_path, "mypy", "crash\n")[0]["message"] == "crash"
+
+
+def test_format_issues_groups_by_tool():
+    report = {
+        "issues": [
+            {"tool": "ruff", "file": "src/a.py", "line": 1, "code": "F401", "message": "unused"},
+            {"tool": "pytest", "file": None, "line": None, "code": None, "message": "boom"},
+        ],
+        "omitted": {"ruff": 3},
+    }
+    assert (
+        format_issues(report)
+        == "[ruff]\n- src/a.py:1 F401: unused\n[pytest]\n- boom\n[ruff] ... и ещё замечаний: 3"
+    )
@@ -0,0 +1,65 @@
+"""Учёт лимитов GitHub API (rate_limiter.RateLimiter)."""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+import requests
+
+from github_client import _GithubAdapter, github_retry
+from rate_limiter import RateLimiter, RateLimitExceeded
+
+
+def test_budget_and_retry_after():
+    sleeps = []
+    limiter = RateLimiter(reserve=10, max_wait=120, sleep=sleeps.append)
+    assert limiter.budget()["remaining"] == -1
+    reset = time.time() + 60
+    headers = {
+        "X-RateLimit-Remaining": "4000",
+        "X-RateLimit-Limit": "5000",
+        "X-RateLimit-Reset": str(reset),
+    }
+    assert limiter.update(200, headers) is None
+    assert limiter.budget()["remaining"] == 4000
+
+    assert limiter.update(403, {"Retry-After": "5"}) == 5
+    limiter.acquire()
+    assert len(sleeps) == 1 and 4 < sleeps[0] <= 5
+    assert limiter.update(403, {}) is None  # обычный 403 — не лимит
+
+
+def test_exhausted_limit_raises_when_reset_is_too_far():
+    limiter = RateLimiter(reserve=10, max_wait=30, sleep=lambda s: None)
+    limiter.update(200, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(time.time() + 600)})
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire()
+
+
+class _LimitedHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(403)
+        self.send_header("Retry-After", "2")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def test_long_retry_after_raises_instead_of_sleeping():
+    server = HTTPServer(("127.0.0.1", 0), _LimitedHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    limiter = RateLimiter(max_wait=1)
+    session = requests.Session()
+    # Транспорт как в GithubClient: urllib3 не должен сам ждать Retry-After и повторять 403
+    session.mount("http://", _GithubAdapter(limiter, cache=None, max_retries=github_retry()))
+    started = time.monotonic()
+    try:
+        with pytest.raises(RateLimitExceeded):
+            session.get(f"http://127.0.0.1:{server.server_address[1]}/repos/o/r")
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert time.monotonic() - started < 1.5
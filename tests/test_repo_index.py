@@ -0,0 +1,70 @@
+"""Индекс символов и импортов репозитория (repo_index.RepoIndex)."""
+
+from repo_index import RepoIndex
+
+
+class _Source:
+    """Минимальный источник файлов: дерево {path: (sha, content)}; считает загрузки."""
+
+    def __init__(self, files):
+        self.files = files
+        self.fetched = []
+
+    def list_repo_tree(self, ref=None):
+        return [
+            {"path": p, "sha": sha, "size": len(c), "mode": "100644"}
+            for p, (sha, c) in self.files.items()
+        ]
+
+    def get_file_contents(self, paths, ref=None):
+        self.fetched.extend(paths)
+        return {p: self.files[p][1] for p in paths}
+
+
+FILES = {
+    "src/pkg/__init__.py": ("a1", ""),
+    "src/pkg/models.py": (
+        "b1",
+        "class Invoice:\n    def total(self):\n        return 0\n\nLIMIT = 5\n",
+    ),
+    "src/pkg/billing.py": (
+        "c1",
+        "from .models import Invoice\n\n\ndef charge():\n    return Invoice().total()\n",
+    ),
+    "src/app.py": ("d1", "import pkg.billing\n\npkg.billing.charge(\n"),
+    "README.md": ("e1", "# readme"),
+}
+
+
+def test_index_queries():
+    index = RepoIndex().update(_Source(dict(FILES)), "main")
+    assert [d["path"] for d in index.definitions("Invoice")] == ["src/pkg/models.py"]
+    assert index.definitions("total")[0]["name"] == "Invoice.total"
+    assert index.definitions("LIMIT")[0]["kind"] == "variable"
+    assert index.imports("src/pkg/billing.py") == ["src/pkg/models.py"]
+    assert index.dependents("src/pkg/models.py") == ["src/pkg/billing.py"]
+    assert index.references("total") == ["src/pkg/billing.py"]
+    # Файл с синтаксической ошибкой не ломает индекс
+    assert index.symbols("src/app.py") == []
+
+
+def test_index_persists_and_reparses_only_changed_blobs(tmp_path):
+    path = tmp_path / "index.json"
+    RepoIndex(path).update(_Source(dict(FILES)), "main")
+
+    files = dict(FILES)
+    files["src/pkg/billing.py"] = ("c2", "def refund():\n    pass\n")
+    source = _Source(files)
+    index = RepoIndex(path).update(source, "main")
+    assert source.fetched == ["src/pkg/billing.py"]
+    assert index.parsed == 1
+    assert index.definitions("charge") == []
+    assert index.definitions("refund")[0]["path"] == "src/pkg/billing.py"
+
+
+def test_context_index_is_not_built_through_the_api(tmp_path):
+    from issue_parser import repo_index
+
+    source = _Source(dict(FILES))
+    assert repo_index(source, "main", tmp_path) is None
+    assert source.fetched == []
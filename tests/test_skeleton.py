@@ -18,4 +18,16 @@ def test_imports():
     import code_agent      # noqa: F401
     import quality_runner  # noqa: F401
     import git_runner      # noqa: F401
+    import local_repo      # noqa: F401
+    import disk_cache      # noqa: F401
+    import http_cache      # noqa: F401
+    import rate_limiter    # noqa: F401
+    import http_pool       # noqa: F401
+    import llm_cache       # noqa: F401
+    import context_ranker  # noqa: F401
+    import repo_index      # noqa: F401
+    import code_outline    # noqa: F401
+    import check_daemon    # noqa: F401
+    import pytest_shards   # noqa: F401
+    import agent_service   # noqa: F401
     assert True